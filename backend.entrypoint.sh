@@ -38,7 +38,8 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
-python manage.py rqworker default &
+# Pool of RQ workers sized to the cores and memory of this container.
+python manage.py transcode_workers &
 
 # exec gunicorn core.wsgi:application --bind 0.0.0.0:8000
 exec python manage.py runserver 0.0.0.0:8000
@@ -1,15 +1,71 @@
 from django.contrib import admin
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from .models import Video
+from .upload_handlers import install_upload_handler
 
 # Register your models here.
 
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
-    list_display = ("id", "title", "category", "created_at")
+    list_display = ("id", "title", "category", "uploaded_by", "created_at")
     search_fields = ("title", "category")
     list_filter = ("category", "created_at")
     ordering = ("-created_at",)
-    fields = ("title", "description", "category", "video_file")
+    readonly_fields = ("content_hash", "duration", "width", "height", "frame_rate", "bitrate",
+                       "video_codec", "audio_codec", "audio_channels", "audio_channel_layout",
+                       "complexity")
+    fieldsets = (
+        (None, {"fields": ("title", "description", "category", "video_file")}),
+        ("Media", {"fields": readonly_fields}),
+    )
+
+    @method_decorator(csrf_exempt)
+    def add_view(self, request, form_url='', extra_context=None):
+        """
+        Installs the hashing upload handler before the form is parsed.
+
+        The CSRF check reads the POST data, so it is done after the handler
+        is installed instead of before the view.
+        """
+        install_upload_handler(request, ['video_file'])
+        return csrf_protect(super().add_view)(request, form_url, extra_context)
+
+    @method_decorator(csrf_exempt)
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        """
+        Installs the hashing upload handler before the form is parsed (see
+        `add_view`).
+        """
+        install_upload_handler(request, ['video_file'])
+        return csrf_protect(super().change_view)(request, object_id, form_url, extra_context)
+
+    def get_form(self, request, obj=None, **kwargs):
+        """
+        Reports a source file the upload handler rejected while it was
+        received (see `upload_handlers.ContentHashUploadHandler`) instead of
+        a missing file.
+        """
+        form = super().get_form(request, obj, **kwargs)
+
+        class VideoAdminForm(form):
+            def clean(self):
+                cleaned_data = super().clean()
+                message = getattr(request, 'rejected_uploads', {}).get('video_file')
+                if message:
+                    self._errors.pop('video_file', None)
+                    self.add_error('video_file', message)
+                return cleaned_data
+
+        return VideoAdminForm
+
+    def save_model(self, request, obj, form, change):
+        """
+        Records the admin who uploaded a new video as its uploader.
+        """
+        if not change and obj.uploaded_by_id is None:
+            obj.uploaded_by = request.user
+        super().save_model(request, obj, form, change)
 
 
 
@@ -1,6 +1,7 @@
+import os
 from rest_framework import serializers
 from core import settings
-from content_app.models import Video, FileUpload
+from content_app.models import Video, FileUpload, UploadSession
 
 
 class FileUploadSerializer(serializers.ModelSerializer):
@@ -20,9 +21,12 @@ class VideoSerializer(serializers.ModelSerializer):
     Serializer for the Video model.
 
     This serializer is used to provide a read-only representation of
-    the Video model, including a dynamically generated thumbnail URL.
+    the Video model, including a dynamically generated thumbnail URL
+    and the srcsets of its responsive sizes, and of the hover-preview clip.
     """
     thumbnail_url = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Video
@@ -32,6 +36,8 @@ class VideoSerializer(serializers.ModelSerializer):
             'title',
             'description',
             'thumbnail_url',
+            'thumbnails',
+            'preview_url',
             'category'
         ]
 
@@ -58,4 +64,81 @@ class VideoSerializer(serializers.ModelSerializer):
             return full_url
 
         return None
-    
\ No newline at end of file
+
+    def get_thumbnails(self, obj):
+        """
+        Generates the srcsets of the video's responsive thumbnail sizes.
+
+        Args:
+            obj (Video): The Video instance being serialized.
+
+        Returns:
+            dict or None: The 'jpeg' and 'webp' srcset, e.g.
+                          '<url>_320.jpg 320w, <url>_640.jpg 640w', or None
+                          if the thumbnail has no sizes yet. The 'webp'
+                          srcset is None if no WebP images could be encoded.
+        """
+        request = self.context.get('request')
+
+        if not obj.thumbnail_sizes:
+            return None
+
+        base_url = f"{request.build_absolute_uri('/')[:-1]}{settings.MEDIA_URL}"
+        return {
+            image_format: ', '.join(f"{base_url}{size[image_format]} {size['width']}w"
+                                    for size in obj.thumbnail_sizes if size.get(image_format)) or None
+            for image_format in ('jpeg', 'webp')
+        }
+
+    def get_preview_url(self, obj):
+        """
+        Generates the full absolute URL for the video's hover-preview clip.
+
+        Args:
+            obj (Video): The Video instance being serialized.
+
+        Returns:
+            str or None: The full URL to the preview clip, or None if it
+                         has not been generated yet.
+        """
+        request = self.context.get('request')
+
+        if obj.preview_clip:
+            return (f"{request.build_absolute_uri('/')[:-1]}"
+                    f"{settings.MEDIA_URL}{obj.preview_clip.name}")
+
+        return None
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the UploadSession model.
+
+    This serializer is used to announce a resumable upload with the size of
+    the file and the metadata of the video, and to report how many bytes
+    have been received.
+    """
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'offset', 'title', 'description', 'category', 'video', 'created_at']
+        read_only_fields = ['offset', 'video']
+
+    def validate_filename(self, value):
+        """
+        Strips any directories from the filename sent by the client.
+        """
+        filename = os.path.basename(value)
+        if not filename:
+            raise serializers.ValidationError("A filename is required.")
+        return filename
+
+    def validate_size(self, value):
+        """
+        Checks that the announced size is within VIDEO_UPLOAD_MAX_SIZE.
+        """
+        if value <= 0:
+            raise serializers.ValidationError("The file must not be empty.")
+        if value > settings.VIDEO_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"The file must not be larger than {settings.VIDEO_UPLOAD_MAX_SIZE} bytes.")
+        return value
@@ -1,13 +1,24 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from content_app.api.views import VideoViewSet, HLSPlaylistView, HLSSegmentView
+from content_app.api.views import (
+    VideoViewSet, VideoStatusView, HLSMasterPlaylistView, HLSPlaylistView, HLSSegmentView, TrickplayView,
+    UploadSessionListView, UploadSessionDetailView, UploadSessionCompleteView
+)
 
 router = DefaultRouter()
 router.register(r'video', VideoViewSet, basename='video')
 
 
 urlpatterns = [
+    path('uploads/', UploadSessionListView.as_view(), name='upload_sessions'),
+    path('uploads/<uuid:session_id>/', UploadSessionDetailView.as_view(), name='upload_session'),
+    path('uploads/<uuid:session_id>/complete/', UploadSessionCompleteView.as_view(), name='upload_session_complete'),
+    path('video/<int:movie_id>/status/', VideoStatusView.as_view(), name='video_status'),
+    path('video/<int:movie_id>/master.m3u8', HLSMasterPlaylistView.as_view(), name='hls_master_playlist'),
+    path('video/<int:movie_id>/trickplay/<str:filename>', TrickplayView.as_view(), name='trickplay'),
     path('video/<int:movie_id>/<str:resolution>/index.m3u8', HLSPlaylistView.as_view(), name='hls_playlist'),
+    path('video/<int:movie_id>/<str:resolution>/init.mp4', HLSSegmentView.as_view(), {'segment': 'init.mp4'},
+         name='hls_init_segment'),
     path('video/<int:movie_id>/<str:resolution>/<str:segment>/', HLSSegmentView.as_view(), name='hls_segment')
 ]
 
@@ -1,22 +1,53 @@
+import django_rq
 from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import viewsets, status
-from content_app.models import Video
-from content_app.api.serializers import VideoSerializer
+from content_app.models import UploadSession, Video
+from content_app.api.serializers import UploadSessionSerializer, VideoSerializer
+from content_app.hls import get_hls_dir, is_playlist_ended
+from content_app.pipeline import get_video_status
+from content_app.tasks import complete_upload, get_job_retry
+from content_app.upload_handlers import install_upload_handler
+from content_app.uploads import UploadOffsetConflict, UploadRejected, append_chunk, get_received_size
 from .serializers import FileUploadSerializer
-from django.conf import settings
 import os
 
+# Content types of the HLS segment containers (RFC 8216, ISO BMFF segments).
+SEGMENT_CONTENT_TYPES = {
+    '.ts': 'video/MP2T',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+}
+TRICKPLAY_CONTENT_TYPES = {
+    '.vtt': 'text/vtt',
+    '.jpg': 'image/jpeg',
+}
+# Content type of the chunks of a resumable upload (as in the tus protocol).
+UPLOAD_CHUNK_CONTENT_TYPE = 'application/offset+octet-stream'
+
 
 class FileUploadView(APIView):
+    def initialize_request(self, request, *args, **kwargs):
+        """
+        Installs the hashing upload handler before the upload is parsed, so
+        the file is hashed and checked while it is received.
+        """
+        install_upload_handler(request, ['file'])
+        return super().initialize_request(request, *args, **kwargs)
+
     def post(self, request, format=None):
         """
         Handles the POST request to upload a file.
 
         The method validates the uploaded data using FileUploadSerializer.
         If the data is valid, a new FileUpload instance is created and saved.
+        Files the upload handler rejected while they were received (see
+        `upload_handlers.ContentHashUploadHandler`) are reported with the
+        reason.
         
         Args:
             request (Request): The incoming request object.
@@ -28,6 +59,10 @@ class FileUploadView(APIView):
                       (HTTP 400).
         """
         serializer = FileUploadSerializer(data=request.data)
+        rejected_uploads = getattr(request, 'rejected_uploads', {})
+        if rejected_uploads:
+            return Response({field: [message] for field, message in rejected_uploads.items()},
+                            status=status.HTTP_400_BAD_REQUEST)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -45,12 +80,104 @@ class VideoViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = VideoSerializer
 
 
+class VideoStatusView(APIView):
+    """
+    View to report the processing state of a video.
+
+    The state is read from Redis only: the RQ job of every pipeline stage
+    and the progress FFmpeg publishes while it runs. Clients can poll this
+    view instead of requesting playlists that do not exist yet.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, movie_id):
+        """
+        Handles the GET request to retrieve the processing state of a video.
+
+        Args:
+            request (Request): The incoming request object.
+            movie_id (int): The primary key of the Video instance.
+
+        Returns:
+            Response: The stages of the pipeline with their job status and
+                      progress, and the progress of every rendition.
+
+        Raises:
+            Http404: If no pipeline is recorded and the video does not exist.
+        """
+        video_status = get_video_status(movie_id)
+
+        if not video_status['stages'] and not Video.objects.filter(pk=movie_id).exists():
+            raise Http404("Video not found.")
+
+        return Response({'id': movie_id, **video_status})
+
+
+def get_video_hls_dir(movie_id, *parts):
+    """
+    Returns the HLS directory of a video, which is named after its content
+    hash and may be shared with duplicate uploads.
+
+    Args:
+        movie_id (int): The primary key of the Video instance.
+        *parts (str): Optional subdirectories and filename.
+
+    Returns:
+        str: The absolute path.
+
+    Raises:
+        Http404: If the video does not exist.
+    """
+    video = Video.objects.filter(pk=movie_id).only('content_hash').first()
+    if video is None:
+        raise Http404("Video not found.")
+    return get_hls_dir(video.media_key, *parts)
+
+
+class HLSMasterPlaylistView(APIView):
+    """
+    View to serve the master playlist (master.m3u8) of a video.
+
+    The master playlist lists every rendition with its bandwidth,
+    resolution and codecs, so players can switch between them. It is
+    first written while a long video is still transcoding and replaced
+    when all streams are complete, so it must not be cached.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, movie_id):
+        """
+        Handles the GET request to retrieve the master playlist.
+
+        Args:
+            request (Request): The incoming request object.
+            movie_id (int): The primary key of the Video instance.
+
+        Returns:
+            FileResponse: The master playlist file if found.
+
+        Raises:
+            Http404: If the master playlist does not exist (yet).
+        """
+        file_path = get_video_hls_dir(movie_id, "master.m3u8")
+
+        if not os.path.exists(file_path):
+            raise Http404("Master playlist not found")
+
+        response = FileResponse(open(file_path, 'rb'), content_type='application/vnd.apple.mpegurl')
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
 class HLSPlaylistView(APIView):
     """
     View to serve the HLS playlist file (.m3u8) for a video.
     
     This view ensures that the requested file exists and returns it as a
-    FileResponse with the appropriate content type.
+    FileResponse with the appropriate content type. A playlist that is
+    still growing (an EVENT playlist without `#EXT-X-ENDLIST`) is served
+    with `Cache-Control: no-cache`, so players see new segments when they
+    reload it.
     """
     permission_classes = [IsAuthenticated]
 
@@ -69,17 +196,21 @@ class HLSPlaylistView(APIView):
         Raises:
             Http404: If the specified playlist file does not exist.
         """
-        file_path = os.path.join(settings.MEDIA_ROOT, "hls", str(movie_id), resolution, "index.m3u8")
+        file_path = get_video_hls_dir(movie_id, resolution, "index.m3u8")
 
         if not os.path.exists(file_path):
             raise Http404("HLS Playlist not found")
 
-        return FileResponse(open(file_path, 'rb'), content_type='application/vnd.apple.mpegurl')
+        response = FileResponse(open(file_path, 'rb'), content_type='application/vnd.apple.mpegurl')
+        if not is_playlist_ended(file_path):
+            response['Cache-Control'] = 'no-cache'
+        return response
 
 
 class HLSSegmentView(APIView):
     """
-    View to serve individual HLS video segments (.ts).
+    View to serve individual HLS video segments (.ts or .m4s) and the init
+    segment (init.mp4) of fMP4 streams.
     
     This view provides access to the video segments that make up an HLS stream.
     """
@@ -96,15 +227,223 @@ class HLSSegmentView(APIView):
             segment (str): The filename of the video segment.
 
         Returns:
-            FileResponse: The video segment file if found.
+            FileResponse: The video segment file if found, with the content
+                          type of its container.
 
         Raises:
             Http404: If the specified segment file does not exist.
         """
-        file_path = os.path.join(settings.MEDIA_ROOT, "hls", str(movie_id), resolution, segment)
+        file_path = get_video_hls_dir(movie_id, resolution, segment)
 
         if not os.path.exists(file_path):
             raise Http404("Segment not found.")
 
-        return FileResponse(open(file_path, 'rb'), content_type='video/MP2T')
-    
\ No newline at end of file
+        content_type = SEGMENT_CONTENT_TYPES.get(os.path.splitext(segment)[1], 'application/octet-stream')
+        return FileResponse(open(file_path, 'rb'), content_type=content_type)
+
+
+class TrickplayView(APIView):
+    """
+    View to serve the scrub bar previews of a video: the WebVTT index
+    (index.vtt) and the sprite sheets it references.
+
+    One sprite sheet holds the thumbnails of many positions, so players
+    fetch a few images instead of one per position.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, movie_id, filename):
+        """
+        Handles the GET request for the trickplay index or a sprite sheet.
+
+        Args:
+            request (Request): The incoming request object.
+            movie_id (int): The primary key of the Video instance.
+            filename (str): 'index.vtt' or the filename of a sprite sheet.
+
+        Returns:
+            FileResponse: The requested file with its content type.
+
+        Raises:
+            Http404: If the file does not exist (yet) or is not a trickplay file.
+        """
+        content_type = TRICKPLAY_CONTENT_TYPES.get(os.path.splitext(filename)[1])
+        file_path = get_video_hls_dir(movie_id, "trickplay", filename)
+
+        if content_type is None or not os.path.exists(file_path):
+            raise Http404("Trickplay file not found.")
+
+        return FileResponse(open(file_path, 'rb'), content_type=content_type)
+
+
+class UploadSessionListView(APIView):
+    """
+    View to start a resumable, chunked upload of a source video.
+
+    The session is created with the size of the file and the metadata of
+    the video. The content is then sent to the session in chunks (see
+    `UploadSessionDetailView`) and the session is completed (see
+    `UploadSessionCompleteView`), which creates the video.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Handles the POST request to create an upload session.
+
+        Args:
+            request (Request): The incoming request object.
+
+        Returns:
+            Response: The session with its id (HTTP 201) and its URL in the
+                      Location header, or the validation errors (HTTP 400).
+        """
+        serializer = UploadSessionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        session = serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers={
+            'Location': reverse('upload_session', args=[session.pk]),
+            'Upload-Offset': '0',
+        })
+
+
+class UploadSessionDetailView(APIView):
+    """
+    View to query, continue or cancel a resumable upload.
+
+    Every chunk is sent as the raw body of a PATCH request with the offset
+    it starts at in the Upload-Offset header, and is streamed to the end of
+    the partial file. After an interrupted request the client reads the
+    received size (GET or HEAD) and continues from there.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_session(self, request, session_id):
+        """
+        Returns the upload session of the requesting user.
+
+        Raises:
+            Http404: If the session does not exist or belongs to another user.
+        """
+        return get_object_or_404(UploadSession, pk=session_id, user=request.user)
+
+    def get(self, request, session_id):
+        """
+        Handles the GET (and HEAD) request for the state of an upload.
+
+        Args:
+            request (Request): The incoming request object.
+            session_id (UUID): The id of the upload session.
+
+        Returns:
+            Response: The session, with the received size in the
+                      Upload-Offset header.
+        """
+        session = self.get_session(request, session_id)
+        session.offset = get_received_size(session) if not session.video_id else session.size
+        return Response(UploadSessionSerializer(session).data, headers={
+            'Upload-Offset': str(session.offset),
+            'Cache-Control': 'no-store',
+        })
+
+    def patch(self, request, session_id):
+        """
+        Handles the PATCH request that appends a chunk to an upload.
+
+        Args:
+            request (Request): The incoming request object. The body is the
+                               raw chunk, sent as
+                               application/offset+octet-stream.
+            session_id (UUID): The id of the upload session.
+
+        Returns:
+            Response: HTTP 204 with the received size in the Upload-Offset
+                      header; HTTP 409 with the size to continue from if the
+                      chunk does not start there or the upload is already
+                      complete; HTTP 415 for other content types; HTTP 400 if
+                      the offset is missing, the chunk exceeds the
+                      announced size or the file is not a supported video,
+                      in which case the session is removed.
+        """
+        session = self.get_session(request, session_id)
+        if request.content_type != UPLOAD_CHUNK_CONTENT_TYPE:
+            return Response({'detail': f"Chunks must be sent as {UPLOAD_CHUNK_CONTENT_TYPE}."},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response({'detail': "The Upload-Offset header is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if session.video_id:
+            return Response({'detail': "The upload is already complete."}, status=status.HTTP_409_CONFLICT,
+                            headers={'Upload-Offset': str(session.size)})
+
+        try:
+            received = append_chunk(session, offset, request.stream)
+        except UploadOffsetConflict as e:
+            return Response({'detail': str(e), 'offset': e.offset}, status=status.HTTP_409_CONFLICT,
+                            headers={'Upload-Offset': str(e.offset)})
+        except UploadRejected as e:
+            session.delete()
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST,
+                            headers={'Upload-Offset': str(session.offset)})
+
+        return Response(status=status.HTTP_204_NO_CONTENT, headers={'Upload-Offset': str(received)})
+
+    def delete(self, request, session_id):
+        """
+        Handles the DELETE request that cancels an upload and removes the
+        received content. The video of a completed upload is kept.
+
+        Args:
+            request (Request): The incoming request object.
+            session_id (UUID): The id of the upload session.
+
+        Returns:
+            Response: HTTP 204.
+        """
+        self.get_session(request, session_id).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionCompleteView(APIView):
+    """
+    View to complete a resumable upload.
+
+    The received file becomes the source of a new video, which is processed
+    like any other upload. Hashing and moving the file run in an RQ job
+    (see `tasks.complete_upload`); the client polls the session until its
+    `video` is set.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, session_id):
+        """
+        Handles the POST request to complete an upload session.
+
+        Args:
+            request (Request): The incoming request object.
+            session_id (UUID): The id of the upload session.
+
+        Returns:
+            Response: The created video (HTTP 200) if the session was
+                      completed before; the session (HTTP 202) with its URL
+                      in the Location header once the completion is
+                      enqueued; or HTTP 409 with the received size if the
+                      file is not complete yet.
+        """
+        session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+        if session.video_id:
+            return Response(VideoSerializer(session.video, context={'request': request}).data)
+
+        received = get_received_size(session)
+        if received != session.size:
+            return Response({'detail': "The upload is not complete yet.", 'offset': received},
+                            status=status.HTTP_409_CONFLICT, headers={'Upload-Offset': str(received)})
+
+        django_rq.get_queue('default').enqueue(complete_upload, session.pk, retry=get_job_retry())
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': reverse('upload_session', args=[session.pk])})
@@ -0,0 +1,127 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+
+def get_marker_path(media_key, name):
+    """
+    Returns the path of a completion marker.
+
+    Args:
+        media_key (str): The media key of the video (see `Video.media_key`),
+                         shared by all uploads of the same content.
+        name (str): The name of the completed unit of work, e.g.
+                    'rendition_480p', 'hls_720p' or 'chunk_0003_480p'.
+
+    Returns:
+        str: The absolute path of the marker file.
+    """
+    return os.path.join(settings.MEDIA_ROOT, 'markers', str(media_key), f'{name}.json')
+
+
+def get_file_checksum(path):
+    """
+    Calculates the SHA-256 checksum of a file.
+
+    Args:
+        path (str): The full path to the file.
+
+    Returns:
+        str: The hex digest.
+    """
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(CHECKSUM_BLOCK_SIZE), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def write_marker(media_key, name, paths):
+    """
+    Records that a unit of work finished, with the size, modification time
+    and checksum of every file it produced.
+
+    The marker is written to a temporary file and renamed, so it is either
+    complete or absent, even if the worker dies while writing it.
+
+    Args:
+        media_key (str): The media key of the video (see `Video.media_key`).
+        name (str): The name of the completed unit of work.
+        paths (iterable): The full paths of the output files.
+
+    Raises:
+        FileNotFoundError: If one of the outputs does not exist.
+    """
+    outputs = {
+        os.path.relpath(path, settings.MEDIA_ROOT): {
+            'size': os.path.getsize(path),
+            'mtime_ns': os.stat(path).st_mtime_ns,
+            'sha256': get_file_checksum(path),
+        }
+        for path in paths
+    }
+    marker_path = get_marker_path(media_key, name)
+    os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+    temp_path = f'{marker_path}.tmp'
+    with open(temp_path, 'w') as marker:
+        json.dump({'completed_at': time.time(), 'outputs': outputs}, marker)
+    os.replace(temp_path, marker_path)
+
+
+def is_complete(media_key, name, verify=False):
+    """
+    Checks whether a unit of work finished and its outputs are intact.
+
+    By default only the size and modification time of every output are
+    compared, which costs a `stat` per file; a truncated or rewritten output
+    changes at least one of them. Stages use this to check the work of
+    other stages. A stage that resumes its own work after a crash passes
+    `verify`, which also compares the checksum and thus reads every output.
+
+    Args:
+        media_key (str): The media key of the video (see `Video.media_key`).
+        name (str): The name of the unit of work.
+        verify (bool, optional): Whether to compare the checksums as well.
+
+    Returns:
+        bool: True if the marker exists and every recorded output still has
+              the recorded size and modification time (and checksum).
+    """
+    try:
+        with open(get_marker_path(media_key, name)) as marker:
+            outputs = json.load(marker)['outputs']
+    except (OSError, ValueError, KeyError):
+        return False
+
+    for relative_path, recorded in outputs.items():
+        path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        try:
+            stat = os.stat(path)
+            if (stat.st_size != recorded['size']
+                    or stat.st_mtime_ns != recorded.get('mtime_ns', stat.st_mtime_ns)
+                    or (verify and get_file_checksum(path) != recorded['sha256'])):
+                logger.warning(f"Output {relative_path} of {name} for {media_key} changed, redoing it.")
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def clear_markers(media_key, pattern='*'):
+    """
+    Removes completion markers so the matching work is done again.
+
+    Args:
+        media_key (str): The media key of the video (see `Video.media_key`).
+        pattern (str, optional): A glob pattern for the marker names.
+    """
+    for marker_path in glob.glob(get_marker_path(media_key, pattern)):
+        os.remove(marker_path)
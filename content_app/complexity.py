@@ -0,0 +1,219 @@
+import math
+import os
+import subprocess
+import tempfile
+from django.conf import settings
+from .scheduling import get_thread_args
+
+# The CRF of the trial encode. Rungs with another CRF are estimated with the
+# x264 rule of thumb that six CRF steps halve or double the bitrate.
+ANALYSIS_CRF = 23
+# Bits grow slower than the pixel count: larger frames have more redundancy.
+PIXEL_SCALING_EXPONENT = 0.75
+# A per-title cap is never lower than this fraction of the ladder's cap, so
+# scene changes in otherwise static videos still get enough bits.
+MIN_MAXRATE_FRACTION = 0.25
+
+
+def parse_bitrate(bitrate):
+    """
+    Converts an FFmpeg bitrate such as '1400k' or '5M' into bits per second.
+
+    Args:
+        bitrate (str or int): The bitrate.
+
+    Returns:
+        int: The bitrate in bits per second.
+    """
+    value = str(bitrate).strip()
+    multiplier = {'k': 1000, 'K': 1000, 'm': 1000 ** 2, 'M': 1000 ** 2}.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+def get_sample_offsets(duration):
+    """
+    Spreads the samples of the trial encode evenly over the video.
+
+    Args:
+        duration (float): The duration of the source in seconds.
+
+    Returns:
+        list: The start times of the samples in seconds. A video that is
+              shorter than all samples together is analysed as a whole,
+              with a single sample at 0.
+    """
+    samples = settings.VIDEO_ANALYSIS_SAMPLES
+    sample_duration = settings.VIDEO_ANALYSIS_SAMPLE_DURATION
+    if duration <= samples * sample_duration:
+        return [0]
+    return [(duration - sample_duration) * (index + 1) / (samples + 1) for index in range(samples)]
+
+
+def get_analysis_height(source_height):
+    """
+    Returns the height of the trial encode, never above the source height.
+
+    Args:
+        source_height (int or None): The height of the source video.
+
+    Returns:
+        int: The height in pixels.
+    """
+    return min(settings.VIDEO_ANALYSIS_HEIGHT, source_height or settings.VIDEO_ANALYSIS_HEIGHT)
+
+
+def build_analysis_command(source_path, offsets, sample_duration, height, output_path):
+    """
+    Builds the FFmpeg command of the trial encode.
+
+    Every sample is read with input seeking, so only the sampled seconds are
+    decoded. The samples are scaled down, joined and encoded with a fast
+    preset at ANALYSIS_CRF, within the worker's thread budget.
+
+    Args:
+        source_path (str): The full path to the source video.
+        offsets (list): The start times of the samples in seconds.
+        sample_duration (float): The duration of every sample in seconds.
+        height (int): The height of the trial encode.
+        output_path (str): The full path to the trial encode.
+
+    Returns:
+        list: The FFmpeg command as a list of arguments.
+    """
+    thread_args = get_thread_args()
+    ffmpeg_cmd = ['ffmpeg', '-v', 'error', '-y']
+    for offset in offsets:
+        ffmpeg_cmd += ['-ss', f'{offset:.3f}', '-t', str(sample_duration), *thread_args, '-i', source_path]
+    if thread_args:
+        ffmpeg_cmd += ['-filter_complex_threads', thread_args[1]]
+    filters = [f'[{index}:v]scale=-2:{height},setsar=1[s{index}]' for index in range(len(offsets))]
+    labels = ''.join(f'[s{index}]' for index in range(len(offsets)))
+    filters.append(f'{labels}concat=n={len(offsets)}:v=1:a=0[out]')
+    ffmpeg_cmd += [
+        '-filter_complex', ';'.join(filters),
+        '-map', '[out]', '-an',
+        '-c:v', 'libx264', '-crf', str(ANALYSIS_CRF), '-preset', 'veryfast', *thread_args,
+        output_path
+    ]
+    return ffmpeg_cmd
+
+
+def measure_complexity(source_path, metadata):
+    """
+    Measures how hard a video is to compress with a short trial encode.
+
+    Samples spread over the video are encoded at a low resolution and a
+    fixed CRF. The bits per pixel of the result grow with motion, detail
+    and noise: a slideshow needs a fraction of the bits of an action scene
+    for the same quality.
+
+    Args:
+        source_path (str): The full path to the source video.
+        metadata (dict): The probed metadata (see `tasks.parse_probe_output`).
+
+    Returns:
+        float: The bits per pixel of the trial encode.
+
+    Raises:
+        ValueError: If the duration or dimensions of the source are unknown.
+        subprocess.CalledProcessError: If the trial encode fails.
+    """
+    duration = metadata['duration']
+    if not duration or not metadata['width'] or not metadata['height']:
+        raise ValueError("the duration and dimensions of the source are required")
+
+    offsets = get_sample_offsets(duration)
+    sample_duration = min(duration, settings.VIDEO_ANALYSIS_SAMPLE_DURATION)
+    height = get_analysis_height(metadata['height'])
+    width = math.ceil(metadata['width'] * height / metadata['height'] / 2) * 2
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, 'analysis.mp4')
+        subprocess.run(build_analysis_command(source_path, offsets, sample_duration, height, output_path),
+                       check=True, capture_output=True)
+        bits = os.path.getsize(output_path) * 8
+
+    frames = len(offsets) * sample_duration * (metadata['frame_rate'] or 25)
+    return bits / (frames * width * height)
+
+
+def get_crf_offset(complexity):
+    """
+    Returns how much the CRF of a video is raised for its complexity.
+
+    Motion and detail mask compression artefacts, so complex videos keep
+    their perceived quality at a higher CRF.
+
+    Args:
+        complexity (float): The bits per pixel of the trial encode.
+
+    Returns:
+        int: The CRF offset from VIDEO_COMPLEXITY_CRF_OFFSETS.
+    """
+    for max_complexity, offset in settings.VIDEO_COMPLEXITY_CRF_OFFSETS:
+        if max_complexity is None or complexity <= max_complexity:
+            return offset
+    return 0
+
+
+def get_title_ladder(resolutions, complexity, frame_rate):
+    """
+    Derives the encoding ladder of a single video from its complexity.
+
+    For every rung the bitrate the video needs at the rung's CRF is
+    estimated from the trial encode, scaling the bits per frame with the
+    pixel count to the power of PIXEL_SCALING_EXPONENT. The CRF is raised
+    by `get_crf_offset`, and the cap is lowered to VIDEO_MAXRATE_HEADROOM
+    times the estimate (but not below MIN_MAXRATE_FRACTION of the ladder's
+    cap), so simple videos do not reserve bandwidth they never use.
+
+    A rung that needs less than VIDEO_MIN_RUNG_STEP more than the rung
+    below adds no visible detail: the content is so flat that the extra
+    pixels carry almost no information. It is dropped together with all
+    higher rungs, whose step over the last kept rung is measured the same
+    way. The ratio between neighbouring rungs is fixed by the pixel
+    scaling, so the step is measured in bits per second, which grows with
+    the complexity: complex videos keep every rung up to the top. The
+    lowest rung is always kept.
+
+    Args:
+        resolutions (list): The resolutions worth encoding, ascending.
+        complexity (float or None): The bits per pixel of the trial encode;
+                                    None uses VIDEO_ENCODING_LADDER as is.
+        frame_rate (float or None): The frame rate of the source.
+
+    Returns:
+        dict: The rung ('crf', 'maxrate', 'bufsize') of every resolution
+              that is kept.
+    """
+    if complexity is None:
+        return {resolution: dict(settings.VIDEO_ENCODING_LADDER[resolution]) for resolution in resolutions}
+
+    crf_offset = get_crf_offset(complexity)
+    analysis_pixels = math.ceil(settings.VIDEO_ANALYSIS_HEIGHT * 16 / 9) * settings.VIDEO_ANALYSIS_HEIGHT
+    min_step = parse_bitrate(settings.VIDEO_MIN_RUNG_STEP)
+    ladder = {}
+    previous_needed = None
+    for resolution in resolutions:
+        rung = settings.VIDEO_ENCODING_LADDER[resolution]
+        crf = rung['crf'] + crf_offset
+        pixels = math.ceil(resolution * 16 / 9) * resolution
+        bits_per_frame = complexity * analysis_pixels * (pixels / analysis_pixels) ** PIXEL_SCALING_EXPONENT
+        needed = bits_per_frame * (frame_rate or 25) * 2 ** ((ANALYSIS_CRF - crf) / 6)
+        max_bitrate = parse_bitrate(rung['maxrate'])
+
+        if previous_needed is not None and needed - previous_needed < min_step:
+            break
+        previous_needed = needed
+
+        maxrate = min(max_bitrate, max(needed * settings.VIDEO_MAXRATE_HEADROOM,
+                                       max_bitrate * MIN_MAXRATE_FRACTION))
+        bufsize = maxrate * parse_bitrate(rung['bufsize']) / max_bitrate
+        ladder[resolution] = {
+            'crf': crf,
+            'maxrate': f'{math.ceil(maxrate / 1000)}k',
+            'bufsize': f'{math.ceil(bufsize / 1000)}k',
+        }
+    return ladder
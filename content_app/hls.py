@@ -0,0 +1,302 @@
+import math
+import os
+import shutil
+from django.conf import settings
+
+# The initialization segment (ftyp + moov) of fMP4 streams, next to their
+# media segments.
+INIT_SEGMENT_NAME = 'init.mp4'
+
+def get_hls_dir(media_key, *parts):
+    """
+    Returns the directory of a video's HLS streams.
+
+    Args:
+        media_key (str): The media key of the video (see `Video.media_key`).
+        *parts (str): Optional subdirectories, e.g. the resolution '480p'.
+
+    Returns:
+        str: The absolute path of the directory.
+    """
+    return os.path.join(settings.MEDIA_ROOT, 'hls', str(media_key), *parts)
+
+
+def read_playlist_segments(playlist_path):
+    """
+    Reads the segments listed in an HLS media playlist.
+
+    Args:
+        playlist_path (str): The full path to the playlist.
+
+    Returns:
+        list: (duration, filename) tuples in playlist order; an empty list
+              if the playlist does not exist.
+    """
+    if not os.path.exists(playlist_path):
+        return []
+
+    segments = []
+    duration = None
+    with open(playlist_path) as playlist:
+        for line in playlist:
+            line = line.strip()
+            if line.startswith('#EXTINF:'):
+                duration = float(line[len('#EXTINF:'):].split(',')[0])
+            elif line and not line.startswith('#') and duration is not None:
+                segments.append((duration, os.path.basename(line)))
+                duration = None
+    return segments
+
+
+def read_init_segment(playlist_path):
+    """
+    Reads the initialization segment (`#EXT-X-MAP`) of an HLS media playlist.
+
+    Args:
+        playlist_path (str): The full path to the playlist.
+
+    Returns:
+        str or None: The filename of the init segment; None for MPEG-TS
+                     streams or if the playlist does not exist.
+    """
+    if not os.path.exists(playlist_path):
+        return None
+    with open(playlist_path) as playlist:
+        for line in playlist:
+            line = line.strip()
+            if line.startswith('#EXT-X-MAP:'):
+                uri = line.split('URI="', 1)[1].split('"', 1)[0]
+                return os.path.basename(uri)
+    return None
+
+
+def get_segment_targets(startup=True):
+    """
+    Yields the target duration of every segment of a stream.
+
+    Args:
+        startup (bool, optional): Whether the segments start the stream.
+                                  Segments that continue it (e.g. of a
+                                  later chunk) have no startup segments.
+
+    Yields:
+        float: The durations of VIDEO_STARTUP_SEGMENTS, then
+               VIDEO_SEGMENT_DURATION for all further segments.
+    """
+    if startup:
+        yield from settings.VIDEO_STARTUP_SEGMENTS
+    while True:
+        yield settings.VIDEO_SEGMENT_DURATION
+
+
+def get_live_target_duration():
+    """
+    Returns the `#EXT-X-TARGETDURATION` of playlists published while they grow.
+
+    The target duration of a playlist must not change, but a joined segment
+    can exceed its target by up to one part.
+
+    Returns:
+        int: VIDEO_SEGMENT_DURATION plus VIDEO_KEYFRAME_INTERVAL.
+    """
+    return settings.VIDEO_SEGMENT_DURATION + settings.VIDEO_KEYFRAME_INTERVAL
+
+
+def coalesce_segments(stream_dir, parts, segment_base, startup=True):
+    """
+    Joins short packaged parts into the segments of the final playlist.
+
+    Streams are packaged in parts of one keyframe interval, which start at
+    the same timestamps in every rendition. Consecutive parts are joined
+    until a segment reaches its target from `get_segment_targets`, so the
+    first segments are short and segment boundaries stay aligned across
+    renditions. MPEG-TS and fMP4 media segments can be joined byte by byte.
+
+    Args:
+        stream_dir (str): The directory of the stream.
+        parts (list): (duration, filename) tuples of the parts.
+        segment_base (str): The filename prefix of the segments.
+        startup (bool, optional): Whether the parts start the stream (see
+                                  `get_segment_targets`).
+
+    Returns:
+        list: (duration, filename) tuples of the written segments.
+    """
+    tolerance = settings.VIDEO_KEYFRAME_INTERVAL / 2
+    groups = []
+    targets = get_segment_targets(startup)
+    target = next(targets)
+    for duration, filename in parts:
+        if not groups or sum(part_duration for part_duration, _ in groups[-1]) >= target - tolerance:
+            if groups:
+                target = next(targets)
+            groups.append([])
+        groups[-1].append((duration, filename))
+
+    segments = []
+    for index, group in enumerate(groups):
+        filename = f'{segment_base}_{index:03d}{os.path.splitext(group[0][1])[1]}'
+        temp_path = os.path.join(stream_dir, f'{filename}.tmp')
+        with open(temp_path, 'wb') as segment:
+            for _, part_filename in group:
+                with open(os.path.join(stream_dir, part_filename), 'rb') as part:
+                    shutil.copyfileobj(part, segment)
+        os.replace(temp_path, os.path.join(stream_dir, filename))
+        segments.append((sum(duration for duration, _ in group), filename))
+    return segments
+
+
+def is_playlist_ended(playlist_path):
+    """
+    Checks whether an HLS media playlist is complete (has `#EXT-X-ENDLIST`).
+
+    Args:
+        playlist_path (str): The full path to the playlist.
+
+    Returns:
+        bool: True if the playlist exists and is ended.
+    """
+    if not os.path.exists(playlist_path):
+        return False
+    with open(playlist_path) as playlist:
+        return any(line.strip() == '#EXT-X-ENDLIST' for line in playlist)
+
+
+def write_media_playlist(playlist_path, segments, ended=True, init_segment=None, target_duration=None,
+                         discontinuity=None):
+    """
+    Writes an HLS media playlist for the given segments.
+
+    The playlist is written to a temporary file and renamed, so players
+    never see a half-written playlist.
+
+    Args:
+        playlist_path (str): The full path to the playlist.
+        segments (list): (duration, filename) tuples in playback order.
+        ended (bool, optional): Whether all segments are listed. An ended
+                                playlist is marked as VOD; otherwise it is
+                                an EVENT playlist that may still grow.
+        init_segment (str, optional): The filename of the init segment of
+                                      fMP4 segments, listed as
+                                      `#EXT-X-MAP` (protocol version 7).
+        target_duration (int, optional): The `#EXT-X-TARGETDURATION`.
+                                         Defaults to the longest segment.
+        discontinuity (int, optional): The index of the first segment whose
+                                       tracks differ from the segments
+                                       before, marked with
+                                       `#EXT-X-DISCONTINUITY`.
+    """
+    if target_duration is None:
+        target_duration = math.ceil(max((duration for duration, _ in segments), default=0))
+    lines = [
+        '#EXTM3U',
+        f"#EXT-X-VERSION:{7 if init_segment else 3}",
+        f'#EXT-X-TARGETDURATION:{target_duration}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        f"#EXT-X-PLAYLIST-TYPE:{'VOD' if ended else 'EVENT'}",
+    ]
+    if init_segment:
+        lines.append(f'#EXT-X-MAP:URI="{init_segment}"')
+    for index, (duration, filename) in enumerate(segments):
+        if index == discontinuity:
+            lines.append('#EXT-X-DISCONTINUITY')
+        lines += [f'#EXTINF:{duration:.6f},', filename]
+    if ended:
+        lines.append('#EXT-X-ENDLIST')
+
+    temp_path = f'{playlist_path}.tmp'
+    with open(temp_path, 'w') as playlist:
+        playlist.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, playlist_path)
+
+
+# RFC 6381 profile_idc and constraint flags of the H.264 profiles FFmpeg reports.
+H264_PROFILES = {
+    'Constrained Baseline': '42e0',
+    'Baseline': '4200',
+    'Main': '4d40',
+    'Extended': '5800',
+    'High': '6400',
+    'High 10': '6e00',
+}
+AAC_OBJECT_TYPES = {'LC': 2, 'HE-AAC': 5, 'HE-AACv2': 29}
+
+
+def get_codecs(streams):
+    """
+    Builds the `CODECS` attribute of a variant stream from ffprobe streams.
+
+    Args:
+        streams (list): The streams reported by `ffprobe -show_streams`.
+
+    Returns:
+        str: The RFC 6381 codec identifiers, e.g. 'avc1.64001f,mp4a.40.2'.
+    """
+    codecs = []
+    for stream in streams:
+        if stream.get('codec_name') == 'h264':
+            profile = H264_PROFILES.get(stream.get('profile'), H264_PROFILES['High'])
+            codecs.append(f"avc1.{profile}{int(stream.get('level') or 0):02x}")
+        elif stream.get('codec_name') == 'aac':
+            codecs.append(f"mp4a.40.{AAC_OBJECT_TYPES.get(stream.get('profile'), 2)}")
+    return ','.join(codecs)
+
+
+def get_stream_bandwidth(stream_dir, segments):
+    """
+    Measures the bandwidth of a packaged stream from its segment sizes.
+
+    Args:
+        stream_dir (str): The directory of the stream.
+        segments (list): (duration, filename) tuples of its playlist.
+
+    Returns:
+        dict: 'bandwidth', the peak segment bitrate, and
+              'average_bandwidth', the bitrate over the whole stream, both in
+              bits per second.
+    """
+    sizes = [(duration, os.path.getsize(os.path.join(stream_dir, filename))) for duration, filename in segments]
+    total_duration = sum(duration for duration, _ in sizes)
+    return {
+        'bandwidth': max((math.ceil(size * 8 / duration) for duration, size in sizes if duration > 0), default=0),
+        'average_bandwidth': math.ceil(sum(size for _, size in sizes) * 8 / total_duration) if total_duration else 0,
+    }
+
+
+def write_master_playlist(playlist_path, variants, audio=None):
+    """
+    Writes an HLS multivariant (master) playlist.
+
+    Variants are listed by ascending bandwidth. With an audio rendition,
+    the variants are video-only and all reference the same audio group.
+
+    Args:
+        playlist_path (str): The full path to the master playlist.
+        variants (list): Dicts with the keys 'uri', 'bandwidth',
+                         'average_bandwidth', 'resolution' ('<w>x<h>'),
+                         'codecs' and 'frame_rate' (optional). Bandwidth
+                         and codecs include the audio rendition.
+        audio (dict, optional): The audio rendition, with the keys 'uri',
+                                'group_id' and 'name'.
+    """
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-INDEPENDENT-SEGMENTS']
+    if audio:
+        lines.append(f"#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID=\"{audio['group_id']}\",NAME=\"{audio['name']}\","
+                     f"DEFAULT=YES,AUTOSELECT=YES,URI=\"{audio['uri']}\"")
+    for variant in sorted(variants, key=lambda variant: variant['bandwidth']):
+        attributes = [
+            f"BANDWIDTH={variant['bandwidth']}",
+            f"AVERAGE-BANDWIDTH={variant['average_bandwidth']}",
+            f"RESOLUTION={variant['resolution']}",
+            f"CODECS=\"{variant['codecs']}\"",
+        ]
+        if variant.get('frame_rate'):
+            attributes.append(f"FRAME-RATE={variant['frame_rate']:.3f}")
+        if audio:
+            attributes.append(f"AUDIO=\"{audio['group_id']}\"")
+        lines += [f"#EXT-X-STREAM-INF:{','.join(attributes)}", variant['uri']]
+
+    temp_path = f'{playlist_path}.tmp'
+    with open(temp_path, 'w') as playlist:
+        playlist.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, playlist_path)
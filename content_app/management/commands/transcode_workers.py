@@ -0,0 +1,192 @@
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from content_app.scheduling import get_worker_queues
+
+logger = logging.getLogger(__name__)
+
+MAX_RESTART_DELAY = 60
+
+
+def get_available_cpus():
+    """
+    Returns the CPUs this process may run on.
+
+    Respects container CPU sets and an affinity inherited from the parent.
+
+    Returns:
+        list: The sorted CPU numbers.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def get_total_memory_mb():
+    """
+    Returns the physical memory of this node in megabytes.
+
+    Returns:
+        int or None: The memory, or None if the platform does not report it.
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def get_pool_size(cpu_count, memory_mb, threads, memory_per_worker_mb):
+    """
+    Calculates how many workers saturate the node without oversubscribing it.
+
+    Args:
+        cpu_count (int): The number of available CPUs.
+        memory_mb (int or None): The physical memory in megabytes.
+        threads (int): The FFmpeg thread budget of each worker.
+        memory_per_worker_mb (int): The memory one worker needs.
+
+    Returns:
+        int: The number of workers, at least 1.
+    """
+    workers = cpu_count // threads
+    if memory_mb and memory_per_worker_mb:
+        workers = min(workers, memory_mb // memory_per_worker_mb)
+    return max(1, workers)
+
+
+def get_cpu_sets(cpus, workers, threads):
+    """
+    Assigns every worker its own block of CPUs.
+
+    Args:
+        cpus (list): The available CPU numbers.
+        workers (int): The number of workers.
+        threads (int): The number of CPUs per worker.
+
+    Returns:
+        list: One set of CPU numbers per worker. Blocks wrap around when
+              there are more workers than CPU blocks.
+    """
+    return [
+        {cpus[(index * threads + offset) % len(cpus)] for offset in range(threads)}
+        for index in range(workers)
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Runs a supervised pool of RQ workers sized to the CPU cores and memory of this node. '
+            'Each worker limits FFmpeg to its thread budget and is restarted when it dies.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            help='Number of workers. Defaults to what the cores and memory allow.')
+        parser.add_argument('--threads', type=int, default=settings.VIDEO_WORKER_THREADS,
+                            help='FFmpeg threads per worker.')
+        parser.add_argument('--memory', type=int, default=settings.VIDEO_WORKER_MEMORY_MB,
+                            help='Memory per worker in MB, used to size the pool.')
+        parser.add_argument('--pin-cpus', action='store_true',
+                            help='Pin every worker (and its FFmpeg processes) to its own CPUs.')
+        parser.add_argument('--queues', nargs='+',
+                            help='Queues to listen to, highest priority first.')
+        parser.add_argument('--check-interval', type=float, default=5.0,
+                            help='Seconds between health checks of the workers.')
+
+    def handle(self, *args, **options):
+        cpus = get_available_cpus()
+        threads = max(1, min(options['threads'], len(cpus)))
+        workers = options['workers'] or get_pool_size(len(cpus), get_total_memory_mb(), threads, options['memory'])
+        self.queues = options['queues'] or get_worker_queues()
+        self.threads = threads
+        self.cpu_sets = get_cpu_sets(cpus, workers, threads) if options['pin_cpus'] else [None] * workers
+        self.processes = [None] * workers
+        self.restart_delays = [0] * workers
+        self.restart_at = [None] * workers
+        self.stopping = False
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(f"Starting {workers} workers with {threads} FFmpeg threads each "
+                          f"on {len(cpus)} CPUs, queues: {' '.join(self.queues)}")
+        for index in range(workers):
+            self.start_worker(index)
+
+        while not self.stopping:
+            time.sleep(options['check_interval'])
+            self.check_workers()
+
+        self.shutdown()
+
+    def start_worker(self, index):
+        """
+        Starts the RQ worker with the given pool index. Workers run the RQ
+        scheduler, which enqueues delayed retries.
+        """
+        env = {**os.environ, 'FFMPEG_THREADS': str(self.threads)}
+        command = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'rqworker', '--with-scheduler',
+                   *self.queues]
+        process = subprocess.Popen(command, env=env)
+        cpu_set = self.cpu_sets[index]
+        if cpu_set:
+            try:
+                os.sched_setaffinity(process.pid, cpu_set)
+            except (AttributeError, OSError) as e:
+                logger.warning(f"Could not pin worker {index} to CPUs {sorted(cpu_set)}: {e}")
+        self.processes[index] = (process, time.monotonic())
+        logger.info(f"Worker {index} started with PID {process.pid}.")
+
+    def check_workers(self):
+        """
+        Restarts workers that have exited.
+
+        A worker that dies shortly after its start is restarted with an
+        exponentially growing delay, so a broken setup (e.g. Redis down)
+        does not end in a tight restart loop. The delay is not waited for
+        here: the worker's restart time is recorded and it is started by
+        the first check after that time, so the other workers are still
+        supervised and a stop signal is handled right away.
+        """
+        now = time.monotonic()
+        for index, (process, started_at) in enumerate(self.processes):
+            if self.stopping:
+                return
+            if self.restart_at[index] is None:
+                if process.poll() is None:
+                    continue
+                uptime = now - started_at
+                if uptime > MAX_RESTART_DELAY:
+                    self.restart_delays[index] = 0
+                else:
+                    self.restart_delays[index] = min(MAX_RESTART_DELAY, max(1, self.restart_delays[index] * 2))
+                self.restart_at[index] = now + self.restart_delays[index]
+                logger.error(f"Worker {index} (PID {process.pid}) exited with code {process.returncode}, "
+                             f"restarting in {self.restart_delays[index]}s.")
+            if now >= self.restart_at[index]:
+                self.restart_at[index] = None
+                self.start_worker(index)
+
+    def stop(self, signum, frame):
+        """
+        Signal handler that ends the supervision loop.
+        """
+        self.stopping = True
+
+    def shutdown(self):
+        """
+        Stops all workers. RQ workers finish their current job on SIGTERM
+        (warm shutdown) and are killed if they do not exit in time.
+        """
+        self.stdout.write("Stopping workers...")
+        for process, _ in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for process, _ in self.processes:
+            try:
+                process.wait(timeout=settings.RQ_QUEUES['default']['DEFAULT_TIMEOUT'])
+            except subprocess.TimeoutExpired:
+                process.kill()
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:53
+
+import content_app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_app', '0003_video_uploaded_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True, verbose_name='Content hash (SHA-256)'),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='video_file',
+            field=models.FileField(upload_to=content_app.models.video_upload_to),
+        ),
+    ]
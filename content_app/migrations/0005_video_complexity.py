@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_app', '0004_video_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='complexity',
+            field=models.FloatField(blank=True, null=True, verbose_name='Complexity (bits/pixel)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_app', '0005_video_complexity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='audio_file',
+            field=models.FileField(blank=True, null=True, upload_to='videos/audio/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_app', '0006_video_audio_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='thumbnail_sizes',
+            field=models.JSONField(blank=True, default=list, verbose_name='Thumbnail sizes'),
+        ),
+    ]
@@ -1,28 +1,235 @@
+import hashlib
+import os
+import uuid
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from datetime import date
 
 
+def get_content_hash(file):
+    """
+    Calculates the SHA-256 checksum of an uploaded or stored file.
+
+    Args:
+        file (File): The file, read in chunks.
+
+    Returns:
+        str: The hex digest.
+    """
+    checksum = hashlib.sha256()
+    for chunk in file.chunks():
+        checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def video_upload_to(instance, filename):
+    """
+    Stores a source video under its content hash.
+
+    All outputs are named after the source file, so they are addressed by
+    the content hash as well and two uploads with the same filename can no
+    longer overwrite each other's renditions.
+    """
+    if instance.content_hash:
+        return os.path.join('videos', f'{instance.content_hash}{os.path.splitext(filename)[1].lower()}')
+    return os.path.join('videos', filename)
+
+
+class VideoQuerySet(models.QuerySet):
+    def sharing_content_with(self, video_pk, media_key=None):
+        """
+        Returns the video and all videos with the same source content.
+
+        Pipeline results are written through this queryset, so duplicate
+        uploads that were linked to a video still being processed receive
+        its renditions as well. With the media key, the duplicates are
+        found even after the video itself was deleted.
+
+        Args:
+            video_pk (int): The primary key of the Video instance.
+            media_key (str, optional): The media key of the video (see
+                                       `media_key`).
+        """
+        if media_key and str(media_key) != str(video_pk):
+            return self.filter(Q(pk=video_pk) | Q(content_hash=media_key))
+        content_hash = Video.objects.filter(pk=video_pk, content_hash__isnull=False).values('content_hash')
+        return self.filter(Q(pk=video_pk) | Q(content_hash__in=content_hash))
+
+
 class Video(models.Model):
     """
     Represents a video uploaded to the platform.
 
     Includes metadata like title, description, and category,
     as well as fields for the original video file, converted versions,
-    and a thumbnail URL.
+    the audio track they share, a thumbnail URL with the responsive
+    sizes of the thumbnail and a short hover-preview clip. The technical
+    metadata of the source (duration, dimensions, frame rate, bitrate,
+    codecs and audio layout) and the complexity measured by a trial encode
+    are filled in by the probe stage of the processing pipeline. The
+    uploader is used to share the transcode workers fairly between users.
+
+    The source is identified by the SHA-256 hash of its content. Uploads of
+    the same content share the stored source and all of its outputs.
     """
     title = models.CharField("Title", max_length=50)
     description = models.CharField("Description", max_length=200)
     created_at = models.DateTimeField(auto_now_add=True)
     category = models.CharField(max_length=50)
-    video_file = models.FileField(upload_to='videos')
+    video_file = models.FileField(upload_to=video_upload_to)
+    content_hash = models.CharField("Content hash (SHA-256)", max_length=64, null=True, blank=True,
+                                    db_index=True, editable=False)
     video_480p = models.FileField(upload_to='videos/480p/', null=True, blank=True)
     video_720p = models.FileField(upload_to='videos/720p/', null=True, blank=True)
     video_1080p = models.FileField(upload_to='videos/1080p/', null=True, blank=True)
+    audio_file = models.FileField(upload_to='videos/audio/', null=True, blank=True)
     thumbnail_url = models.URLField(blank=True, null=True)
+    thumbnail_sizes = models.JSONField("Thumbnail sizes", default=list, blank=True)
+    preview_clip = models.FileField(upload_to='videos/previews/', null=True, blank=True)
+    duration = models.FloatField("Duration (s)", null=True, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    frame_rate = models.FloatField(null=True, blank=True)
+    bitrate = models.PositiveBigIntegerField("Bitrate (bit/s)", null=True, blank=True)
+    video_codec = models.CharField(max_length=32, blank=True)
+    audio_codec = models.CharField(max_length=32, blank=True)
+    audio_channels = models.PositiveSmallIntegerField(null=True, blank=True)
+    audio_channel_layout = models.CharField(max_length=32, blank=True)
+    complexity = models.FloatField("Complexity (bits/pixel)", null=True, blank=True)
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                    null=True, blank=True, related_name='videos')
+
+    # Fields written by the processing pipeline with single-column updates.
+    PIPELINE_FIELDS = (
+        'video_480p', 'video_720p', 'video_1080p', 'audio_file', 'thumbnail_url', 'thumbnail_sizes',
+        'preview_clip',
+        'duration', 'width', 'height', 'frame_rate', 'bitrate',
+        'video_codec', 'audio_codec', 'audio_channels', 'audio_channel_layout', 'complexity',
+    )
+
+    objects = VideoQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    @property
+    def media_key(self):
+        """
+        The name of the directories holding the video's shared outputs,
+        e.g. `hls/<media_key>/`: the content hash, or the primary key for
+        videos uploaded before content hashing.
+        """
+        return self.content_hash or str(self.pk)
+
+    def find_duplicate(self):
+        """
+        Returns the earliest other video with the same source content.
+
+        Returns:
+            Video or None: The video whose outputs this one can share.
+        """
+        if not self.content_hash:
+            return None
+        return Video.objects.filter(content_hash=self.content_hash).exclude(pk=self.pk).order_by('pk').first()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Loads a video and remembers its pipeline fields as loaded (see `save`).
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_pipeline_values = {
+            name: instance.get_pipeline_value(name) for name in cls.PIPELINE_FIELDS if name in field_names
+        }
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """
+        Reloads the video and remembers the reloaded pipeline fields as loaded.
+        """
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self.remember_pipeline_values(fields)
+
+    def get_pipeline_value(self, name):
+        """
+        Returns a pipeline field as it is stored in the database, e.g. the
+        name of a file.
+        """
+        field = self._meta.get_field(name)
+        return field.get_prep_value(field.value_from_object(self))
+
+    def remember_pipeline_values(self, fields=None):
+        """
+        Records the pipeline fields as they are in the database now.
+
+        Args:
+            fields (iterable, optional): The fields that were loaded or
+                                         saved; all loaded fields if None.
+        """
+        deferred = self.get_deferred_fields()
+        self._loaded_pipeline_values = {
+            **getattr(self, '_loaded_pipeline_values', {}),
+            **{
+                name: self.get_pipeline_value(name) for name in self.PIPELINE_FIELDS
+                if name not in deferred and (fields is None or name in fields)
+            },
+        }
+
+    def get_changed_pipeline_fields(self):
+        """
+        Returns the pipeline fields assigned on this instance since it was
+        loaded or saved.
+
+        Returns:
+            list: The names of the changed fields.
+        """
+        loaded = getattr(self, '_loaded_pipeline_values', {})
+        deferred = self.get_deferred_fields()
+        return [
+            name for name in self.PIPELINE_FIELDS
+            if name not in deferred and (name not in loaded or self.get_pipeline_value(name) != loaded[name])
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the video without overwriting fields owned by the pipeline.
+
+        Pipeline workers store their results with queryset updates while
+        this instance may still hold stale values, e.g. an admin form that
+        was opened before a transcode finished. A plain save of an existing
+        video therefore only writes the remaining fields; pipeline fields
+        are only saved when they are listed in `update_fields`.
+
+        Raises:
+            ValueError: If a pipeline field was assigned on an existing
+                        video that is saved without `update_fields`, so the
+                        change is not lost silently.
+
+        A newly assigned source file is hashed before it is stored, unless
+        the upload handler already hashed it while it was received (see
+        `upload_handlers.ContentHashUploadHandler`). If the same content was
+        uploaded before, the stored source is reused instead of writing a
+        second copy.
+        """
+        if self.video_file and not self.video_file._committed:
+            self.content_hash = (getattr(self.video_file.file, 'content_hash', None)
+                                 or get_content_hash(self.video_file))
+            duplicate = self.find_duplicate()
+            if duplicate:
+                self.video_file = duplicate.video_file.name
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            changed = self.get_changed_pipeline_fields()
+            if changed:
+                raise ValueError(f"{', '.join(changed)} of video {self.pk} are written by the processing "
+                                 f"pipeline; pass them in update_fields to save them.")
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.PIPELINE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        self.remember_pipeline_values(kwargs.get('update_fields'))
+
 
 class FileUpload(models.Model):
     """
@@ -31,4 +238,39 @@ class FileUpload(models.Model):
     Stores the uploaded file and the timestamp of the upload.
     """
     file = models.FileField(upload_to='uploads/')
-    uploaded_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+class UploadSession(models.Model):
+    """
+    A resumable, chunked upload of a source video.
+
+    The client announces the file with its size and the metadata of the
+    video, then sends the content in any number of chunks, each at the
+    offset the server has received so far, and finally completes the
+    session. The chunks are appended to a partial file in MEDIA_ROOT, which
+    is moved to its content-addressed location when the session is
+    completed (see `uploads.complete_upload_session`). An interrupted upload
+    resumes at `offset` instead of starting over.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField("Size (bytes)")
+    offset = models.PositiveBigIntegerField("Received (bytes)", default=0)
+    title = models.CharField("Title", max_length=50)
+    description = models.CharField("Description", max_length=200)
+    category = models.CharField(max_length=50, blank=True)
+    video = models.OneToOneField(Video, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='upload_session')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+    @property
+    def partial_path(self):
+        """
+        The full path of the file the chunks are appended to.
+        """
+        return os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial', f'{self.id}.part')
@@ -0,0 +1,126 @@
+import re
+import django_rq
+from rq.job import Job
+from .progress import get_progress
+
+PIPELINE_KEY = 'videoflix:pipeline:{video_pk}'
+PIPELINE_TTL = 7 * 24 * 60 * 60
+
+
+def get_pipeline_key(video_pk):
+    """
+    Returns the Redis key of the hash that maps pipeline stages to job IDs.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+
+    Returns:
+        str: The Redis key.
+    """
+    return PIPELINE_KEY.format(video_pk=video_pk)
+
+
+def record_pipeline_jobs(video_pk, jobs, connection=None):
+    """
+    Remembers which RQ job runs which stage of a video's pipeline.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        jobs (dict): A mapping of stage names to RQ jobs.
+        connection (Redis, optional): The Redis connection. Defaults to the
+                                      connection of the 'default' queue.
+    """
+    if not jobs:
+        return
+    connection = connection or django_rq.get_connection('default')
+    key = get_pipeline_key(video_pk)
+    connection.hset(key, mapping={stage: job.id for stage, job in jobs.items()})
+    connection.expire(key, PIPELINE_TTL)
+
+
+def delete_dependent_jobs(job):
+    """
+    Deletes every job that waits for a job, directly or through other jobs.
+
+    A retried probe job uses this to drop the graph an earlier attempt
+    enqueued (see `tasks.build_pipeline`). Those jobs are all deferred
+    behind the probe job, so none of them has started yet.
+
+    Args:
+        job (Job): The job whose dependents are deleted; it is kept itself.
+    """
+    dependents = {}
+    pending = job.dependent_ids
+    while pending:
+        fetched = [dependent for dependent in Job.fetch_many(pending, connection=job.connection) if dependent]
+        dependents.update((dependent.id, dependent) for dependent in fetched)
+        pending = list({dependent_id for dependent in fetched for dependent_id in dependent.dependent_ids}
+                       - dependents.keys())
+    for dependent in dependents.values():
+        dependent.delete()
+    job.connection.delete(job.dependents_key)
+
+
+def get_pipeline_status(video_pk, connection=None):
+    """
+    Returns the state of every recorded pipeline stage of a video.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        connection (Redis, optional): The Redis connection. Defaults to the
+                                      connection of the 'default' queue.
+
+    Returns:
+        dict: A mapping of stage names to RQ job statuses (e.g. 'queued',
+              'deferred', 'started', 'finished', 'failed'). Stages whose
+              job has already expired are reported as 'expired'.
+    """
+    connection = connection or django_rq.get_connection('default')
+    stages = {
+        stage.decode(): job_id.decode()
+        for stage, job_id in connection.hgetall(get_pipeline_key(video_pk)).items()
+    }
+    jobs = Job.fetch_many(list(stages.values()), connection=connection)
+    return {
+        stage: job.get_status(refresh=False).value if job else 'expired'
+        for stage, job in zip(stages, jobs)
+    }
+
+
+def get_video_status(video_pk, connection=None):
+    """
+    Combines the job states and the published FFmpeg progress of a video.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        connection (Redis, optional): The Redis connection. Defaults to the
+                                      connection of the 'default' queue.
+
+    Returns:
+        dict: 'stages' maps every stage to its job status and progress
+              (percent, fps, speed); 'renditions' maps every resolution to
+              its encode progress and whether its HLS stream is ready.
+    """
+    stage_statuses = get_pipeline_status(video_pk, connection)
+    progress = get_progress(video_pk, stage_statuses)
+    stages = {
+        stage: {'status': status, **progress.get(stage, {})}
+        for stage, status in stage_statuses.items()
+    }
+
+    if 'transcode' in stages:
+        encode = {key: stages['transcode'].get(key) for key in ('percent', 'fps', 'speed')}
+    else:
+        chunks = [progress for stage, progress in stages.items() if stage.startswith('chunk_')]
+        encode = {
+            'percent': round(sum(chunk.get('percent') or 0 for chunk in chunks) / len(chunks), 1) if chunks else None,
+            'fps': sum(chunk.get('fps') or 0 for chunk in chunks if chunk['status'] == 'started') or None,
+            'speed': sum(chunk.get('speed') or 0 for chunk in chunks if chunk['status'] == 'started') or None,
+        }
+
+    renditions = {}
+    for stage, stage_status in stages.items():
+        match = re.fullmatch(r'hls_(\d+p)', stage)
+        if match:
+            renditions[match.group(1)] = {**encode, 'ready': stage_status['status'] == 'finished'}
+    return {'stages': stages, 'renditions': renditions}
@@ -0,0 +1,72 @@
+import os
+from django.conf import settings
+from .scheduling import get_thread_args
+
+
+def get_preview_name(filename_base):
+    """
+    Returns the path of the hover-preview clip relative to MEDIA_ROOT.
+
+    Args:
+        filename_base (str): The source filename without its extension.
+
+    Returns:
+        str: The relative path, as stored in the `preview_clip` field.
+    """
+    return os.path.join('videos', 'previews', f"{filename_base}_preview.mp4")
+
+
+def get_preview_window(duration):
+    """
+    Returns the part of a video that is cut into its preview clip.
+
+    The clip starts at VIDEO_PREVIEW_START (a fraction of the duration),
+    past intros and title cards, and is VIDEO_PREVIEW_DURATION seconds
+    long. Short videos are previewed from their start.
+
+    Args:
+        duration (float or None): The duration of the video in seconds.
+
+    Returns:
+        tuple: (offset, length) in seconds.
+    """
+    length = settings.VIDEO_PREVIEW_DURATION
+    if not duration or duration <= length:
+        return 0, min(length, duration or length)
+    return min(duration * settings.VIDEO_PREVIEW_START, duration - length), length
+
+
+def build_preview_command(rendition_path, offset, length, output_path):
+    """
+    Builds the FFmpeg command that cuts the preview clip from a rendition.
+
+    The clip is read from the lowest rendition with input seeking, so only
+    a few seconds of a small video are decoded. It is silent, reduced to
+    VIDEO_PREVIEW_FRAME_RATE and VIDEO_PREVIEW_HEIGHT and capped at
+    VIDEO_PREVIEW_MAXRATE, with the index at the start of the file so
+    browsers can play it while it loads. The decoder and encoder are
+    limited to the worker's thread budget.
+
+    Args:
+        rendition_path (str): The full path to the MP4 rendition.
+        offset (float): The start of the clip in seconds.
+        length (float): The length of the clip in seconds.
+        output_path (str): The full path to the preview clip.
+
+    Returns:
+        list: The FFmpeg command as a list of arguments.
+    """
+    maxrate = settings.VIDEO_PREVIEW_MAXRATE
+    return [
+        'ffmpeg', '-v', 'error', '-y',
+        '-ss', f'{offset:.3f}', '-t', f'{length:.3f}',
+        *get_thread_args(),
+        '-i', rendition_path,
+        '-map', '0:v:0', '-an',
+        '-vf', f"fps={settings.VIDEO_PREVIEW_FRAME_RATE},scale=-2:'min({settings.VIDEO_PREVIEW_HEIGHT},ih)'",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '30', *get_thread_args(),
+        '-maxrate', maxrate, '-bufsize', maxrate,
+        '-pix_fmt', 'yuv420p',
+        '-movflags', '+faststart',
+        output_path
+    ]
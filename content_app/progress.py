@@ -0,0 +1,130 @@
+import logging
+import subprocess
+import time
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_KEY = 'progress:{video_pk}:{stage}'
+PROGRESS_TIMEOUT = 24 * 60 * 60
+
+
+def get_progress_key(video_pk, stage):
+    """
+    Returns the cache key holding the progress of one pipeline stage.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        stage (str): The pipeline stage, e.g. 'transcode' or 'hls_480p'.
+
+    Returns:
+        str: The cache key.
+    """
+    return PROGRESS_KEY.format(video_pk=video_pk, stage=stage)
+
+
+def publish_progress(video_pk, stage, **progress):
+    """
+    Stores the progress of a pipeline stage in the cache.
+
+    Errors are only logged, a cache outage must never fail an encode.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        stage (str): The pipeline stage.
+        **progress: The values to publish (percent, fps, speed, failed).
+    """
+    try:
+        cache.set(get_progress_key(video_pk, stage), {**progress, 'updated_at': time.time()}, PROGRESS_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Could not publish progress of {stage} for video {video_pk}: {e}")
+
+
+def get_progress(video_pk, stages):
+    """
+    Reads the published progress of several pipeline stages at once.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        stages (iterable): The pipeline stages.
+
+    Returns:
+        dict: A mapping of stage names to their progress; stages without
+              published progress are left out.
+    """
+    keys = {get_progress_key(video_pk, stage): stage for stage in stages}
+    return {keys[key]: progress for key, progress in cache.get_many(list(keys)).items()}
+
+
+def parse_progress_block(block, duration=None):
+    """
+    Converts one block of FFmpeg `-progress` output into progress values.
+
+    Args:
+        block (dict): The key/value pairs FFmpeg reported since the last
+                      `progress=` line.
+        duration (float, optional): The duration of the input in seconds,
+                                    needed to compute the percentage.
+
+    Returns:
+        dict: The keys 'percent', 'fps' and 'speed'; unknown values are None.
+    """
+    def to_float(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    out_time_us = to_float(block.get('out_time_us') or block.get('out_time_ms'))
+    percent = None
+    if out_time_us is not None and duration:
+        percent = round(min(100.0, max(0.0, out_time_us / 1_000_000 / duration * 100)), 1)
+    return {
+        'percent': percent,
+        'fps': to_float(block.get('fps')),
+        'speed': to_float((block.get('speed') or '').rstrip('x')),
+    }
+
+
+def run_ffmpeg(ffmpeg_cmd, video_pk, stage, duration=None):
+    """
+    Runs an FFmpeg command and publishes its progress while it runs.
+
+    FFmpeg writes machine-readable progress to stdout (`-progress pipe:1`).
+    Every progress block is published for the given stage, so clients can
+    follow percent, fps and speed through the status API.
+
+    Args:
+        ffmpeg_cmd (list): The FFmpeg command as a list of arguments.
+        video_pk (int): The primary key of the Video instance.
+        stage (str): The pipeline stage the command belongs to.
+        duration (float, optional): The duration of the input in seconds.
+
+    Returns:
+        dict: The last progress FFmpeg reported; 'fps' and 'speed' (the
+              real-time factor) are averages over the whole run.
+
+    Raises:
+        subprocess.CalledProcessError: If FFmpeg exits with an error, like
+                                       `subprocess.run(..., check=True)`.
+    """
+    progress_cmd = [ffmpeg_cmd[0], '-progress', 'pipe:1', '-nostats', *ffmpeg_cmd[1:]]
+    progress = {'percent': 0.0, 'fps': None, 'speed': None}
+    publish_progress(video_pk, stage, **progress, failed=False)
+
+    with subprocess.Popen(progress_cmd, stdout=subprocess.PIPE, text=True) as process:
+        block = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            block[key] = value
+            if key == 'progress':
+                progress.update({k: v for k, v in parse_progress_block(block, duration).items() if v is not None})
+                publish_progress(video_pk, stage, **progress, failed=False)
+                block = {}
+
+    if process.returncode != 0:
+        publish_progress(video_pk, stage, **progress, failed=True)
+        raise subprocess.CalledProcessError(process.returncode, progress_cmd)
+    progress['percent'] = 100.0
+    publish_progress(video_pk, stage, **progress, failed=False)
+    return progress
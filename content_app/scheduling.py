@@ -0,0 +1,291 @@
+import time
+import django_rq
+from django.conf import settings
+from rq import Worker
+
+FAST_QUEUE = 'fast'
+# Pending costs are hashes of video pk -> estimated encode seconds; the
+# sorted set under the same key plus ':since' holds when each was added.
+UPLOADER_COST_KEY = 'videoflix:uploader:{uploader_id}:pending_costs'
+TRANSCODE_BACKLOG_KEY = 'videoflix:transcode:pending_costs'
+PENDING_SINCE_SUFFIX = ':since'
+# Estimates of videos whose pipeline never released them (e.g. a pipeline
+# that failed for good) stop counting after this many seconds.
+PENDING_COST_MAX_AGE = 24 * 60 * 60
+ENCODE_SPEED_KEY = 'videoflix:encode_speed'
+# Weight of a new measurement in the moving average of the encode speed.
+ENCODE_SPEED_SMOOTHING = 0.3
+
+
+def get_worker_queues():
+    """
+    Returns the queue names in the order workers should listen to them.
+
+    RQ workers always dequeue from the first non-empty queue, so fast jobs
+    run before any transcode and shorter transcodes before longer ones.
+    The 'default' queue comes last for legacy jobs.
+
+    Returns:
+        list: The queue names, highest priority first.
+    """
+    return [FAST_QUEUE, *(name for name, _ in settings.VIDEO_TRANSCODE_QUEUES), 'default']
+
+
+def get_thread_args():
+    """
+    Returns the FFmpeg option that limits a decoder, filter or encoder to
+    the thread budget of this worker.
+
+    Returns:
+        list: `['-threads', N]` if FFMPEG_THREADS is set, otherwise an empty
+              list so FFmpeg picks its own thread count.
+    """
+    if not settings.FFMPEG_THREADS:
+        return []
+    return ['-threads', str(settings.FFMPEG_THREADS)]
+
+
+def get_uploader_cost_key(uploader_id):
+    """
+    Returns the Redis key holding the pending transcode cost of an uploader.
+
+    Args:
+        uploader_id (int): The primary key of the uploading user.
+
+    Returns:
+        str: The Redis key.
+    """
+    return UPLOADER_COST_KEY.format(uploader_id=uploader_id)
+
+
+def add_pending_cost(key, video_pk, estimated_seconds, connection):
+    """
+    Stores the estimated encode time of a video in a pending cost.
+
+    An earlier estimate of the same video (e.g. from a retried probe job)
+    is replaced, not added to.
+
+    Args:
+        key (str): The Redis key of the pending cost.
+        video_pk (int): The primary key of the Video instance.
+        estimated_seconds (float): The estimated encode time of the video.
+        connection (Redis): The Redis connection.
+    """
+    since_key = key + PENDING_SINCE_SUFFIX
+    connection.hset(key, video_pk, estimated_seconds)
+    connection.zadd(since_key, {video_pk: time.time()})
+    connection.expire(key, PENDING_COST_MAX_AGE)
+    connection.expire(since_key, PENDING_COST_MAX_AGE)
+
+
+def get_pending_cost(key, connection, exclude=None):
+    """
+    Returns the summed estimates of a pending cost.
+
+    Estimates older than PENDING_COST_MAX_AGE are removed first, so a video
+    that was never released does not count forever.
+
+    Args:
+        key (str): The Redis key of the pending cost.
+        connection (Redis): The Redis connection.
+        exclude (int, optional): The primary key of a video whose estimate
+                                 is not counted.
+
+    Returns:
+        float: The pending encode time in seconds.
+    """
+    since_key = key + PENDING_SINCE_SUFFIX
+    stale = connection.zrangebyscore(since_key, '-inf', time.time() - PENDING_COST_MAX_AGE)
+    if stale:
+        connection.hdel(key, *stale)
+        connection.zrem(since_key, *stale)
+    return sum(
+        float(cost) for video_pk, cost in connection.hgetall(key).items()
+        if exclude is None or video_pk.decode() != str(exclude)
+    )
+
+
+def remove_pending_cost(key, video_pk, connection):
+    """
+    Removes the estimate of a video from a pending cost.
+
+    Args:
+        key (str): The Redis key of the pending cost.
+        video_pk (int): The primary key of the Video instance.
+        connection (Redis): The Redis connection.
+    """
+    connection.hdel(key, video_pk)
+    connection.zrem(key + PENDING_SINCE_SUFFIX, video_pk)
+
+
+def select_transcode_queue(video_pk, estimated_seconds, uploader_id=None, connection=None):
+    """
+    Picks the transcode queue for a video (shortest job first).
+
+    The effective cost of a video is its estimated encode time plus the
+    encode time of all other videos of the same uploader that are still
+    being processed. Short videos therefore land in a higher-priority
+    queue, and an uploader who submits many videos at once cannot starve
+    the others: each further video of theirs is scheduled behind the
+    previous ones. The estimate is kept in the uploader's pending cost
+    until `release_transcode_cost` is called.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        estimated_seconds (float): The estimated encode time of the video.
+        uploader_id (int, optional): The primary key of the uploading user.
+        connection (Redis, optional): The Redis connection. Defaults to the
+                                      connection of the 'fast' queue.
+
+    Returns:
+        str: The name of the selected transcode queue.
+    """
+    effective_cost = estimated_seconds
+    if uploader_id is not None:
+        connection = connection or django_rq.get_connection(FAST_QUEUE)
+        key = get_uploader_cost_key(uploader_id)
+        effective_cost += get_pending_cost(key, connection, exclude=video_pk)
+        add_pending_cost(key, video_pk, estimated_seconds, connection)
+
+    for name, max_cost in settings.VIDEO_TRANSCODE_QUEUES:
+        if max_cost is None or effective_cost <= max_cost:
+            return name
+    return settings.VIDEO_TRANSCODE_QUEUES[-1][0]
+
+
+def release_transcode_cost(video_pk, uploader_id=None, connection=None):
+    """
+    Removes a processed video from the pending cost of its uploader.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        uploader_id (int, optional): The primary key of the uploading user.
+        connection (Redis, optional): The Redis connection. Defaults to the
+                                      connection of the 'fast' queue.
+    """
+    if uploader_id is None:
+        return
+    connection = connection or django_rq.get_connection(FAST_QUEUE)
+    remove_pending_cost(get_uploader_cost_key(uploader_id), video_pk, connection)
+
+
+def add_transcode_backlog(video_pk, estimated_seconds, connection=None):
+    """
+    Adds a scheduled video to the encode time all workers still have to do.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        estimated_seconds (float): The estimated encode time of the video.
+        connection (Redis, optional): The Redis connection. Defaults to the
+                                      connection of the 'fast' queue.
+    """
+    connection = connection or django_rq.get_connection(FAST_QUEUE)
+    add_pending_cost(TRANSCODE_BACKLOG_KEY, video_pk, estimated_seconds, connection)
+
+
+def release_transcode_backlog(video_pk, connection=None):
+    """
+    Removes a processed video from the transcode backlog.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        connection (Redis, optional): The Redis connection. Defaults to the
+                                      connection of the 'fast' queue.
+    """
+    connection = connection or django_rq.get_connection(FAST_QUEUE)
+    remove_pending_cost(TRANSCODE_BACKLOG_KEY, video_pk, connection)
+
+
+def get_encode_speed_field(preset, resolutions):
+    """
+    Returns the hash field holding the encode speed of a preset and the
+    set of resolutions encoded together.
+
+    Args:
+        preset (str): The x264 preset.
+        resolutions (iterable): The resolutions of the encode.
+
+    Returns:
+        str: The field name, e.g. 'medium:480,720'.
+    """
+    return f"{preset}:{','.join(str(resolution) for resolution in sorted(resolutions))}"
+
+
+def record_encode_speed(preset, resolutions, fps, connection=None):
+    """
+    Records the measured speed of an encode as a moving average.
+
+    The speed is stored as encoded frames per second rather than as the
+    real-time factor, so sources with different frame rates can share it.
+
+    Args:
+        preset (str): The x264 preset.
+        resolutions (iterable): The resolutions of the encode.
+        fps (float): The frames per second FFmpeg reported for the encode.
+        connection (Redis, optional): The Redis connection. Defaults to the
+                                      connection of the 'fast' queue.
+    """
+    if not fps:
+        return
+    connection = connection or django_rq.get_connection(FAST_QUEUE)
+    field = get_encode_speed_field(preset, resolutions)
+    previous = connection.hget(ENCODE_SPEED_KEY, field)
+    if previous:
+        fps = float(previous) * (1 - ENCODE_SPEED_SMOOTHING) + fps * ENCODE_SPEED_SMOOTHING
+    connection.hset(ENCODE_SPEED_KEY, field, fps)
+
+
+def get_encode_speed(preset, resolutions, connection=None):
+    """
+    Returns the measured speed of a preset and set of resolutions.
+
+    Args:
+        preset (str): The x264 preset.
+        resolutions (iterable): The resolutions of the encode.
+        connection (Redis, optional): The Redis connection. Defaults to the
+                                      connection of the 'fast' queue.
+
+    Returns:
+        float or None: The encoded frames per second, or None if this
+                       combination was not measured yet.
+    """
+    connection = connection or django_rq.get_connection(FAST_QUEUE)
+    fps = connection.hget(ENCODE_SPEED_KEY, get_encode_speed_field(preset, resolutions))
+    return float(fps) if fps else None
+
+
+def select_encoder_preset(estimates, parallelism=1, connection=None, video_pk=None):
+    """
+    Picks the most efficient preset that still meets the time-to-playable
+    target (SLA-driven preset selection).
+
+    The expected time until a new video is playable is the backlog of all
+    scheduled encodes shared by the workers, plus its own encode time.
+    Presets are tried from the slowest (smallest output) to the fastest,
+    so under load spikes encodes get faster at some cost in size, and
+    once the queue drains the efficient preset is used again. If no preset
+    meets the target, the fastest one is used.
+
+    Args:
+        estimates (dict): The estimated encode time of the video for every
+                          preset of VIDEO_ENCODE_PRESETS.
+        parallelism (int, optional): The number of jobs the encode is split
+                                     into (the chunks of a long video).
+        connection (Redis, optional): The Redis connection. Defaults to the
+                                      connection of the 'fast' queue.
+        video_pk (int, optional): The primary key of the Video instance,
+                                  whose own earlier estimate is not counted
+                                  as backlog.
+
+    Returns:
+        str: The selected preset.
+    """
+    connection = connection or django_rq.get_connection(FAST_QUEUE)
+    workers = max(1, Worker.count(connection=connection))
+    queue_wait = get_pending_cost(TRANSCODE_BACKLOG_KEY, connection, exclude=video_pk) / workers
+
+    presets = [preset for preset, _ in settings.VIDEO_ENCODE_PRESETS]
+    for preset in presets:
+        if queue_wait + estimates[preset] / min(workers, parallelism) <= settings.VIDEO_TIME_TO_PLAYABLE:
+            return preset
+    return presets[-1]
@@ -1,42 +1,176 @@
+import logging
 import os
 import shutil
+import threading
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
 import django_rq
-from .models import Video
-from .tasks import generate_thumbnail, convert_video_and_update_model, generate_hls_playlist, delete_file
+from .models import UploadSession, Video
+from .hls import get_hls_dir
+from .pipeline import record_pipeline_jobs
+from .scheduling import FAST_QUEUE
+from .tasks import probe_video, delete_file, get_job_retry
+
+logger = logging.getLogger(__name__)
+
+
+# The videos whose pipelines start when the current transaction commits,
+# per thread like the database connection itself.
+pending_pipelines = threading.local()
+
+
+def enqueue_video_pipelines(videos):
+    """
+    Starts the processing pipeline of several videos in one Redis round trip.
+
+    The probe jobs and the pipeline records of all videos are sent through a
+    single Redis pipeline.
+
+    Args:
+        videos (list): The Video instances to process.
+
+    Returns:
+        list: The enqueued probe jobs.
+    """
+    videos = [video for video in videos if video.video_file]
+    if not videos:
+        return []
+
+    queue = django_rq.get_queue(FAST_QUEUE)
+    with queue.connection.pipeline() as pipe:
+        probe_jobs = queue.enqueue_many([
+            queue.prepare_data(probe_video, (video.pk, video.video_file.path, video.uploaded_by_id, video.media_key),
+                               retry=get_job_retry())
+            for video in videos
+        ], pipeline=pipe)
+        for video, probe_job in zip(videos, probe_jobs):
+            record_pipeline_jobs(video.pk, {'probe': probe_job}, connection=pipe)
+        pipe.execute()
+
+    for video in videos:
+        logger.info(f'Starting conversion for Video {video.pk}')
+    return probe_jobs
+
+
+def schedule_video_pipelines(videos):
+    """
+    Starts the processing pipeline of videos once the current transaction
+    commits.
+
+    All videos scheduled in the same transaction are sent to Redis as one
+    batch, so workers never pick up a job before its row is visible. Use
+    this after `Video.objects.bulk_create`, which does not send `post_save`.
+    Outside of a transaction the pipelines start immediately.
+
+    Args:
+        videos (iterable): The Video instances to process.
+    """
+    videos = list(videos)
+    if not transaction.get_connection().in_atomic_block:
+        # Nothing scheduled earlier can still commit.
+        pending_pipelines.videos = []
+        enqueue_video_pipelines(videos)
+        return
+
+    if not hasattr(pending_pipelines, 'videos'):
+        pending_pipelines.videos = []
+    pending_pipelines.videos.extend(videos)
+    transaction.on_commit(flush_video_pipelines)
+
+
+def flush_video_pipelines():
+    """
+    Starts the pipelines of the videos scheduled before the last commit.
+
+    Every `schedule_video_pipelines` call registers this as a commit
+    callback, and Django drops the callbacks of rolled back savepoints. The
+    first remaining callback sends the whole batch; the others find it
+    empty. Videos whose savepoint or transaction was rolled back are still
+    in the batch, but their rows do not exist, so they are skipped.
+    """
+    videos = {video.pk: video for video in getattr(pending_pipelines, 'videos', [])}
+    pending_pipelines.videos = []
+    if not videos:
+        return
+
+    committed = set(Video.objects.filter(pk__in=videos).values_list('pk', 'video_file'))
+    enqueue_video_pipelines([video for video in videos.values() if (video.pk, video.video_file.name) in committed])
+
 
 @receiver(post_save, sender=Video)
 def video_post_save(sender, instance, created, **kwargs):
     """
     Triggers asynchronous tasks for video processing after a new video is created.
+
+    Only the probe job is enqueued, and only after the transaction commits.
+    It records the media metadata and then enqueues the remaining stages as
+    a dependency graph (see `tasks.build_pipeline`).
+
+    A video whose content was uploaded before is not processed again; it is
+    linked to the outputs of the earlier upload instead.
     """
-    if created and instance.video_file:
-        print(f'Starting conversion for Video {instance.pk}')
-        queue = django_rq.get_queue('default')
+    if not created or not instance.video_file:
+        return
+
+    duplicate = instance.find_duplicate()
+    if duplicate:
+        link_duplicate_outputs(instance, duplicate)
+    else:
+        schedule_video_pipelines([instance])
+
+
+def link_duplicate_outputs(video, original):
+    """
+    Lets a video share the renditions, HLS streams and thumbnail of an
+    earlier upload of the same content.
+
+    The outputs are addressed by the content hash, so only the database
+    fields are copied. If the original is still being processed, its
+    pipeline writes the remaining results to both videos (see
+    `VideoQuerySet.sharing_content_with`).
 
-        queue.enqueue(generate_thumbnail, instance.pk)
-        queue.enqueue(convert_video_and_update_model, instance.pk, 480)
-        queue.enqueue(convert_video_and_update_model, instance.pk, 720)
-        queue.enqueue(convert_video_and_update_model, instance.pk, 1080)
-        queue.enqueue(generate_hls_playlist, instance.pk, 480)
-        queue.enqueue(generate_hls_playlist, instance.pk, 720)
-        queue.enqueue(generate_hls_playlist, instance.pk, 1080)
+    Args:
+        video (Video): The duplicate upload.
+        original (Video): The earlier upload with the same content hash.
+    """
+    for field in Video.PIPELINE_FIELDS:
+        setattr(video, field, getattr(original, field))
+    video.save(update_fields=Video.PIPELINE_FIELDS)
+    logger.info(f'Video {video.pk} is a duplicate of Video {original.pk}, sharing its outputs')
 
 
 @receiver(post_delete, sender=Video)
 def auto_delete_video_files(sender, instance, **kwargs):
     """
     Deletes all related video files and directories when a Video instance is deleted.
+
+    Files shared with another upload of the same content (source,
+    renditions, thumbnail and HLS streams) are kept until the last of these
+    videos is deleted. So are the chunks and completion markers, which are
+    keyed by the media key as well: if the video was still being processed,
+    its pipeline finishes for the remaining uploads.
     """
-    print(f'Deleting files for Video {instance.pk}')
-    
+    logger.info(f'Deleting files for Video {instance.pk}')
+
+    if instance.content_hash and Video.objects.filter(content_hash=instance.content_hash).exists():
+        logger.info(f'Files of Video {instance.pk} are still used by another upload')
+        return
+
+    for work_dir in ('chunks', 'markers'):
+        work_dir_path = os.path.join(settings.MEDIA_ROOT, work_dir, instance.media_key)
+        if os.path.exists(work_dir_path):
+            shutil.rmtree(work_dir_path)
+            logger.info(f"Directory deleted: {work_dir_path}")
+
     file_fields = [
         instance.video_file,
         instance.video_480p,
         instance.video_720p,
         instance.video_1080p,
+        instance.audio_file,
+        instance.preview_clip,
     ]
     
     for file_field in file_fields:
@@ -48,7 +182,22 @@ def auto_delete_video_files(sender, instance, **kwargs):
         thumbnail_path = os.path.join(settings.MEDIA_ROOT, instance.thumbnail_url)
         delete_file(thumbnail_path)
 
-    hls_dir = os.path.join(settings.MEDIA_ROOT, 'hls', str(instance.pk))
+    for size in instance.thumbnail_sizes or []:
+        for image_format in ('jpeg', 'webp'):
+            if size.get(image_format) and size[image_format] != instance.thumbnail_url:
+                delete_file(os.path.join(settings.MEDIA_ROOT, size[image_format]))
+
+    hls_dir = get_hls_dir(instance.media_key)
     if os.path.exists(hls_dir):
         shutil.rmtree(hls_dir)
-        print(f"HLS directory deleted: {hls_dir}")
\ No newline at end of file
+        logger.info(f"HLS directory deleted: {hls_dir}")
+
+
+@receiver(post_delete, sender=UploadSession)
+def auto_delete_partial_upload(sender, instance, **kwargs):
+    """
+    Deletes the received content of an upload session that is cancelled
+    or removed before it was completed.
+    """
+    if os.path.exists(instance.partial_path):
+        delete_file(instance.partial_path)
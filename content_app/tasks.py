@@ -1,12 +1,54 @@
 import subprocess
 import os
+import csv
+import fcntl
+import json
+import math
+import shutil
 import logging
+import django_rq
 from django.conf import settings
 from django_rq import job
+from rq import get_current_job
+from rq import Retry
+from rq.job import Dependency
+from .complexity import get_title_ladder, measure_complexity
+from .completion import clear_markers, is_complete, write_marker
+from .hls import (
+    INIT_SEGMENT_NAME,
+    coalesce_segments,
+    get_codecs,
+    get_hls_dir,
+    get_live_target_duration,
+    get_stream_bandwidth,
+    is_playlist_ended,
+    read_init_segment,
+    read_playlist_segments,
+    write_master_playlist,
+    write_media_playlist
+)
 from .models import Video
+from .pipeline import delete_dependent_jobs, record_pipeline_jobs
+from .preview import build_preview_command, get_preview_name, get_preview_window
+from .progress import run_ffmpeg
+from .scheduling import (
+    FAST_QUEUE,
+    add_transcode_backlog,
+    get_encode_speed,
+    get_thread_args,
+    record_encode_speed,
+    release_transcode_backlog,
+    release_transcode_cost,
+    select_encoder_preset,
+    select_transcode_queue
+)
+from .trickplay import TRICKPLAY_INDEX_NAME, build_trickplay_command, get_thumbnail_size, write_trickplay_index
+from .uploads import complete_upload_session
 
 logger = logging.getLogger(__name__)
 
+RESOLUTIONS = sorted(settings.VIDEO_ENCODING_LADDER)
+
 def get_filename_without_extension(file_path):
     """
     Extracts the filename from a path and removes its extension(s).
@@ -22,88 +64,1264 @@ def get_filename_without_extension(file_path):
     return filename_without_ext
 
 
+def get_video_encoder_args(resolution, rung=None):
+    """
+    Returns the H.264 encoder options of a rung of the encoding ladder.
+
+    The rendition is encoded with the CRF and preset of its rung, capped at
+    its maxrate/bufsize (capped VBR), so bitrate peaks are bounded. A keyframe
+    is forced every VIDEO_KEYFRAME_INTERVAL seconds and scene-cut keyframes
+    are disabled, so all renditions of a source have their keyframes at the
+    same timestamps and can be cut into aligned HLS segments. The encoder
+    is limited to the worker's thread budget.
+
+    Args:
+        resolution (int): The resolution of the rendition, a key of
+                          VIDEO_ENCODING_LADDER.
+        rung (dict, optional): The per-title rung of the video (see
+                               `complexity.get_title_ladder`). Defaults to
+                               the rung of VIDEO_ENCODING_LADDER.
+
+    Returns:
+        list: The FFmpeg output options for the video stream.
+    """
+    rung = rung or settings.VIDEO_ENCODING_LADDER[resolution]
+    return [
+        '-c:v', 'libx264', '-crf', str(rung['crf']), '-preset', rung.get('preset', settings.VIDEO_ENCODE_PRESET),
+        '-maxrate', rung['maxrate'], '-bufsize', rung['bufsize'],
+        '-force_key_frames', f'expr:gte(t,n_forced*{settings.VIDEO_KEYFRAME_INTERVAL})',
+        '-sc_threshold', '0',
+        *get_thread_args()
+    ]
+
+
+def get_audio_args(input_index, copy):
+    """
+    Returns the FFmpeg output options for the audio of a rendition.
+
+    Args:
+        input_index (int): The FFmpeg input index to take the audio from.
+        copy (bool): Whether the input is the shared AAC track (see
+                     `encode_audio`), which is stream copied. Otherwise the
+                     audio of the input, if any, is encoded.
+
+    Returns:
+        list: The mapping and codec options.
+    """
+    if copy:
+        return ['-map', f'{input_index}:a', '-c:a', 'copy']
+    return ['-map', f'{input_index}:a?', '-c:a', 'aac', '-b:a', '128k']
+
+
+def get_hls_segment_args(output_dir, segment_base):
+    """
+    Returns the FFmpeg HLS muxer options for the configured segment type.
+
+    With VIDEO_SEGMENT_TYPE 'fmp4' the stream is packaged as CMAF: '.m4s'
+    media segments and one INIT_SEGMENT_NAME that holds the codec
+    configuration. Otherwise MPEG-TS '.ts' segments are written.
+
+    Args:
+        output_dir (str): The directory of the stream.
+        segment_base (str): The filename prefix of the segments.
+
+    Returns:
+        list: The segment type and filename options.
+    """
+    if settings.VIDEO_SEGMENT_TYPE == 'fmp4':
+        return [
+            '-hls_segment_type', 'fmp4',
+            '-hls_fmp4_init_filename', INIT_SEGMENT_NAME,
+            '-hls_segment_filename', os.path.join(output_dir, f'{segment_base}_%03d.m4s'),
+        ]
+    return ['-hls_segment_filename', os.path.join(output_dir, f'{segment_base}_%03d.ts')]
+
+
+def publish_hls_stream(output_dir, playlist_path, parts, segment_base, init_segment=None, startup=True,
+                       published=None, discontinuity=False):
+    """
+    Joins the packaged parts of a stream into its segments and writes the
+    final VOD playlist.
+
+    The parts are removed once the playlist references the joined segments.
+    Segments that were already published while the stream grew (see
+    `get_published_segments`) stay at the start of the playlist with its
+    target duration, so the playlist only gains segments.
+
+    Args:
+        output_dir (str): The directory of the stream.
+        playlist_path (str): The full path to its media playlist.
+        parts (list): (duration, filename) tuples of the packaged parts.
+        segment_base (str): The filename prefix of the segments.
+        init_segment (str, optional): The init segment of fMP4 streams.
+        startup (bool, optional): Whether the parts start the stream (see
+                                  `hls.get_segment_targets`).
+        published (list, optional): (duration, filename) tuples of the
+                                    published segments the parts continue.
+        discontinuity (bool, optional): Whether the tracks of the parts
+                                        differ from the published segments.
+
+    Returns:
+        list: (duration, filename) tuples of the segments.
+    """
+    published = published or []
+    segments = published + coalesce_segments(output_dir, parts, segment_base, startup and not published)
+    write_media_playlist(playlist_path, segments, init_segment=init_segment,
+                         target_duration=get_live_target_duration() if published else None,
+                         discontinuity=len(published) if published and discontinuity else None)
+    for _, filename in parts:
+        os.remove(os.path.join(output_dir, filename))
+    return segments
+
+
+def get_hls_outputs(output_dir, playlist_path, segments):
+    """
+    Lists the files of a packaged HLS stream for its completion marker.
+
+    Args:
+        output_dir (str): The directory of the stream.
+        playlist_path (str): The full path to its media playlist.
+        segments (list): (duration, filename) tuples of the playlist.
+
+    Returns:
+        list: The full paths of the playlist, the init segment (fMP4 only)
+              and the media segments.
+    """
+    init_segment = read_init_segment(playlist_path)
+    return [
+        playlist_path,
+        *([os.path.join(output_dir, init_segment)] if init_segment else []),
+        *(os.path.join(output_dir, filename) for _, filename in segments),
+    ]
+
+
+def build_transcode_command(input_path, outputs, audio_path=None):
+    """
+    Builds a single FFmpeg command that decodes the source once and encodes
+    every rendition from it.
+
+    The decoded video is split into one scaled stream per resolution and
+    each scaled stream is encoded exactly once into its MP4 rendition.
+
+    Every rendition is encoded with the options of its rung of the encoding
+    ladder (see `get_video_encoder_args`). The decoder, the filter graph
+    and every encoder are limited to the worker's thread budget. If the
+    audio was already encoded, the AAC track is copied into every rendition
+    instead of encoding it once per rendition.
+
+    Args:
+        input_path (str): The full path to the source video.
+        outputs (list): A list of dicts with the keys 'resolution',
+                        'mp4_path' and optionally 'rung'.
+        audio_path (str, optional): The full path to the shared AAC track.
+
+    Returns:
+        list: The FFmpeg command as a list of arguments.
+    """
+    thread_args = get_thread_args()
+    split_labels = ''.join(f"[v{output['resolution']}]" for output in outputs)
+    filters = [f"[0:v]split={len(outputs)}{split_labels}"]
+    for output in outputs:
+        resolution = output['resolution']
+        filters.append(f"[v{resolution}]scale=-2:{resolution}[out{resolution}]")
+
+    ffmpeg_cmd = ['ffmpeg', *thread_args, '-i', input_path]
+    if audio_path:
+        ffmpeg_cmd += ['-i', audio_path]
+    if thread_args:
+        ffmpeg_cmd += ['-filter_complex_threads', thread_args[1]]
+    ffmpeg_cmd += ['-filter_complex', ';'.join(filters)]
+    for output in outputs:
+        ffmpeg_cmd += [
+            '-map', f"[out{output['resolution']}]",
+            *get_video_encoder_args(output['resolution'], output.get('rung')),
+            *(get_audio_args(1, copy=True) if audio_path else get_audio_args(0, copy=False)),
+            '-movflags', '+faststart',
+            output['mp4_path']
+        ]
+    return ffmpeg_cmd
+
+
+def parse_frame_rate(rate):
+    """
+    Converts an ffprobe frame rate such as '30000/1001' into a float.
+
+    Args:
+        rate (str): The frame rate as reported by ffprobe.
+
+    Returns:
+        float or None: The frame rate, or None if it is unknown.
+    """
+    try:
+        numerator, _, denominator = (rate or '').partition('/')
+        value = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return value or None
+
+
+def run_ffprobe(path):
+    """
+    Reads the container and stream information of a media file.
+
+    Args:
+        path (str): The full path to the media file.
+
+    Returns:
+        dict: The parsed output of `ffprobe -show_format -show_streams`.
+
+    Raises:
+        subprocess.CalledProcessError: If ffprobe fails.
+    """
+    ffprobe_cmd = [
+        'ffprobe', '-v', 'error',
+        '-print_format', 'json',
+        '-show_format', '-show_streams',
+        path
+    ]
+    result = subprocess.run(ffprobe_cmd, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+
+def parse_probe_output(probe_data):
+    """
+    Extracts the media metadata stored on the Video model from ffprobe JSON.
+
+    Args:
+        probe_data (dict): The parsed output of `ffprobe -show_format -show_streams`.
+
+    Returns:
+        dict: The values for the metadata fields of the Video model.
+    """
+    streams = probe_data.get('streams', [])
+    video_stream = next((s for s in streams if s.get('codec_type') == 'video'), {})
+    audio_stream = next((s for s in streams if s.get('codec_type') == 'audio'), {})
+    probe_format = probe_data.get('format', {})
+
+    duration = probe_format.get('duration') or video_stream.get('duration')
+    bitrate = probe_format.get('bit_rate')
+    return {
+        'duration': float(duration) if duration else None,
+        'width': video_stream.get('width'),
+        'height': video_stream.get('height'),
+        'frame_rate': (parse_frame_rate(video_stream.get('avg_frame_rate'))
+                       or parse_frame_rate(video_stream.get('r_frame_rate'))),
+        'bitrate': int(bitrate) if bitrate else None,
+        'video_codec': video_stream.get('codec_name', ''),
+        'audio_codec': audio_stream.get('codec_name', ''),
+        'audio_channels': audio_stream.get('channels'),
+        'audio_channel_layout': audio_stream.get('channel_layout', ''),
+    }
+
+
+def select_resolutions(source_height):
+    """
+    Drops the renditions that would only upscale the source.
+
+    The lowest resolution is always kept, so that every video has at least
+    one rendition.
+
+    Args:
+        source_height (int or None): The height of the source video.
+
+    Returns:
+        list: The resolutions worth encoding.
+    """
+    if not source_height:
+        return list(RESOLUTIONS)
+    return [r for r in RESOLUTIONS if r <= source_height] or RESOLUTIONS[:1]
+
+
+def estimate_transcode_seconds(duration, frame_rate, resolutions, preset=None, connection=None):
+    """
+    Estimates how long one worker needs to encode the given renditions.
+
+    The speed the workers measured for the preset and resolutions is used
+    if there is one (see `scheduling.record_encode_speed`). Otherwise the
+    speed is derived from VIDEO_ENCODE_PIXELS_PER_SECOND and the relative
+    speed of the preset in VIDEO_ENCODE_PRESETS.
+
+    Args:
+        duration (float): The duration of the source in seconds.
+        frame_rate (float or None): The frame rate of the source.
+        resolutions (list): The resolutions to encode.
+        preset (str, optional): The x264 preset. Defaults to
+                                VIDEO_ENCODE_PRESET.
+        connection (Redis, optional): The Redis connection to read measured
+                                      speeds from; without one only the
+                                      static estimate is used.
+
+    Returns:
+        float: The estimated encode time in seconds.
+    """
+    preset = preset or settings.VIDEO_ENCODE_PRESET
+    frames = duration * (frame_rate or 25)
+    measured_fps = get_encode_speed(preset, resolutions, connection) if connection is not None else None
+    if measured_fps:
+        return frames / measured_fps
+
+    pixels_per_frame = sum(math.ceil(r * 16 / 9) * r for r in resolutions)
+    preset_speed = dict(settings.VIDEO_ENCODE_PRESETS).get(preset, 1.0)
+    return frames * pixels_per_frame / (settings.VIDEO_ENCODE_PIXELS_PER_SECOND * preset_speed)
+
+
+def get_transcode_timeout(duration, frame_rate, resolutions, preset=None, connection=None):
+    """
+    Chooses an RQ job timeout for a transcode from its estimated encode time.
+
+    Three times the estimate is allowed, but never less than the default
+    timeout of the queue.
+
+    Args:
+        duration (float): The duration of the (chunk of the) source in seconds.
+        frame_rate (float or None): The frame rate of the source.
+        resolutions (list): The resolutions to encode.
+        preset (str, optional): The x264 preset.
+        connection (Redis, optional): The Redis connection to read measured
+                                      speeds from.
+
+    Returns:
+        int: The job timeout in seconds.
+    """
+    estimate = estimate_transcode_seconds(duration, frame_rate, resolutions, preset, connection)
+    return max(settings.RQ_QUEUES['default']['DEFAULT_TIMEOUT'], math.ceil(estimate * 3))
+
+
 @job
-def convert_video_and_update_model(video_pk, target_resolution):
+def probe_video(video_pk, source_path, uploader_id=None, media_key=None):
     """
-    Converts a video to a new resolution and updates the model.
+    Analyses the source with ffprobe and builds the rest of the pipeline.
 
-    This function is executed as an RQ task, using FFmpeg to scale the video
-    and save the output file path in the corresponding field of the Video model.
+    The technical metadata is stored on the Video model and handed to
+    `build_pipeline`, which enqueues all following stages. A short trial
+    encode measures the complexity of the video, from which the pipeline
+    derives its per-title encoding ladder. If the trial encode fails, the
+    static ladder is used.
 
     Args:
         video_pk (int): The primary key of the Video instance.
-        target_resolution (int): The target resolution for the video (e.g., 480).
+        source_path (str): The full path to the uploaded source video.
+        uploader_id (int, optional): The primary key of the uploading user,
+                                     used for fair scheduling.
+        media_key (str, optional): The media key of the video (see
+                                   `Video.media_key`).
     """
     try:
-        video_instance = Video.objects.get(pk=video_pk)
-        original_path = video_instance.video_file.path
+        metadata = parse_probe_output(run_ffprobe(source_path))
+        try:
+            metadata['complexity'] = measure_complexity(source_path, metadata)
+        except (subprocess.CalledProcessError, OSError, ValueError) as e:
+            logger.warning(f"Complexity analysis of video {video_pk} failed, using the static ladder: {e}")
+            metadata['complexity'] = None
 
-        filename_base = get_filename_without_extension(original_path)
+        Video.objects.sharing_content_with(video_pk, media_key).update(**metadata)
+        build_pipeline(video_pk, source_path, metadata, depends_on=get_current_job(),
+                       uploader_id=uploader_id, media_key=media_key)
 
-        output_dir_absolute = os.path.join(settings.MEDIA_ROOT, 'videos', f'{target_resolution}p')
-        os.makedirs(output_dir_absolute, exist_ok=True)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFprobe error while probing video {video_pk}: {e}")
+        raise
+    except FileNotFoundError:
+        logger.error("Error: ffprobe command not found. Make sure ffmpeg is installed and in PATH.")
+        raise
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while probing video {video_pk}: {e}")
+        raise
 
-        target_filename = f"{filename_base}_{target_resolution}p.mp4"
-        output_path_absolute = os.path.join(output_dir_absolute, target_filename)
 
-        ffmpeg_cmd = [
-            'ffmpeg', '-i', original_path,
-            '-vf', f'scale=-2:{target_resolution}',
-            '-c:v', 'libx264', '-crf', '23', '-preset', 'medium',
-            '-c:a', 'aac', '-b:a', '128k',
-            '-strict', '-2',
-            output_path_absolute
-        ]
+def get_job_retry():
+    """
+    Returns the retry policy of pipeline jobs.
 
-        subprocess.run(ffmpeg_cmd, check=True)
+    A failed job is retried VIDEO_JOB_RETRIES times, waiting
+    VIDEO_RETRY_DELAY seconds before the first retry and twice as long
+    before each further one. Because every stage skips the work it already
+    completed, a retry only redoes what was lost.
+
+    Returns:
+        Retry or None: The policy, or None if retries are disabled.
+    """
+    if settings.VIDEO_JOB_RETRIES < 1:
+        return None
+    return Retry(
+        max=settings.VIDEO_JOB_RETRIES,
+        interval=[settings.VIDEO_RETRY_DELAY * 2 ** attempt for attempt in range(settings.VIDEO_JOB_RETRIES)]
+    )
+
+
+def build_pipeline(video_pk, source_path, metadata, depends_on=None, uploader_id=None, media_key=None):
+    """
+    Enqueues the processing stages of a probed video as a dependency graph.
+
+    The graph is: thumbnail, then the scrub bar sprites (see
+    `generate_trickplay`) beside the audio (encoded once, see
+    `encode_audio`), then the renditions (one single-decode transcode, or a
+    split followed by parallel chunk jobs and a concat), then one HLS
+    packaging job per resolution beside the hover preview (cut from the
+    lowest rendition, see `generate_preview`), then the master playlist,
+    then `finalize_video`. Every
+    job receives the paths and settings it needs as arguments, so no stage
+    has to load the Video row. The job IDs are recorded per stage and can
+    be queried with `pipeline.get_pipeline_status`.
+
+    Short jobs (thumbnail, trickplay, audio, split, packaging, preview,
+    master playlist, finalize) go to the 'fast' queue. The encodes go to the transcode
+    queue chosen by `scheduling.select_transcode_queue` from the estimated
+    encode time, so short videos are transcoded first and no uploader can
+    monopolise the workers.
+
+    Chunk jobs also publish their chunk as soon as it is encoded (see
+    `publish_live_streams`), so a long video can be watched while it is
+    still transcoding; the packaging jobs then only end the playlists.
+
+    Every job is retried with exponential backoff (see `get_job_retry`).
+    When the probe job is retried after it enqueued part or all of the
+    graph, the jobs of the earlier attempt are deleted first (see
+    `pipeline.delete_dependent_jobs`), so every stage is enqueued once.
+    Packaging still runs when the encode failed for good and falls back to
+    encoding from the source; the concat job checks that every chunk is
+    complete.
+
+    The renditions and their rate settings come from the per-title ladder
+    (see `complexity.get_title_ladder`) and are passed to every encode.
+    The x264 preset of the ladder is chosen by
+    `scheduling.select_encoder_preset` from the transcode backlog and the
+    measured encode speed, so the time-to-playable target is met under load.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        source_path (str): The full path to the uploaded source video.
+        metadata (dict): The probed metadata (see `parse_probe_output`)
+                         with the measured 'complexity'.
+        depends_on (Job, optional): The job the thumbnail waits for,
+                                    usually the running probe job.
+        uploader_id (int, optional): The primary key of the uploading user.
+        media_key (str, optional): The media key of the video, which names
+                                   its HLS, chunk and marker directories.
+                                   Defaults to the pk.
+
+    Returns:
+        dict: A mapping of stage names to the enqueued RQ jobs.
+    """
+    if depends_on is not None:
+        delete_dependent_jobs(depends_on)
+
+    media_key = media_key or video_pk
+    duration = metadata['duration'] or 0
+    frame_rate = metadata['frame_rate']
+    ladder = get_title_ladder(select_resolutions(metadata['height']), metadata.get('complexity'), frame_rate)
+    resolutions = sorted(ladder)
+    filename_base = get_filename_without_extension(source_path)
+    chunked = duration >= settings.VIDEO_CHUNKED_MIN_DURATION
+    chunk_count = math.ceil(duration / settings.VIDEO_CHUNK_DURATION) if chunked else 1
+
+    queue = django_rq.get_queue(FAST_QUEUE)
+    estimates = {
+        preset: estimate_transcode_seconds(duration, frame_rate, resolutions, preset, queue.connection)
+        for preset, _ in settings.VIDEO_ENCODE_PRESETS
+    }
+    preset = select_encoder_preset(estimates, parallelism=chunk_count, connection=queue.connection,
+                                   video_pk=video_pk)
+    ladder = {resolution: {**rung, 'preset': preset} for resolution, rung in ladder.items()}
+    transcode_cost = estimates[preset]
+
+    transcode_queue_name = select_transcode_queue(video_pk, transcode_cost, uploader_id,
+                                                  connection=queue.connection)
+    add_transcode_backlog(video_pk, transcode_cost, connection=queue.connection)
+    transcode_queue = django_rq.get_queue(transcode_queue_name)
+    logger.info(f"Video {video_pk} probed: {metadata['width']}x{metadata['height']}, {duration:.1f}s, "
+                f"complexity {metadata.get('complexity')}, ladder {ladder}, "
+                f"estimated encode time {transcode_cost:.0f}s, queue {transcode_queue_name}.")
+
+    jobs = {}
+    jobs['thumbnail'] = queue.enqueue(generate_thumbnail, video_pk, source_path, metadata['width'], media_key,
+                                      depends_on=depends_on, retry=get_job_retry())
+    after_thumbnail = Dependency(jobs=[jobs['thumbnail']], allow_failure=True)
+    jobs['trickplay'] = queue.enqueue(generate_trickplay, video_pk, source_path, metadata, media_key,
+                                      depends_on=after_thumbnail,
+                                      job_timeout=settings.RQ_QUEUES['default']['DEFAULT_TIMEOUT'],
+                                      retry=get_job_retry())
+
+    audio_path = None
+    after_audio = after_thumbnail
+    audio_jobs = []
+    if metadata['audio_codec']:
+        audio_path = os.path.join(settings.MEDIA_ROOT, get_audio_name(filename_base))
+        jobs['audio'] = queue.enqueue(encode_audio, video_pk, source_path, duration, media_key,
+                                      depends_on=after_thumbnail,
+                                      job_timeout=settings.RQ_QUEUES['default']['DEFAULT_TIMEOUT'],
+                                      retry=get_job_retry())
+        after_audio = Dependency(jobs=[jobs['audio']], allow_failure=True)
+        audio_jobs = [jobs['audio']]
+
+    if chunked:
+        jobs['split'] = queue.enqueue(split_video_into_chunks, video_pk, source_path, media_key,
+                                      depends_on=after_thumbnail, retry=get_job_retry())
+        after_split = Dependency(jobs=[jobs['split']], allow_failure=True)
+        chunk_timeout = get_transcode_timeout(settings.VIDEO_CHUNK_DURATION, frame_rate, resolutions,
+                                              preset, queue.connection)
+        chunk_jobs = []
+        for chunk_index in range(chunk_count):
+            chunk_job = transcode_queue.enqueue(transcode_chunk, video_pk, chunk_index, resolutions, ladder,
+                                                media_key, bool(metadata['audio_codec']),
+                                                depends_on=after_split, job_timeout=chunk_timeout,
+                                                retry=get_job_retry())
+            jobs[f'chunk_{chunk_index:04d}'] = chunk_job
+            chunk_jobs.append(chunk_job)
+        rendition_job = jobs['concat'] = transcode_queue.enqueue(
+            concat_video_chunks, video_pk, source_path, resolutions, duration, audio_path, media_key,
+            depends_on=Dependency(jobs=[*chunk_jobs, *audio_jobs], allow_failure=True), retry=get_job_retry()
+        )
+    else:
+        rendition_job = jobs['transcode'] = transcode_queue.enqueue(
+            transcode_video, video_pk, source_path, resolutions, duration, ladder, audio_path, media_key,
+            depends_on=after_audio,
+            job_timeout=get_transcode_timeout(duration, frame_rate, resolutions, preset, queue.connection),
+            retry=get_job_retry()
+        )
+
+    after_renditions = Dependency(jobs=[rendition_job], allow_failure=True)
+    preview_rendition_path = os.path.join(settings.MEDIA_ROOT, get_rendition_name(filename_base, resolutions[0]))
+    jobs['preview'] = queue.enqueue(generate_preview, video_pk, source_path, preview_rendition_path, duration,
+                                    media_key, depends_on=after_renditions, retry=get_job_retry())
+    packaging_jobs = []
+    for resolution in resolutions:
+        rendition_path = os.path.join(settings.MEDIA_ROOT, get_rendition_name(filename_base, resolution))
+        packaging_job = queue.enqueue(generate_hls_playlist, video_pk, resolution, source_path, rendition_path,
+                                      duration, media_key, ladder[resolution], bool(metadata['audio_codec']),
+                                      depends_on=after_renditions, retry=get_job_retry())
+        jobs[f'hls_{resolution}p'] = packaging_job
+        packaging_jobs.append(packaging_job)
+
+    jobs['master'] = queue.enqueue(generate_master_playlist, video_pk, resolutions, media_key,
+                                   depends_on=Dependency(jobs=packaging_jobs, allow_failure=True),
+                                   retry=get_job_retry())
+    jobs['finalize'] = queue.enqueue(finalize_video, video_pk, uploader_id, media_key,
+                                     depends_on=Dependency(jobs=[jobs['master']], allow_failure=True))
+    record_pipeline_jobs(video_pk, jobs, connection=queue.connection)
+    return jobs
+
+
+def get_rendition_name(filename_base, resolution):
+    """
+    Returns the path of an MP4 rendition relative to MEDIA_ROOT.
+
+    Args:
+        filename_base (str): The source filename without its extension.
+        resolution (int): The resolution of the rendition.
+
+    Returns:
+        str: The relative path, as stored in the `video_<res>p` field.
+    """
+    return os.path.join('videos', f'{resolution}p', f"{filename_base}_{resolution}p.mp4")
+
+
+def get_audio_name(filename_base):
+    """
+    Returns the path of the shared AAC track relative to MEDIA_ROOT.
+
+    Args:
+        filename_base (str): The source filename without its extension.
+
+    Returns:
+        str: The relative path, as stored in the `audio_file` field.
+    """
+    return os.path.join('videos', 'audio', f"{filename_base}_audio.m4a")
+
+
+def get_shared_audio_path(video_pk, audio_path, media_key=None):
+    """
+    Returns the shared AAC track if it is complete.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        audio_path (str or None): The full path to the shared AAC track.
+        media_key (str, optional): The media key of the video, which names
+                                   its marker directory. Defaults to the pk.
+
+    Returns:
+        str or None: audio_path, or None if the track does not exist (no
+                     audio, or its encode failed) and the audio has to be
+                     encoded from the source.
+    """
+    if audio_path and is_complete(media_key or video_pk, 'audio'):
+        return audio_path
+    if audio_path:
+        logger.warning(f"Shared audio of video {video_pk} is missing, encoding the audio from the source.")
+    return None
 
-        output_path_relative = os.path.join('videos', f'{target_resolution}p', target_filename)
 
-        if target_resolution == 480:
-            video_instance.video_480p.name = output_path_relative
-        elif target_resolution == 720:
-            video_instance.video_720p.name = output_path_relative
-        elif target_resolution == 1080:
-            video_instance.video_1080p.name = output_path_relative
+@job
+def encode_audio(video_pk, source_path, duration=None, media_key=None):
+    """
+    Encodes the audio track of a video once and packages it as the HLS
+    audio rendition.
+
+    The AAC track is stored as `videos/audio/<name>_audio.m4a`. The encodes
+    copy it into every MP4 rendition, and it is segmented into
+    `hls/<media_key>/audio/` with the segment schedule of the video streams
+    (see `publish_hls_stream`). All video variants of the master playlist
+    reference it as their audio group. Completed steps are not
+    repeated. The progress is published as stage 'audio'.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        source_path (str): The full path to the source video.
+        duration (float, optional): The probed duration of the source.
+        media_key (str, optional): The media key of the video, which names
+                                   its HLS and marker directories.
+                                   Defaults to the pk.
+    """
+    media_key = media_key or video_pk
+    try:
+        audio_name = get_audio_name(get_filename_without_extension(source_path))
+        audio_path = os.path.join(settings.MEDIA_ROOT, audio_name)
 
-        video_instance.save(update_fields=[f'video_{target_resolution}p'])
-        logger.info(f"Video {video_pk} successfully converted to {target_resolution}p and model updated.")
+        if not is_complete(media_key, 'audio', verify=True):
+            os.makedirs(os.path.dirname(audio_path), exist_ok=True)
+            ffmpeg_cmd = [
+                'ffmpeg', '-y', *get_thread_args(), '-i', source_path,
+                '-map', '0:a:0', '-vn',
+                '-c:a', 'aac', '-b:a', '128k', *get_thread_args(),
+                '-movflags', '+faststart',
+                audio_path
+            ]
+            run_ffmpeg(ffmpeg_cmd, video_pk, 'audio', duration)
+            write_marker(media_key, 'audio', [audio_path])
+
+        if not is_complete(media_key, 'hls_audio', verify=True):
+            output_dir_absolute = get_hls_dir(media_key, 'audio')
+            os.makedirs(output_dir_absolute, exist_ok=True)
+            playlist_path = os.path.join(output_dir_absolute, 'index.m3u8')
+            ffmpeg_cmd = [
+                'ffmpeg', '-y', '-i', audio_path,
+                '-c', 'copy',
+                '-f', 'hls',
+                '-hls_time', str(settings.VIDEO_KEYFRAME_INTERVAL),
+                '-hls_list_size', '0',
+                '-hls_playlist_type', 'vod',
+                *get_hls_segment_args(output_dir_absolute, 'audio_part'),
+                playlist_path
+            ]
+            subprocess.run(ffmpeg_cmd, check=True)
+            segments = publish_hls_stream(output_dir_absolute, playlist_path, read_playlist_segments(playlist_path),
+                                          'audio', read_init_segment(playlist_path))
+            write_marker(media_key, 'hls_audio', get_hls_outputs(output_dir_absolute, playlist_path, segments))
+
+        Video.objects.sharing_content_with(video_pk, media_key).update(audio_file=audio_name)
+        logger.info(f"Audio of video {video_pk} encoded once and packaged as HLS audio rendition.")
 
-    except Video.DoesNotExist:
-        logger.error(f"Video with ID {video_pk} not found for conversion.")
     except subprocess.CalledProcessError as e:
-        logger.error(f"FFmpeg error during conversion of video {video_pk} to {target_resolution}p: {e}")
+        logger.error(f"FFmpeg error while encoding the audio of video {video_pk}: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error while encoding the audio of video {video_pk}: {e}")
+        raise
+
+
+def get_rendition_outputs(filename_base, resolutions, ladder=None):
+    """
+    Creates the rendition directories and describes the MP4 output of each
+    resolution.
+
+    Args:
+        filename_base (str): The source filename without its extension.
+        resolutions (list): The target resolutions.
+        ladder (dict, optional): The per-title rung of every resolution.
+
+    Returns:
+        list: A list of dicts with the keys 'resolution', 'mp4_path',
+              'mp4_name' (the path relative to MEDIA_ROOT) and 'rung'.
+    """
+    outputs = []
+    for resolution in resolutions:
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'videos', f'{resolution}p'), exist_ok=True)
+
+        mp4_name = get_rendition_name(filename_base, resolution)
+        outputs.append({
+            'resolution': resolution,
+            'mp4_path': os.path.join(settings.MEDIA_ROOT, mp4_name),
+            'mp4_name': mp4_name,
+            'rung': (ladder or {}).get(resolution),
+        })
+    return outputs
+
+
+@job
+def transcode_video(video_pk, source_path, resolutions, duration=None, ladder=None, audio_path=None,
+                    media_key=None):
+    """
+    Transcodes a video into all MP4 renditions with a single FFmpeg run.
+
+    The source is decoded once and every resolution is encoded once.
+    Renditions with a valid completion marker are not encoded again.
+    Afterwards all rendition fields of the Video model are updated together.
+    The progress is published as stage 'transcode' and the encode speed is
+    recorded per preset (see `record_transcode_speed`).
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        source_path (str): The full path to the source video.
+        resolutions (list): The target resolutions.
+        duration (float, optional): The probed duration of the source.
+        ladder (dict, optional): The per-title rung of every resolution.
+        audio_path (str, optional): The full path to the shared AAC track,
+                                    which is copied into every rendition.
+        media_key (str, optional): The media key of the video, which names
+                                   its marker directory. Defaults to the pk.
+    """
+    media_key = media_key or video_pk
+    try:
+        filename_base = get_filename_without_extension(source_path)
+        outputs = get_rendition_outputs(filename_base, resolutions, ladder)
+        pending = [output for output in outputs
+                   if not is_complete(media_key, f"rendition_{output['resolution']}p", verify=True)]
+
+        if pending:
+            audio_path = get_shared_audio_path(video_pk, audio_path, media_key)
+            ffmpeg_cmd = build_transcode_command(source_path, pending, audio_path)
+            progress = run_ffmpeg(ffmpeg_cmd, video_pk, 'transcode', duration)
+            record_transcode_speed(video_pk, pending, progress)
+            for output in pending:
+                write_marker(media_key, f"rendition_{output['resolution']}p", [output['mp4_path']])
+        else:
+            logger.info(f"All renditions of video {video_pk} are already complete.")
+
+        Video.objects.sharing_content_with(video_pk, media_key).update(**{
+            f"video_{output['resolution']}p": output['mp4_name'] for output in outputs
+        })
+        logger.info(f"Video {video_pk} transcoded to {', '.join(f'{r}p' for r in resolutions)} in a single pass.")
+
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg error during transcoding of video {video_pk}: {e}")
+        raise
     except FileNotFoundError:
         logger.error("Error: ffmpeg command not found. Make sure ffmpeg is installed and in PATH.")
+        raise
     except Exception as e:
-        logger.error(f"An unexpected error occurred during conversion for video {video_pk}: {e}")
+        logger.error(f"An unexpected error occurred during transcoding for video {video_pk}: {e}")
+        raise
+
 
-def convert_480p(video_pk):
+def record_transcode_speed(video_pk, outputs, progress):
     """
-    Enqueues the conversion task for 480p resolution.
+    Records the speed of a finished encode for the estimates of later
+    videos. Errors are only logged, they must not fail the encode.
 
     Args:
         video_pk (int): The primary key of the Video instance.
+        outputs (list): The encoded outputs (see `get_rendition_outputs`).
+        progress (dict): The final progress returned by `run_ffmpeg`.
+    """
+    rung = outputs[0].get('rung') or {}
+    preset = rung.get('preset', settings.VIDEO_ENCODE_PRESET)
+    logger.info(f"Encode of video {video_pk} with preset {preset} ran at {progress['fps']} fps "
+                f"({progress['speed']}x real time).")
+    try:
+        record_encode_speed(preset, [output['resolution'] for output in outputs], progress['fps'])
+    except Exception as e:
+        logger.warning(f"Could not record the encode speed of video {video_pk}: {e}")
+
+
+def get_chunk_dir(media_key, *parts):
+    """
+    Returns the working directory for the chunks of a video.
+
+    Args:
+        media_key (str): The media key of the video (see `Video.media_key`).
+        *parts (str): Optional subdirectories below the chunk directory.
+
+    Returns:
+        str: The absolute path of the directory.
     """
-    return convert_video_and_update_model.delay(video_pk, 480)
+    return os.path.join(settings.MEDIA_ROOT, 'chunks', str(media_key), *parts)
 
-def convert_720p(video_pk):
+
+@job
+def split_video_into_chunks(video_pk, source_path, media_key=None):
     """
-    Enqueues the conversion task for 720p resolution.
+    Cuts the video stream of the source at keyframes into chunks.
+
+    The source is split with stream copy into chunks of roughly
+    VIDEO_CHUNK_DURATION seconds, named `chunk_0000.mkv`, `chunk_0001.mkv`
+    and so on. Each chunk is transcoded by its own `transcode_chunk` job.
+    The start time of every chunk is written to `chunks.csv` (see
+    `get_chunk_start`). A completed split is not repeated.
 
     Args:
         video_pk (int): The primary key of the Video instance.
+        source_path (str): The full path to the source video.
+        media_key (str, optional): The media key of the video, which names
+                                   its chunk directory. Defaults to the pk.
     """
-    return convert_video_and_update_model.delay(video_pk, 720)
+    media_key = media_key or video_pk
+    if is_complete(media_key, 'split', verify=True):
+        logger.info(f"Video {video_pk} is already split into chunks.")
+        return
+
+    source_chunk_dir = get_chunk_dir(media_key, 'source')
+    os.makedirs(source_chunk_dir, exist_ok=True)
+    chunk_list_path = get_chunk_dir(media_key, 'chunks.csv')
+
+    ffmpeg_cmd = [
+        'ffmpeg', '-i', source_path,
+        '-map', '0:v:0', '-c', 'copy',
+        '-f', 'segment',
+        '-segment_time', str(settings.VIDEO_CHUNK_DURATION),
+        '-reset_timestamps', '1',
+        '-segment_list', chunk_list_path,
+        '-segment_list_type', 'csv',
+        os.path.join(source_chunk_dir, 'chunk_%04d.mkv')
+    ]
+    try:
+        subprocess.run(ffmpeg_cmd, check=True)
+        chunk_names = sorted(os.listdir(source_chunk_dir))
+        write_marker(media_key, 'split', [
+            chunk_list_path, *(os.path.join(source_chunk_dir, name) for name in chunk_names)
+        ])
+        logger.info(f"Video {video_pk} split into {len(chunk_names)} chunks.")
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg error while splitting video {video_pk} into chunks: {e}")
+        raise
+
 
-def convert_1080p(video_pk):
+@job
+def transcode_chunk(video_pk, chunk_index, resolutions, ladder=None, media_key=None, has_audio=False):
     """
-    Enqueues the conversion task for 1080p resolution.
+    Transcodes a single source chunk into all resolutions.
+
+    The progress is published under the chunk name, e.g. 'chunk_0003', and
+    the encode speed is recorded per preset. The
+    number of chunk jobs is derived from the probed duration. Because
+    the source is cut at keyframes, the split may produce one chunk less;
+    a job whose chunk does not exist has nothing to do. Resolutions that
+    already have a completion marker are skipped.
+
+    The encoded chunk is then packaged and published right away (see
+    `package_chunk` and `publish_live_streams`), so long videos become
+    playable while the remaining chunks are still transcoding.
 
     Args:
         video_pk (int): The primary key of the Video instance.
+        chunk_index (int): The index of the chunk.
+        resolutions (list): The target resolutions.
+        ladder (dict, optional): The per-title rung of every resolution.
+        media_key (str, optional): The media key of the video, which names
+                                   its HLS and marker directories.
+                                   Defaults to the pk.
+        has_audio (bool, optional): Whether the source has an audio stream,
+                                    which the live streams wait for.
     """
-    return convert_video_and_update_model.delay(video_pk, 1080)
+    media_key = media_key or video_pk
+    chunk_base = f'chunk_{chunk_index:04d}'
+    chunk_path = get_chunk_dir(media_key, 'source', f'{chunk_base}.mkv')
+    if not os.path.exists(chunk_path):
+        logger.info(f"Chunk {chunk_index} of video {video_pk} does not exist, nothing to transcode.")
+        return
+
+    outputs = []
+    for resolution in resolutions:
+        if is_complete(media_key, f'{chunk_base}_{resolution}p', verify=True):
+            continue
+        output_dir_absolute = get_chunk_dir(media_key, f'{resolution}p')
+        os.makedirs(output_dir_absolute, exist_ok=True)
+        outputs.append({
+            'resolution': resolution,
+            'mp4_path': os.path.join(output_dir_absolute, f'{chunk_base}.mp4'),
+            'rung': (ladder or {}).get(resolution),
+        })
+    try:
+        if outputs:
+            progress = run_ffmpeg(build_transcode_command(chunk_path, outputs), video_pk, chunk_base,
+                                  settings.VIDEO_CHUNK_DURATION)
+            record_transcode_speed(video_pk, outputs, progress)
+            for output in outputs:
+                write_marker(media_key, f"{chunk_base}_{output['resolution']}p", [output['mp4_path']])
+            logger.info(f"Chunk {chunk_index} of video {video_pk} transcoded.")
+        else:
+            logger.info(f"Chunk {chunk_index} of video {video_pk} is already transcoded.")
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg error while transcoding chunk {chunk_index} of video {video_pk}: {e}")
+        raise
+
+    if settings.VIDEO_SEGMENT_TYPE == 'fmp4':
+        return
+    try:
+        package_chunk(video_pk, chunk_index, resolutions, media_key)
+        publish_live_streams(video_pk, resolutions, media_key, has_audio)
+    except Exception as e:
+        logger.warning(f"Could not publish chunk {chunk_index} of video {video_pk} for live playback, "
+                       f"it is packaged with the complete renditions: {e}")
+
+
+def get_chunk_start(media_key, chunk_base):
+    """
+    Returns the start time of a chunk in the source.
+
+    Args:
+        media_key (str): The media key of the video (see `Video.media_key`).
+        chunk_base (str): The name of the chunk, e.g. 'chunk_0003'.
+
+    Returns:
+        float: The start time in seconds, from the chunk list of the split.
+
+    Raises:
+        ValueError: If the chunk is not in the chunk list.
+    """
+    with open(get_chunk_dir(media_key, 'chunks.csv'), newline='') as chunk_list:
+        for row in csv.reader(chunk_list):
+            if row and get_filename_without_extension(row[0]) == chunk_base:
+                return float(row[1])
+    raise ValueError(f"{chunk_base} is not in the chunk list of {media_key}")
+
+
+def get_chunk_playlist_path(media_key, chunk_base, resolution):
+    """
+    Returns the path of the playlist that lists the HLS segments of a chunk.
+
+    Args:
+        media_key (str): The media key of the video (see `Video.media_key`).
+        chunk_base (str): The name of the chunk, e.g. 'chunk_0003'.
+        resolution (int): The resolution of the stream.
+
+    Returns:
+        str: The absolute path, next to the encoded chunk.
+    """
+    return get_chunk_dir(media_key, f'{resolution}p', f'{chunk_base}.m3u8')
+
+
+def package_chunk(video_pk, chunk_index, resolutions, media_key=None):
+    """
+    Packages the encoded renditions of a chunk as HLS segments.
+
+    The segments are written to the HLS directory of the stream, shifted
+    by the chunk's start time so they continue the segments of the chunk
+    before. Only the first chunk starts with short segments. The segments
+    of every chunk are listed in its own playlist (see
+    `get_chunk_playlist_path`) and recorded as stage
+    'chunk_<n>_hls_<res>p'; completed chunks are not packaged again.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        chunk_index (int): The index of the chunk.
+        resolutions (list): The target resolutions.
+        media_key (str, optional): The media key of the video, which names
+                                   its HLS and marker directories.
+                                   Defaults to the pk.
+
+    Raises:
+        subprocess.CalledProcessError: If FFmpeg fails.
+    """
+    media_key = media_key or video_pk
+    chunk_base = f'chunk_{chunk_index:04d}'
+    start = get_chunk_start(media_key, chunk_base)
+    for resolution in resolutions:
+        stage = f'{chunk_base}_hls_{resolution}p'
+        if is_complete(media_key, stage, verify=True):
+            continue
+        stream_dir = get_hls_dir(media_key, f'{resolution}p')
+        os.makedirs(stream_dir, exist_ok=True)
+        segment_base = f'{chunk_base}_{resolution}p'
+        playlist_path = get_chunk_playlist_path(media_key, chunk_base, resolution)
+        partial_playlist_path = get_chunk_dir(media_key, f'{resolution}p', f'{chunk_base}.partial.m3u8')
+        ffmpeg_cmd = [
+            'ffmpeg', '-y', '-i', get_chunk_dir(media_key, f'{resolution}p', f'{chunk_base}.mp4'),
+            '-c', 'copy',
+            '-output_ts_offset', f'{start:.6f}',
+            '-f', 'hls',
+            '-hls_time', str(settings.VIDEO_KEYFRAME_INTERVAL),
+            '-hls_list_size', '0',
+            '-hls_playlist_type', 'vod',
+            *get_hls_segment_args(stream_dir, f'{segment_base}_part'),
+            partial_playlist_path
+        ]
+        subprocess.run(ffmpeg_cmd, check=True)
+        segments = publish_hls_stream(stream_dir, playlist_path, read_playlist_segments(partial_playlist_path),
+                                      segment_base, startup=chunk_index == 0)
+        os.remove(partial_playlist_path)
+        write_marker(media_key, stage, [
+            playlist_path, *(os.path.join(stream_dir, filename) for _, filename in segments)
+        ])
+
+
+def get_chunk_bases(media_key):
+    """
+    Returns the names of the chunks the source was split into.
+
+    Args:
+        media_key (str): The media key of the video (see `Video.media_key`).
+
+    Returns:
+        list: The sorted chunk names, e.g. ['chunk_0000', 'chunk_0001'].
+    """
+    return sorted(get_filename_without_extension(name) for name in os.listdir(get_chunk_dir(media_key, 'source')))
+
+
+def publish_live_streams(video_pk, resolutions, media_key=None, has_audio=False):
+    """
+    Publishes the chunks packaged so far as growing HLS playlists.
+
+    The segments of the packaged chunks, up to the first chunk that is
+    still missing, are written as an EVENT playlist to the stream's
+    `index.m3u8`, which players reload until `generate_hls_playlist` ends
+    it. Chunk jobs finish in any order and publish concurrently, so the
+    playlists are written under a file lock and never shrink. Once every
+    stream has segments (and the audio rendition is complete if the
+    source has audio), a first master playlist is written.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        resolutions (list): The target resolutions.
+        media_key (str, optional): The media key of the video, which names
+                                   its HLS and marker directories.
+                                   Defaults to the pk.
+        has_audio (bool, optional): Whether the source has an audio stream.
+    """
+    media_key = media_key or video_pk
+    chunk_bases = get_chunk_bases(media_key)
+    os.makedirs(get_hls_dir(media_key), exist_ok=True)
+    with open(get_hls_dir(media_key, 'publish.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        for resolution in resolutions:
+            segments = []
+            for chunk_base in chunk_bases:
+                chunk_playlist_path = get_chunk_playlist_path(media_key, chunk_base, resolution)
+                if not os.path.exists(chunk_playlist_path):
+                    break
+                segments += read_playlist_segments(chunk_playlist_path)
+            playlist_path = get_hls_dir(media_key, f'{resolution}p', 'index.m3u8')
+            if len(segments) > len(read_playlist_segments(playlist_path)):
+                write_media_playlist(playlist_path, segments, ended=False, target_duration=get_live_target_duration())
+
+        if (not os.path.exists(get_hls_dir(media_key, 'master.m3u8'))
+                and (not has_audio or is_complete(media_key, 'hls_audio'))):
+            generate_master_playlist(video_pk, resolutions, media_key, live=True)
+
+
+def get_live_segments(media_key, resolution):
+    """
+    Returns the segments of a stream that was packaged chunk by chunk.
+
+    Args:
+        media_key (str): The media key of the video (see `Video.media_key`).
+        resolution (int): The resolution of the stream.
+
+    Returns:
+        list or None: (duration, filename) tuples of all chunks, or None if
+                      the video was not split or a chunk is not packaged.
+    """
+    if not is_complete(media_key, 'split'):
+        return None
+    segments = []
+    for chunk_base in get_chunk_bases(media_key):
+        if not is_complete(media_key, f'{chunk_base}_hls_{resolution}p'):
+            return None
+        segments += read_playlist_segments(get_chunk_playlist_path(media_key, chunk_base, resolution))
+    return segments
+
+
+@job
+def concat_video_chunks(video_pk, source_path, resolutions, duration=None, audio_path=None, media_key=None):
+    """
+    Stitches the transcoded chunks back into the MP4 renditions.
+
+    The encoded chunks of every resolution are joined with the concat
+    demuxer and stream copy; the shared AAC track is copied into every
+    rendition (if it is missing, the audio of the source is encoded).
+    Afterwards the rendition fields of the model are updated.
+    Renditions with a completion marker are not joined again.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        source_path (str): The full path to the source video.
+        resolutions (list): The target resolutions.
+        duration (float, optional): The probed duration of the source.
+        audio_path (str, optional): The full path to the shared AAC track.
+        media_key (str, optional): The media key of the video, which names
+                                   its chunk and marker directories.
+                                   Defaults to the pk.
+
+    Raises:
+        RuntimeError: If the split or one of the chunks is not complete.
+    """
+    media_key = media_key or video_pk
+    try:
+        filename_base = get_filename_without_extension(source_path)
+        outputs = get_rendition_outputs(filename_base, resolutions)
+        pending = [output for output in outputs
+                   if not is_complete(media_key, f"rendition_{output['resolution']}p", verify=True)]
+
+        if pending:
+            if not is_complete(media_key, 'split'):
+                raise RuntimeError("the source was not split into chunks")
+            chunk_bases = [
+                get_filename_without_extension(name) for name in os.listdir(get_chunk_dir(media_key, 'source'))
+            ]
+            missing = [
+                f"{chunk_base}_{output['resolution']}p" for chunk_base in chunk_bases for output in pending
+                if not is_complete(media_key, f"{chunk_base}_{output['resolution']}p")
+            ]
+            if missing:
+                raise RuntimeError(f"chunks are not transcoded: {', '.join(sorted(missing))}")
+
+        shared_audio_path = get_shared_audio_path(video_pk, audio_path, media_key) if pending else None
+        for output in pending:
+            resolution_dir = get_chunk_dir(media_key, f"{output['resolution']}p")
+            chunk_files = sorted(name for name in os.listdir(resolution_dir) if name.endswith('.mp4'))
+            concat_list_path = os.path.join(resolution_dir, 'concat.txt')
+            with open(concat_list_path, 'w') as concat_list:
+                for chunk_file in chunk_files:
+                    concat_list.write(f"file '{os.path.join(resolution_dir, chunk_file)}'\n")
+
+            ffmpeg_cmd = [
+                'ffmpeg', '-f', 'concat', '-safe', '0', '-i', concat_list_path,
+                '-i', shared_audio_path or source_path,
+                '-map', '0:v', *get_audio_args(1, copy=bool(shared_audio_path)),
+                '-c:v', 'copy',
+                '-movflags', '+faststart',
+                output['mp4_path']
+            ]
+            run_ffmpeg(ffmpeg_cmd, video_pk, 'concat', duration)
+            write_marker(media_key, f"rendition_{output['resolution']}p", [output['mp4_path']])
+
+        Video.objects.sharing_content_with(video_pk, media_key).update(**{
+            f"video_{output['resolution']}p": output['mp4_name'] for output in outputs
+        })
+        logger.info(f"Video {video_pk} assembled from its transcoded chunks.")
+
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg error while concatenating chunks of video {video_pk}: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while concatenating chunks of video {video_pk}: {e}")
+        raise
+
+
+@job
+def finalize_video(video_pk, uploader_id=None, media_key=None):
+    """
+    Completes the processing pipeline of a video.
+
+    Runs after the master playlist, whether it succeeded or not, removes
+    the intermediate chunk files with their markers and releases the
+    video's transcode cost from the backlog and from the uploader's
+    fair-share budget.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        uploader_id (int, optional): The primary key of the uploading user.
+        media_key (str, optional): The media key of the video, which names
+                                   its chunk and marker directories.
+                                   Defaults to the pk.
+    """
+    media_key = media_key or video_pk
+    shutil.rmtree(get_chunk_dir(media_key), ignore_errors=True)
+    clear_markers(media_key, 'split')
+    clear_markers(media_key, 'chunk_*')
+    try:
+        release_transcode_backlog(video_pk)
+        release_transcode_cost(video_pk, uploader_id)
+    except Exception as e:
+        logger.warning(f"Could not release the transcode cost of video {video_pk}: {e}")
+    logger.info(f"Processing pipeline of video {video_pk} finished.")
+
+
+def get_probe_path(stream_dir, segments):
+    """
+    Returns the file of a packaged HLS stream that ffprobe can read on its own.
+
+    fMP4 media segments lack the codec configuration, which is stored in
+    the init segment; MPEG-TS segments are self-contained.
+
+    Args:
+        stream_dir (str): The directory of the stream.
+        segments (list): (duration, filename) tuples of its playlist.
+
+    Returns:
+        str: The full path to the init segment or the first segment.
+    """
+    init_segment = read_init_segment(os.path.join(stream_dir, 'index.m3u8'))
+    return os.path.join(stream_dir, init_segment or segments[0][1])
+
+
+@job
+def generate_master_playlist(video_pk, resolutions, media_key=None, live=False):
+    """
+    Writes the master playlist that lets players switch between renditions.
+
+    Every HLS stream that was packaged completely becomes a variant of
+    `hls/<media_key>/master.m3u8`. BANDWIDTH and AVERAGE-BANDWIDTH are
+    measured from the segment sizes; RESOLUTION, CODECS and FRAME-RATE are
+    read with ffprobe from the first segment, or from the init segment of
+    fMP4 streams. If the HLS audio rendition is
+    complete, it is listed as the audio group of all variants, and its
+    bandwidth and codec are added to theirs.
+
+    While chunks are still being published (see `publish_live_streams`),
+    a first master playlist is written from the segments published so
+    far; it is only written once every stream has segments and is
+    replaced when the streams are complete.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        resolutions (list): The resolutions that were packaged.
+        media_key (str, optional): The media key of the video, which names
+                                   its HLS and marker directories.
+                                   Defaults to the pk.
+        live (bool, optional): Whether the streams are still growing.
+
+    Raises:
+        RuntimeError: If no HLS stream is complete.
+    """
+    media_key = media_key or video_pk
+    try:
+        audio = None
+        audio_bandwidth = {'bandwidth': 0, 'average_bandwidth': 0}
+        audio_codecs = []
+        if is_complete(media_key, 'hls_audio'):
+            audio_dir = get_hls_dir(media_key, 'audio')
+            audio_segments = read_playlist_segments(os.path.join(audio_dir, 'index.m3u8'))
+            audio_bandwidth = get_stream_bandwidth(audio_dir, audio_segments)
+            audio_probe_path = get_probe_path(audio_dir, audio_segments)
+            audio_codecs = [get_codecs(run_ffprobe(audio_probe_path).get('streams', []))]
+            audio = {'uri': 'audio/index.m3u8', 'group_id': 'audio', 'name': 'Default'}
+
+        variants = []
+        for resolution in resolutions:
+            stream_dir = get_hls_dir(media_key, f'{resolution}p')
+            segments = read_playlist_segments(os.path.join(stream_dir, 'index.m3u8'))
+            if live and not segments:
+                logger.info(f"HLS stream {resolution}p of video {video_pk} has no segments yet.")
+                return
+            if not live and not is_complete(media_key, f'hls_{resolution}p'):
+                logger.warning(f"HLS stream {resolution}p of video {video_pk} is incomplete, "
+                               f"leaving it out of the master playlist.")
+                continue
+            streams = run_ffprobe(get_probe_path(stream_dir, segments)).get('streams', [])
+            video_stream = next(stream for stream in streams if stream.get('codec_type') == 'video')
+            bandwidth = get_stream_bandwidth(stream_dir, segments)
+            variants.append({
+                'uri': f'{resolution}p/index.m3u8',
+                **{key: value + audio_bandwidth[key] for key, value in bandwidth.items()},
+                'resolution': f"{video_stream['width']}x{video_stream['height']}",
+                'codecs': ','.join(filter(None, [get_codecs(streams), *audio_codecs])),
+                'frame_rate': parse_frame_rate(video_stream.get('avg_frame_rate')),
+            })
+
+        if not variants:
+            raise RuntimeError(f"no complete HLS stream for video {video_pk}")
+
+        master_path = get_hls_dir(media_key, 'master.m3u8')
+        write_master_playlist(master_path, variants, audio)
+        logger.info(f"Master playlist with {len(variants)} variants generated at: {master_path}")
+
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFprobe error while generating the master playlist of video {video_pk}: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error while generating the master playlist of video {video_pk}: {e}")
+        raise
+
 
 def delete_file(path):
     """
@@ -118,100 +1336,481 @@ def delete_file(path):
     else:
         logger.warning(f"File not found for deletion: {path}")
 
-def generate_thumbnail(video_pk):
+def get_thumbnail_sizes(filename_base, source_width=None):
+    """
+    Describes the responsive sizes of a video's thumbnail.
+
+    Args:
+        filename_base (str): The filename of the source without extension.
+        source_width (int, optional): The width of the source; thumbnails
+                                      are never wider than the source.
+
+    Returns:
+        list: One dict per width, ascending, with the 'width' and the
+              relative paths of the 'jpeg' and 'webp' image.
+    """
+    widths = settings.VIDEO_THUMBNAIL_WIDTHS
+    if source_width:
+        widths = {min(width, source_width) for width in widths}
+    return [
+        {
+            'width': width,
+            'jpeg': os.path.join('thumbnails', f'{filename_base}_thumbnail_{width}.jpg'),
+            'webp': os.path.join('thumbnails', f'{filename_base}_thumbnail_{width}.webp'),
+        }
+        for width in sorted(widths)
+    ]
+
+
+def build_thumbnail_command(source_path, sizes):
+    """
+    Builds the FFmpeg command that selects the thumbnail frame and writes
+    all of its JPEG sizes in one pass.
+
+    Only keyframes are decoded. They are scaled to the largest thumbnail
+    width, and the `thumbnail` filter picks the most representative of the
+    first VIDEO_THUMBNAIL_CANDIDATES: the frame whose colour histogram is
+    closest to their average, which skips black frames, fades and flashes.
+    The chosen frame is scaled to every width and encoded as JPEG; the WebP
+    images are converted from them separately (see `build_webp_command`).
+    The decoder and filter graph are limited to the worker's thread budget.
+
+    Args:
+        source_path (str): The full path to the source video.
+        sizes (list): The sizes (see `get_thumbnail_sizes`).
+
+    Returns:
+        list: The FFmpeg command as a list of arguments.
+    """
+    filters = [
+        f"[0:v]scale='min({sizes[-1]['width']},iw)':-2,thumbnail={settings.VIDEO_THUMBNAIL_CANDIDATES},"
+        f"split={len(sizes)}{''.join(f'[t{index}]' for index in range(len(sizes)))}"
+    ]
+    outputs = []
+    for index, size in enumerate(sizes):
+        filters.append(f"[t{index}]scale={size['width']}:-2[j{index}]")
+        outputs += [
+            '-map', f'[j{index}]', '-frames:v', '1', '-q:v', '3',
+            os.path.join(settings.MEDIA_ROOT, size['jpeg']),
+        ]
+    thread_args = get_thread_args()
+    return [
+        'ffmpeg', '-y',
+        '-skip_frame', 'nokey',
+        *thread_args,
+        '-i', source_path,
+        *(['-filter_complex_threads', thread_args[1]] if thread_args else []),
+        '-filter_complex', ';'.join(filters),
+        *outputs
+    ]
+
+
+def build_webp_command(sizes):
+    """
+    Builds the FFmpeg command that converts the JPEG thumbnails to WebP.
+
+    The WebP images are optional: FFmpeg builds without libwebp cannot
+    write them, and that must not cost the JPEGs, so they are encoded by a
+    command of their own from the small JPEGs instead of from the source.
+
+    Args:
+        sizes (list): The sizes (see `get_thumbnail_sizes`).
+
+    Returns:
+        list: The FFmpeg command as a list of arguments.
+    """
+    ffmpeg_cmd = ['ffmpeg', '-y', '-v', 'error']
+    for size in sizes:
+        ffmpeg_cmd += ['-i', os.path.join(settings.MEDIA_ROOT, size['jpeg'])]
+    for index, size in enumerate(sizes):
+        ffmpeg_cmd += [
+            '-map', f'{index}:v', '-frames:v', '1', '-c:v', 'libwebp', '-quality', '80',
+            os.path.join(settings.MEDIA_ROOT, size['webp']),
+        ]
+    return ffmpeg_cmd
+
+
+@job
+def generate_thumbnail(video_pk, source_path, source_width=None, media_key=None):
     """
     Generates a thumbnail from a video and updates the Video model.
 
-    This task uses FFmpeg to capture a single frame from the video, saves it
-    as a JPG file, and updates the `thumbnail_url` field of the Video model
-    instance.
+    This task uses FFmpeg to select a representative frame in one pass over
+    the keyframes of the video (see `build_thumbnail_command`) and saves it
+    as JPEG in every width of VIDEO_THUMBNAIL_WIDTHS, then converts the
+    JPEGs to WebP (see `build_webp_command`). If the WebP conversion fails,
+    e.g. because FFmpeg lacks libwebp, the thumbnail is served as JPEG only
+    and the sizes have no 'webp' image. The sizes are stored in
+    `thumbnail_sizes`, and `thumbnail_url` points to the largest JPEG. An
+    existing, complete thumbnail is not generated again.
 
     Args:
         video_pk (int): The primary key of the Video instance.
+        source_path (str): The full path to the source video.
+        source_width (int, optional): The probed width of the source.
+        media_key (str, optional): The media key of the video, which names
+                                   its marker directory. Defaults to the pk.
     """
+    media_key = media_key or video_pk
     try:
-        video_instance = Video.objects.get(pk=video_pk)
-        input_path = video_instance.video_file.path
-
-        filename_base = get_filename_without_extension(input_path)
+        filename_base = get_filename_without_extension(source_path)
 
         thumbnails_dir = os.path.join(settings.MEDIA_ROOT, 'thumbnails')
         os.makedirs(thumbnails_dir, exist_ok=True)
 
-        output_filename = f"{filename_base}_thumbnail.jpg"
-        output_path = os.path.join(thumbnails_dir, output_filename)
+        sizes = get_thumbnail_sizes(filename_base, source_width)
+        relative_path = sizes[-1]['jpeg']
+        output_path = os.path.join(settings.MEDIA_ROOT, relative_path)
 
-        relative_path = os.path.join('thumbnails', output_filename)
+        if is_complete(media_key, 'thumbnail', verify=True):
+            logger.info(f"Thumbnail of video {video_pk} already exists: {output_path}")
+        else:
+            subprocess.run(build_thumbnail_command(source_path, sizes), check=True)
+            try:
+                subprocess.run(build_webp_command(sizes), check=True, capture_output=True)
+            except (subprocess.CalledProcessError, OSError) as e:
+                logger.warning(f"WebP thumbnails of video {video_pk} could not be encoded, serving JPEG only: {e}")
+            write_marker(media_key, 'thumbnail', [
+                os.path.join(settings.MEDIA_ROOT, size[image_format])
+                for size in sizes for image_format in ('jpeg', 'webp')
+                if os.path.exists(os.path.join(settings.MEDIA_ROOT, size[image_format]))
+            ])
+            logger.info(f"Thumbnail successfully generated in {len(sizes)} sizes: {output_path}")
 
-        ffmpeg_cmd = [
-            'ffmpeg',
-            '-ss', '00:00:01',
-            '-i', input_path,
-            '-vframes', '1',
-            '-q:v', '2',
-            output_path
+        sizes = [
+            {**size, 'webp': size['webp'] if os.path.exists(os.path.join(settings.MEDIA_ROOT, size['webp'])) else None}
+            for size in sizes
         ]
 
-        subprocess.run(ffmpeg_cmd, check=True)
-        logger.info(f"Thumbnail successfully generated: {output_path}")
-
-        video_instance.thumbnail_url = relative_path
-        video_instance.save()
+        Video.objects.sharing_content_with(video_pk, media_key).update(thumbnail_url=relative_path,
+                                                                        thumbnail_sizes=sizes)
         logger.info(f"Video instance {video_pk} updated with thumbnail URL '{relative_path}'.")
 
-    except Video.DoesNotExist:
-        logger.error(f"Video with ID {video_pk} not found for thumbnail generation.")
     except subprocess.CalledProcessError as e:
         logger.error(f"FFmpeg error while generating thumbnail for video {video_pk}: {e}")
+        raise
     except Exception as e:
         logger.error(f"Unexpected error during thumbnail generation for video {video_pk}: {e}")
+        raise
+
+
+@job
+def generate_trickplay(video_pk, source_path, metadata, media_key=None):
+    """
+    Renders the scrub bar previews of a video as sprite sheets with a
+    WebVTT index.
+
+    One FFmpeg pass over the keyframes of the source renders all sprite
+    sheets (see `trickplay.build_trickplay_command`) into
+    `hls/<media_key>/trickplay/`, next to the HLS streams, together with
+    the index that players use to show the thumbnail of a position. A
+    complete set is not rendered again.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        source_path (str): The full path to the source video.
+        metadata (dict): The probed metadata (see `parse_probe_output`).
+        media_key (str, optional): The media key of the video, which names
+                                   its HLS and marker directories.
+                                   Defaults to the pk.
+    """
+    media_key = media_key or video_pk
+    if is_complete(media_key, 'trickplay', verify=True):
+        logger.info(f"Trickplay sprites of video {video_pk} already exist.")
+        return
+
+    try:
+        output_dir = get_hls_dir(media_key, 'trickplay')
+        os.makedirs(output_dir, exist_ok=True)
+        thumbnail_size = get_thumbnail_size(metadata['width'], metadata['height'])
+
+        subprocess.run(build_trickplay_command(source_path, output_dir, thumbnail_size), check=True)
+        sprite_names = sorted(name for name in os.listdir(output_dir) if name.endswith('.jpg'))
+        index_path = os.path.join(output_dir, TRICKPLAY_INDEX_NAME)
+        cue_count = write_trickplay_index(index_path, metadata['duration'] or 0, thumbnail_size, len(sprite_names))
+
+        write_marker(media_key, 'trickplay', [
+            index_path, *(os.path.join(output_dir, name) for name in sprite_names)
+        ])
+        logger.info(f"Trickplay of video {video_pk}: {cue_count} thumbnails in {len(sprite_names)} sprite sheets.")
+
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg error while rendering the trickplay sprites of video {video_pk}: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error while rendering the trickplay sprites of video {video_pk}: {e}")
+        raise
 
 
 @job
-def generate_hls_playlist(video_pk, target_resolution):
+def generate_preview(video_pk, source_path, rendition_path, duration=None, media_key=None):
     """
-    Converts a video to HLS (M3U8 + TS segments) for a specified resolution.
+    Cuts the hover-preview clip of a video and updates the Video model.
 
-    This task uses FFmpeg to create HLS segments and a playlist file, storing
-    them in a directory structure based on the video's ID and resolution.
+    The clip is cut from the lowest MP4 rendition instead of the source
+    (see `preview.build_preview_command`), so only a few seconds of an
+    already small video are decoded and encoding it costs next to nothing.
+    An existing, complete clip is not cut again.
+
+    Args:
+        video_pk (int): The primary key of the Video instance.
+        source_path (str): The full path to the source video, which names
+                           the clip.
+        rendition_path (str): The full path to the lowest MP4 rendition.
+        duration (float, optional): The probed duration of the source.
+        media_key (str, optional): The media key of the video, which names
+                                   its marker directory. Defaults to the pk.
+
+    Raises:
+        FileNotFoundError: If the rendition does not exist, e.g. because
+                           its encode failed for good.
+    """
+    media_key = media_key or video_pk
+    try:
+        preview_name = get_preview_name(get_filename_without_extension(source_path))
+        output_path = os.path.join(settings.MEDIA_ROOT, preview_name)
+
+        if is_complete(media_key, 'preview', verify=True):
+            logger.info(f"Preview clip of video {video_pk} already exists: {output_path}")
+        else:
+            if not os.path.exists(rendition_path):
+                raise FileNotFoundError(f"rendition {rendition_path} does not exist")
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            offset, length = get_preview_window(duration)
+            subprocess.run(build_preview_command(rendition_path, offset, length, output_path),
+                           check=True, capture_output=True)
+            write_marker(media_key, 'preview', [output_path])
+            logger.info(f"Preview clip of {length:.1f}s at {offset:.1f}s successfully generated: {output_path}")
+
+        Video.objects.sharing_content_with(video_pk, media_key).update(preview_clip=preview_name)
+
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg error while cutting the preview clip of video {video_pk}: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error while cutting the preview clip of video {video_pk}: {e}")
+        raise
+
+
+def get_published_segments(output_dir, playlist_path):
+    """
+    Returns the chunk segments a growing stream has already published.
+
+    Players may be following the EVENT playlist of the stream (see
+    `publish_live_streams`). Segments may only be appended to it, so a
+    stream that has to be packaged from the rendition continues behind
+    these segments instead of replacing them.
+
+    Args:
+        output_dir (str): The directory of the HLS stream.
+        playlist_path (str): The full path to the stream's playlist.
+
+    Returns:
+        list: (duration, filename) tuples of the chunk segments the
+              playlist starts with; empty if it is ended or missing.
+    """
+    if is_playlist_ended(playlist_path):
+        return []
+    segments = []
+    for segment in read_playlist_segments(playlist_path):
+        if not segment[1].startswith('chunk_') or not os.path.exists(os.path.join(output_dir, segment[1])):
+            break
+        segments.append(segment)
+    return segments
+
+
+def get_resumable_segments(output_dir, playlist_path, partial_playlist_path, segment_base, published=None):
+    """
+    Returns the HLS segments an interrupted packaging run completed.
+
+    The playlist holds the segments of all earlier runs, the partial
+    playlist those of the run that was interrupted. Segments are written to
+    a temporary file and renamed when they are complete, so every listed
+    segment that exists is complete. Only the contiguous prefix is used,
+    and only segments of this packaging run.
+
+    Args:
+        output_dir (str): The directory of the HLS stream.
+        playlist_path (str): The full path to the stream's playlist.
+        partial_playlist_path (str): The playlist FFmpeg writes while running.
+        segment_base (str): The filename prefix of the segments of the run.
+        published (list, optional): The published chunk segments the
+                                    playlist starts with (see
+                                    `get_published_segments`); they are
+                                    skipped.
+
+    Returns:
+        list: (duration, filename) tuples of the complete segments.
+    """
+    segments = []
+    playlist_segments = read_playlist_segments(playlist_path)[len(published or []):]
+    for segment in playlist_segments + read_playlist_segments(partial_playlist_path):
+        if segment in segments:
+            continue
+        if not segment[1].startswith(segment_base) or not os.path.exists(os.path.join(output_dir, segment[1])):
+            break
+        segments.append(segment)
+    return segments
+
+
+@job
+def generate_hls_playlist(video_pk, target_resolution, source_path, rendition_path, duration=None, media_key=None,
+                          rung=None, has_audio=False):
+    """
+    Packages a video as HLS (M3U8 + MPEG-TS or fMP4 segments, see
+    `get_hls_segment_args`) for a specified resolution.
+
+    The stream is cut into parts of one keyframe interval, which are joined
+    into the segments of the final playlist (see `publish_hls_stream`): a
+    few short segments at the start for a fast first frame, then segments
+    of VIDEO_SEGMENT_DURATION.
+
+    If the MP4 rendition of the requested resolution exists, it is segmented
+    with stream copy, which only remuxes the encoded H.264/AAC streams. Only
+    when the MP4 is missing is the source encoded again, with the same
+    ladder options. Because every rendition has keyframes at the same
+    timestamps, segments start at the same time in all renditions. If the HLS audio rendition exists
+    (see `encode_audio`), the video streams are packaged without audio and
+    players take the audio from the shared audio group. The progress is
+    published as stage 'hls_<res>p'.
+
+    Packaging is resumable: a stream with a completion marker is skipped,
+    and after an interrupted run FFmpeg continues behind the last complete
+    part instead of starting over. The final VOD playlist is written from
+    the parts of all runs.
+
+    A chunked video whose chunks were all packaged and published while
+    they were transcoded (see `publish_live_streams`) is not packaged
+    again: its EVENT playlist is turned into a VOD playlist with
+    `#EXT-X-ENDLIST`, so players that are already watching keep their
+    segments. If a chunk is missing, or the source has audio but the audio
+    rendition failed (the chunks are packaged without audio), the rendition
+    is packaged behind the chunks that were published, so the EVENT
+    playlist is only appended to; a change of the audio track is marked as
+    a discontinuity.
 
     Args:
         video_pk (int): The primary key of the Video instance.
         target_resolution (int): The target resolution for the HLS stream.
+        source_path (str): The full path to the source video.
+        rendition_path (str): The full path to the MP4 rendition.
+        duration (float, optional): The probed duration of the source.
+        media_key (str, optional): The media key of the video, which names
+                                   its HLS and marker directories.
+                                   Defaults to the pk.
+        rung (dict, optional): The per-title rung used if the source has to
+                               be encoded.
+        has_audio (bool, optional): Whether the source has an audio stream.
     """
+    media_key = media_key or video_pk
+    stage = f'hls_{target_resolution}p'
+    if is_complete(media_key, stage, verify=True):
+        logger.info(f"HLS stream {target_resolution}p of video {video_pk} is already complete.")
+        return
+
     try:
-        video_instance = Video.objects.get(pk=video_pk)
-        input_path = video_instance.video_file.path
-        video_id = video_instance.pk
+        has_rendition = os.path.exists(rendition_path)
+        input_path = rendition_path if has_rendition else source_path
+        has_audio_group = is_complete(media_key, 'hls_audio')
 
-        filename_base = get_filename_without_extension(input_path)
+        filename_base = get_filename_without_extension(source_path)
 
-        output_dir_absolute = os.path.join(settings.MEDIA_ROOT, 'hls', str(video_id), f'{target_resolution}p')
+        output_dir_absolute = get_hls_dir(media_key, f'{target_resolution}p')
         os.makedirs(output_dir_absolute, exist_ok=True)
 
         output_m3u8_path = os.path.join(output_dir_absolute, "index.m3u8")
-        segment_pattern = os.path.join(output_dir_absolute, f"{filename_base}_{target_resolution}p_%03d.ts")
+        partial_m3u8_path = os.path.join(output_dir_absolute, "index.partial.m3u8")
 
-        ffmpeg_cmd = [
-            'ffmpeg', '-i', input_path,
-            '-vf', f'scale=-2:{target_resolution}',
-            '-c:v', 'libx264', '-crf', '23', '-preset', 'medium',
-            '-c:a', 'aac', '-strict', '-2',
-            '-f', 'hls',
-            '-hls_time', '10',
-            '-hls_playlist_type', 'vod',
-            '-hls_segment_filename', segment_pattern,
-            output_m3u8_path
-        ]
+        live_segments = get_live_segments(media_key, target_resolution)
+        if live_segments and (has_audio_group or not has_audio):
+            write_media_playlist(output_m3u8_path, live_segments, target_duration=get_live_target_duration())
+            write_marker(media_key, stage, get_hls_outputs(output_dir_absolute, output_m3u8_path, live_segments))
+            logger.info(f"Published HLS stream {target_resolution}p of video {video_pk} ended at: {output_m3u8_path}")
+            return
 
-        subprocess.run(ffmpeg_cmd, check=True)
+        segment_base = f"{filename_base}_{target_resolution}p"
+        segment_args = get_hls_segment_args(output_dir_absolute, f"{segment_base}_part")
+        init_segment = INIT_SEGMENT_NAME if settings.VIDEO_SEGMENT_TYPE == 'fmp4' else None
+
+        if is_playlist_ended(output_m3u8_path):
+            segments = read_playlist_segments(output_m3u8_path)
+        else:
+            published = get_published_segments(output_dir_absolute, output_m3u8_path)
+            discontinuity = has_audio and not has_audio_group
+            parts = get_resumable_segments(output_dir_absolute, output_m3u8_path, partial_m3u8_path,
+                                           f"{segment_base}_part", published)
+            offset = sum(part_duration for part_duration, _ in published + parts)
+            if parts:
+                # Persist the progress so far; a later crash resumes from here.
+                write_media_playlist(output_m3u8_path, published + parts, ended=False, init_segment=init_segment,
+                                     target_duration=get_live_target_duration() if published else None,
+                                     discontinuity=len(published) if published and discontinuity else None)
+                logger.info(f"Resuming HLS packaging of video {video_pk} at {target_resolution}p "
+                            f"with part {len(parts)} ({offset:.1f}s).")
+
+            input_args = []
+            if has_rendition:
+                codec_args = ['-map', '0:v:0', '-c', 'copy'] if has_audio_group else ['-c', 'copy']
+            else:
+                logger.warning(f"No {target_resolution}p rendition for video {video_pk}, encoding HLS from the source.")
+                input_args = get_thread_args()
+                codec_args = [
+                    '-vf', f'scale=-2:{target_resolution}',
+                    *get_video_encoder_args(target_resolution, rung),
+                    *(['-an'] if has_audio_group else ['-c:a', 'aac', '-b:a', '128k', '-strict', '-2']),
+                ]
+            if offset:
+                input_args = ['-ss', f'{offset:.6f}', *input_args]
+                codec_args = [*codec_args, '-output_ts_offset', f'{offset:.6f}']
+
+            ffmpeg_cmd = [
+                'ffmpeg', *input_args, '-i', input_path,
+                *codec_args,
+                '-f', 'hls',
+                '-hls_time', str(settings.VIDEO_KEYFRAME_INTERVAL),
+                '-hls_list_size', '0',
+                '-hls_playlist_type', 'event',
+                '-hls_flags', 'temp_file',
+                '-start_number', str(len(parts)),
+                *segment_args,
+                partial_m3u8_path
+            ]
+
+            run_ffmpeg(ffmpeg_cmd, video_pk, stage, duration - offset if duration else None)
+            parts += read_playlist_segments(partial_m3u8_path)
+            segments = publish_hls_stream(output_dir_absolute, output_m3u8_path, parts, segment_base, init_segment,
+                                          published=published, discontinuity=discontinuity)
+            os.remove(partial_m3u8_path)
+
+        write_marker(media_key, stage, get_hls_outputs(output_dir_absolute, output_m3u8_path, segments))
         logger.info(f"HLS playlist successfully generated at: {output_m3u8_path}")
 
-    except Video.DoesNotExist:
-        logger.error(f"Video with ID {video_pk} not found for HLS generation.")
     except subprocess.CalledProcessError as e:
         logger.error(f"FFmpeg error during HLS generation for video {video_pk} at {target_resolution}p: {e}")
+        raise
     except FileNotFoundError:
         logger.error("Error: ffmpeg command not found. Make sure ffmpeg is installed and in PATH.")
+        raise
     except Exception as e:
         logger.error(f"Unexpected error during HLS generation for video {video_pk}: {e}")
+        raise
+
+
+@job
+def complete_upload(session_pk):
+    """
+    Creates the video of a fully received resumable upload.
+
+    Hashing and moving the file (see `uploads.complete_upload_session`)
+    take too long for the web request that completes the session, so they
+    run in this job. The client polls the session until its `video` is set.
+
+    Args:
+        session_pk (UUID): The id of the upload session.
+    """
+    try:
+        video = complete_upload_session(session_pk)
+        logger.info(f"Upload session {session_pk} completed as video {video.pk}.")
+    except Exception as e:
+        logger.error(f"Unexpected error while completing upload session {session_pk}: {e}")
+        raise
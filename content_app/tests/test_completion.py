@@ -0,0 +1,156 @@
+import os
+import shutil
+from unittest.mock import patch
+from django.test import TestCase
+from django.conf import settings
+from content_app.completion import clear_markers, is_complete, write_marker
+from content_app.hls import is_playlist_ended, read_playlist_segments, write_media_playlist
+from content_app.tasks import generate_hls_playlist
+
+
+class CompletionMarkerTest(TestCase):
+    """
+    Tests for the completion markers that make pipeline stages idempotent.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary media root with one output file.
+        """
+        self.temp_media_root = os.path.join(settings.BASE_DIR, 'test_media')
+        settings.MEDIA_ROOT = self.temp_media_root
+        os.makedirs(self.temp_media_root, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.temp_media_root, ignore_errors=True)
+        self.output_path = os.path.join(self.temp_media_root, 'output.mp4')
+        with open(self.output_path, 'wb') as f:
+            f.write(b'encoded video')
+
+    def test_marker_reports_intact_outputs(self):
+        """
+        Tests that a written marker is complete while its outputs are unchanged.
+        """
+        self.assertFalse(is_complete(1, 'rendition_480p'))
+        write_marker(1, 'rendition_480p', [self.output_path])
+        self.assertTrue(is_complete(1, 'rendition_480p'))
+
+    def test_changed_output_invalidates_marker(self):
+        """
+        Tests that a truncated output is detected by size and a rewritten one by the checksum.
+        """
+        write_marker(1, 'rendition_480p', [self.output_path])
+        mtime_ns = os.stat(self.output_path).st_mtime_ns
+        with open(self.output_path, 'wb') as f:
+            f.write(b'encoded videX')
+        os.utime(self.output_path, ns=(mtime_ns, mtime_ns))
+        self.assertTrue(is_complete(1, 'rendition_480p'))
+        self.assertFalse(is_complete(1, 'rendition_480p', verify=True))
+
+        os.remove(self.output_path)
+        self.assertFalse(is_complete(1, 'rendition_480p'))
+
+    def test_fast_check_compares_size_and_mtime_only(self):
+        """
+        Tests that the default check does not read the outputs but detects a touched file.
+        """
+        write_marker(1, 'rendition_480p', [self.output_path])
+
+        with patch('content_app.completion.get_file_checksum') as mock_checksum:
+            self.assertTrue(is_complete(1, 'rendition_480p'))
+            mock_checksum.assert_not_called()
+
+        mtime_ns = os.stat(self.output_path).st_mtime_ns
+        os.utime(self.output_path, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+        self.assertFalse(is_complete(1, 'rendition_480p'))
+
+    def test_clear_markers(self):
+        """
+        Tests that markers can be removed by pattern.
+        """
+        write_marker(1, 'chunk_0000_480p', [self.output_path])
+        write_marker(1, 'rendition_480p', [self.output_path])
+
+        clear_markers(1, 'chunk_*')
+
+        self.assertFalse(is_complete(1, 'chunk_0000_480p'))
+        self.assertTrue(is_complete(1, 'rendition_480p'))
+
+
+@patch('content_app.tasks.run_ffmpeg')
+class ResumableHlsTest(TestCase):
+    """
+    Tests for resuming interrupted HLS packaging.
+    """
+
+    def setUp(self):
+        """
+        Set up the output of a packaging run that was interrupted after three parts.
+        """
+        self.temp_media_root = os.path.join(settings.BASE_DIR, 'test_media')
+        settings.MEDIA_ROOT = self.temp_media_root
+        self.addCleanup(shutil.rmtree, self.temp_media_root, ignore_errors=True)
+        self.output_dir = os.path.join(self.temp_media_root, 'hls', '1', '480p')
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.rendition_path = os.path.join(self.temp_media_root, 'movie_480p.mp4')
+        with open(self.rendition_path, 'wb') as f:
+            f.write(b'rendition')
+
+        for index in range(3):
+            with open(os.path.join(self.output_dir, f'movie_480p_part_{index:03d}.ts'), 'wb') as f:
+                f.write(b'part')
+        with open(os.path.join(self.output_dir, 'movie_480p_part_003.ts.tmp'), 'wb') as f:
+            f.write(b'half')
+        with open(os.path.join(self.output_dir, 'index.partial.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n#EXT-X-PLAYLIST-TYPE:EVENT\n' + ''.join(
+                f'#EXTINF:2.000000,\nmovie_480p_part_{index:03d}.ts\n' for index in range(3)))
+
+    def finish_run(self, ffmpeg_cmd, *args):
+        """
+        Simulates FFmpeg writing the remaining parts of 2 seconds, the last one shorter.
+        """
+        lines = ['#EXTM3U']
+        for index in range(3, 12):
+            with open(os.path.join(self.output_dir, f'movie_480p_part_{index:03d}.ts'), 'wb') as f:
+                f.write(b'part')
+            lines += [f"#EXTINF:{1.5 if index == 11 else 2.0:.6f},", f'movie_480p_part_{index:03d}.ts']
+        with open(ffmpeg_cmd[-1], 'w') as f:
+            f.write('\n'.join(lines + ['#EXT-X-ENDLIST']) + '\n')
+
+    def test_packaging_resumes_after_last_complete_segment(self, mock_run_ffmpeg):
+        """
+        Tests that only the missing parts are packaged and all parts are joined into segments.
+        """
+        mock_run_ffmpeg.side_effect = self.finish_run
+
+        with self.settings(VIDEO_KEYFRAME_INTERVAL=2, VIDEO_STARTUP_SEGMENTS=[2, 2, 4], VIDEO_SEGMENT_DURATION=10):
+            generate_hls_playlist(1, 480, '/media/videos/movie.mp4', self.rendition_path, 23.5)
+
+        ffmpeg_cmd, _, _, duration = mock_run_ffmpeg.call_args.args
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-ss') + 1], '6.000000')
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-output_ts_offset') + 1], '6.000000')
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-start_number') + 1], '3')
+        self.assertEqual(duration, 17.5)
+
+        playlist_path = os.path.join(self.output_dir, 'index.m3u8')
+        self.assertTrue(is_playlist_ended(playlist_path))
+        self.assertEqual(read_playlist_segments(playlist_path), [
+            (2.0, 'movie_480p_000.ts'), (2.0, 'movie_480p_001.ts'), (4.0, 'movie_480p_002.ts'),
+            (10.0, 'movie_480p_003.ts'), (5.5, 'movie_480p_004.ts'),
+        ])
+        with open(os.path.join(self.output_dir, 'movie_480p_003.ts'), 'rb') as f:
+            self.assertEqual(f.read(), b'part' * 5)
+        self.assertFalse(any(name.endswith('.ts') and '_part_' in name for name in os.listdir(self.output_dir)))
+        self.assertTrue(is_complete(1, 'hls_480p'))
+
+    def test_completed_stream_is_skipped(self, mock_run_ffmpeg):
+        """
+        Tests that a stream with a valid marker is not packaged again.
+        """
+        playlist_path = os.path.join(self.output_dir, 'index.m3u8')
+        with open(os.path.join(self.output_dir, 'movie_480p_000.ts'), 'wb') as f:
+            f.write(b'segment')
+        write_media_playlist(playlist_path, [(10.0, 'movie_480p_000.ts')])
+        write_marker(1, 'hls_480p', [playlist_path, os.path.join(self.output_dir, 'movie_480p_000.ts')])
+
+        generate_hls_playlist(1, 480, '/media/videos/movie.mp4', self.rendition_path, 23.5)
+
+        mock_run_ffmpeg.assert_not_called()
@@ -0,0 +1,124 @@
+from unittest.mock import patch
+from django.test import TestCase
+from content_app.complexity import (
+    build_analysis_command,
+    get_sample_offsets,
+    get_title_ladder,
+    measure_complexity,
+    parse_bitrate
+)
+
+LADDER = {
+    480: {'crf': 23, 'maxrate': '1400k', 'bufsize': '2800k'},
+    720: {'crf': 23, 'maxrate': '2800k', 'bufsize': '5600k'},
+    1080: {'crf': 23, 'maxrate': '5000k', 'bufsize': '10000k'},
+}
+
+
+class ComplexityAnalysisTest(TestCase):
+    """
+    Tests for the trial encode that measures the complexity of a video.
+    """
+
+    def test_samples_are_spread_over_the_video(self):
+        """
+        Tests that long videos are sampled evenly and short ones as a whole.
+        """
+        with self.settings(VIDEO_ANALYSIS_SAMPLES=3, VIDEO_ANALYSIS_SAMPLE_DURATION=4):
+            self.assertEqual(get_sample_offsets(404), [100, 200, 300])
+            self.assertEqual(get_sample_offsets(10), [0])
+
+    def test_analysis_command_seeks_to_every_sample(self):
+        """
+        Tests that only the samples are decoded, scaled and joined into one encode.
+        """
+        with self.settings(FFMPEG_THREADS=2):
+            ffmpeg_cmd = build_analysis_command('/in.mp4', [100, 200], 4, 360, '/tmp/analysis.mp4')
+
+        self.assertEqual(ffmpeg_cmd.count('-i'), 2)
+        self.assertEqual(ffmpeg_cmd.count('-threads'), 3)
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-filter_complex_threads') + 1], '2')
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-ss') + 1], '100.000')
+        filter_graph = ffmpeg_cmd[ffmpeg_cmd.index('-filter_complex') + 1]
+        self.assertIn('[0:v]scale=-2:360', filter_graph)
+        self.assertIn('[s0][s1]concat=n=2:v=1:a=0[out]', filter_graph)
+        self.assertEqual(ffmpeg_cmd[-1], '/tmp/analysis.mp4')
+
+    @patch('content_app.complexity.subprocess.run')
+    def test_complexity_is_bits_per_pixel_of_the_trial_encode(self, mock_run):
+        """
+        Tests that the size of the trial encode is normalised by the encoded pixels.
+        """
+        def encode(ffmpeg_cmd, **kwargs):
+            with open(ffmpeg_cmd[-1], 'wb') as f:
+                f.write(b'\0' * 64000)
+        mock_run.side_effect = encode
+        metadata = {'duration': 404, 'width': 1280, 'height': 720, 'frame_rate': 25.0}
+
+        with self.settings(VIDEO_ANALYSIS_SAMPLES=3, VIDEO_ANALYSIS_SAMPLE_DURATION=4, VIDEO_ANALYSIS_HEIGHT=360):
+            complexity = measure_complexity('/in.mp4', metadata)
+
+        self.assertAlmostEqual(complexity, 64000 * 8 / (3 * 4 * 25 * 640 * 360))
+
+    def test_parse_bitrate(self):
+        """
+        Tests that FFmpeg bitrate suffixes are understood.
+        """
+        self.assertEqual(parse_bitrate('1400k'), 1400000)
+        self.assertEqual(parse_bitrate('5M'), 5000000)
+        self.assertEqual(parse_bitrate(128000), 128000)
+
+
+class TitleLadderTest(TestCase):
+    """
+    Tests for deriving per-title rate settings from the complexity.
+    """
+
+    def get_ladder(self, complexity):
+        """
+        Derives the ladder of a 25 fps 1080p source with fixed settings.
+        """
+        with self.settings(VIDEO_ENCODING_LADDER=LADDER, VIDEO_ANALYSIS_HEIGHT=360, VIDEO_MAXRATE_HEADROOM=1.5,
+                           VIDEO_MIN_RUNG_STEP='250k', VIDEO_COMPLEXITY_CRF_OFFSETS=[(0.05, 0), (0.1, 1), (None, 2)]):
+            return get_title_ladder([480, 720, 1080], complexity, 25)
+
+    def test_unknown_complexity_keeps_the_static_ladder(self):
+        """
+        Tests that a video without analysis is encoded with the configured ladder.
+        """
+        self.assertEqual(self.get_ladder(None), LADDER)
+
+    def test_simple_video_gets_lower_caps(self):
+        """
+        Tests that a calm video keeps its CRF, all rungs and gets caps below the ladder.
+        """
+        ladder = self.get_ladder(0.04)
+
+        self.assertEqual(sorted(ladder), [480, 720, 1080])
+        self.assertEqual({rung['crf'] for rung in ladder.values()}, {23})
+        for resolution, rung in ladder.items():
+            self.assertLess(parse_bitrate(rung['maxrate']), parse_bitrate(LADDER[resolution]['maxrate']))
+            self.assertGreaterEqual(parse_bitrate(rung['maxrate']), parse_bitrate(LADDER[resolution]['maxrate']) / 4)
+            self.assertAlmostEqual(parse_bitrate(rung['bufsize']), 2 * parse_bitrate(rung['maxrate']), delta=1000)
+
+    def test_complex_video_gets_higher_crf(self):
+        """
+        Tests that motion and detail raise the CRF, capped at the ladder.
+        """
+        ladder = self.get_ladder(0.2)
+
+        self.assertEqual(ladder[480], {**LADDER[480], 'crf': 25})
+
+    def test_redundant_rungs_are_dropped_for_flat_content(self):
+        """
+        Tests that rungs adding too few bits over the rung below are dropped, but never the lowest.
+        """
+        self.assertEqual(sorted(self.get_ladder(0.005)), [480])
+        self.assertEqual(sorted(self.get_ladder(0.02)), [480])
+
+    def test_complex_video_keeps_the_top_rung(self):
+        """
+        Tests that complex videos keep every rung, however far their needs exceed the caps.
+        """
+        self.assertEqual(sorted(self.get_ladder(0.425)), [480, 720, 1080])
+        self.assertEqual(sorted(self.get_ladder(5)), [480, 720, 1080])
@@ -1,10 +1,20 @@
+import json
 import os
 import shutil
-from unittest.mock import patch
+import subprocess
+from unittest.mock import patch, MagicMock
 from django.test import TestCase
 from django.conf import settings
+from content_app.completion import is_complete, write_marker
+from content_app.hls import get_live_target_duration, is_playlist_ended, read_playlist_segments
 from content_app.models import Video
-from content_app.tasks import convert_video_and_update_model
+from content_app.tasks import (
+    transcode_video,
+    generate_hls_playlist,
+    transcode_chunk,
+    concat_video_chunks,
+    encode_audio
+)
 
 @patch('content_app.tasks.subprocess.run')
 class VideoConversionTasksTest(TestCase):
@@ -31,6 +41,37 @@ class VideoConversionTasksTest(TestCase):
             title="Test Video",
             video_file=os.path.join('videos', 'test_video.mp4')
         )
+        for directory in ('markers', 'hls'):
+            self.addCleanup(shutil.rmtree, os.path.join(self.temp_media_root, directory), ignore_errors=True)
+
+    def create_ffmpeg_outputs(self, ffmpeg_cmd, *args, **kwargs):
+        """
+        Writes dummy files for the outputs of a mocked FFmpeg command.
+
+        Playlists get a single segment, like FFmpeg would write them. The
+        final progress is returned like `run_ffmpeg` does.
+        """
+        input_paths = {ffmpeg_cmd[index + 1] for index, arg in enumerate(ffmpeg_cmd) if arg == '-i'}
+        for arg in ffmpeg_cmd:
+            if arg in input_paths:
+                continue
+            if arg.endswith(('.mp4', '.m4a')) and os.path.isabs(arg):
+                with open(arg, 'wb') as f:
+                    f.write(b'rendition')
+            elif arg.endswith('.m3u8'):
+                segment_path = ffmpeg_cmd[ffmpeg_cmd.index('-hls_segment_filename') + 1] % 0
+                segment_name = os.path.basename(segment_path)
+                with open(segment_path, 'wb') as f:
+                    f.write(b'segment')
+                init_tag = ''
+                if '-hls_fmp4_init_filename' in ffmpeg_cmd:
+                    init_name = ffmpeg_cmd[ffmpeg_cmd.index('-hls_fmp4_init_filename') + 1]
+                    with open(os.path.join(os.path.dirname(segment_path), init_name), 'wb') as f:
+                        f.write(b'init')
+                    init_tag = f'#EXT-X-MAP:URI="{init_name}"\n'
+                with open(arg, 'w') as f:
+                    f.write(f"#EXTM3U\n{init_tag}#EXTINF:10.000000,\n{segment_name}\n#EXT-X-ENDLIST\n")
+        return {'percent': 100.0, 'fps': None, 'speed': None}
 
     def tearDown(self):
         """
@@ -49,65 +90,345 @@ class VideoConversionTasksTest(TestCase):
             except Exception as e:
                 pass
 
-    def test_convert_480p_command_called_correctly(self, mock_subprocess_run):
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_transcode_video_decodes_once_for_all_renditions(self, mock_run_ffmpeg, mock_subprocess_run):
         """
-        Tests if the 480p conversion calls the correct FFmpeg command and updates the model.
+        Tests that all renditions are produced by a single FFmpeg call and stored on the model.
         """
-        target_resolution = 480
-        expected_output_filename = "test_video_480p.mp4"
-        expected_output_dir = os.path.join(settings.MEDIA_ROOT, 'videos', f'{target_resolution}p')
-        expected_output_path = os.path.join(expected_output_dir, expected_output_filename)
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+        transcode_video(self.video.pk, self.video.video_file.path, [480, 720, 1080], 95.0)
+        mock_run_ffmpeg.assert_called_once()
 
-        expected_command = [
-            'ffmpeg', '-i', self.video.video_file.path,
-            '-vf', f'scale=-2:{target_resolution}',
-            '-c:v', 'libx264', '-crf', '23', '-preset', 'medium',
-            '-c:a', 'aac', '-b:a', '128k',
-            '-strict', '-2',
-            expected_output_path
-        ]
+        ffmpeg_cmd, video_pk, stage, duration = mock_run_ffmpeg.call_args.args
+        self.assertEqual((video_pk, stage, duration), (self.video.pk, 'transcode', 95.0))
+        self.assertEqual(ffmpeg_cmd.count('-i'), 1)
+        self.assertEqual(ffmpeg_cmd.count('libx264'), 3)
+        filter_graph = ffmpeg_cmd[ffmpeg_cmd.index('-filter_complex') + 1]
+        self.assertTrue(filter_graph.startswith('[0:v]split=3'))
 
-        convert_video_and_update_model(self.video.pk, target_resolution)
-        mock_subprocess_run.assert_called_once()
-        mock_subprocess_run.assert_called_once_with(expected_command, check=True)
+        for resolution in [480, 720, 1080]:
+            self.assertIn(os.path.join(settings.MEDIA_ROOT, 'videos', f'{resolution}p', f'test_video_{resolution}p.mp4'), ffmpeg_cmd)
 
         self.video.refresh_from_db()
-        expected_relative_path = os.path.join('videos', f'{target_resolution}p', expected_output_filename)
-        self.assertEqual(self.video.video_480p.name, expected_relative_path)
+        self.assertEqual(self.video.video_480p.name, os.path.join('videos', '480p', 'test_video_480p.mp4'))
+        self.assertEqual(self.video.video_720p.name, os.path.join('videos', '720p', 'test_video_720p.mp4'))
+        self.assertEqual(self.video.video_1080p.name, os.path.join('videos', '1080p', 'test_video_1080p.mp4'))
 
-    def test_convert_720p_command_called_correctly(self, mock_subprocess_run):
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_transcode_video_uses_encoding_ladder(self, mock_run_ffmpeg, mock_subprocess_run):
         """
-        Tests if the 720p conversion calls the correct FFmpeg command and updates the model.
+        Tests that every rendition is capped by its rung and has keyframes on the same grid.
         """
-        target_resolution = 720
-        expected_output_filename = "test_video_720p.mp4"
-        expected_output_dir = os.path.join(settings.MEDIA_ROOT, 'videos', f'{target_resolution}p')
-        expected_output_path = os.path.join(expected_output_dir, expected_output_filename)
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+        ladder = {480: {'crf': 24, 'maxrate': '1000k', 'bufsize': '2000k'},
+                  720: {'crf': 22, 'maxrate': '3000k', 'bufsize': '6000k'}}
+        with self.settings(VIDEO_ENCODING_LADDER=ladder, VIDEO_KEYFRAME_INTERVAL=2):
+            transcode_video(self.video.pk, self.video.video_file.path, [480, 720], 95.0)
 
-        expected_command = [
-            'ffmpeg', '-i', self.video.video_file.path,
-            '-vf', f'scale=-2:{target_resolution}',
-            '-c:v', 'libx264', '-crf', '23', '-preset', 'medium',
-            '-c:a', 'aac', '-b:a', '128k',
-            '-strict', '-2',
-            expected_output_path
-        ]
+        ffmpeg_cmd = mock_run_ffmpeg.call_args.args[0]
+        maxrates = [ffmpeg_cmd[index + 1] for index, arg in enumerate(ffmpeg_cmd) if arg == '-maxrate']
+        crfs = [ffmpeg_cmd[index + 1] for index, arg in enumerate(ffmpeg_cmd) if arg == '-crf']
+        self.assertEqual(maxrates, ['1000k', '3000k'])
+        self.assertEqual(crfs, ['24', '22'])
+        self.assertEqual(ffmpeg_cmd.count('expr:gte(t,n_forced*2)'), 2)
+        self.assertEqual(ffmpeg_cmd.count('-sc_threshold'), 2)
 
-        convert_video_and_update_model(self.video.pk, target_resolution)
-        mock_subprocess_run.assert_called_once_with(expected_command, check=True)
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_encode_audio_once_and_package_it(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that the audio is encoded once, packaged as HLS audio rendition and not redone.
+        """
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+        mock_subprocess_run.side_effect = self.create_ffmpeg_outputs
+
+        with self.settings(FFMPEG_THREADS=2):
+            encode_audio(self.video.pk, self.video.video_file.path, 95.0)
 
+        audio_cmd = mock_run_ffmpeg.call_args.args[0]
+        self.assertIn('-vn', audio_cmd)
+        self.assertEqual(audio_cmd[audio_cmd.index('-threads') + 1], '2')
+        self.assertLess(audio_cmd.index('-threads'), audio_cmd.index('-i'))
+        self.assertEqual(audio_cmd.count('-threads'), 2)
+        self.assertEqual(audio_cmd[audio_cmd.index('-c:a') + 1], 'aac')
+        hls_cmd = mock_subprocess_run.call_args.args[0]
+        self.assertEqual(hls_cmd[hls_cmd.index('-i') + 1],
+                         os.path.join(settings.MEDIA_ROOT, 'videos', 'audio', 'test_video_audio.m4a'))
+        self.assertEqual(hls_cmd[hls_cmd.index('-c') + 1], 'copy')
+        self.assertTrue(is_complete(self.video.pk, 'hls_audio'))
         self.video.refresh_from_db()
-        expected_relative_path = os.path.join('videos', f'{target_resolution}p', expected_output_filename)
-        self.assertEqual(self.video.video_720p.name, expected_relative_path)
+        self.assertEqual(self.video.audio_file.name, os.path.join('videos', 'audio', 'test_video_audio.m4a'))
 
-    @patch('content_app.tasks.os.makedirs')
-    def test_convert_creates_directories_if_not_exist(self, mock_makedirs, mock_subprocess_run):
+        mock_run_ffmpeg.reset_mock()
+        mock_subprocess_run.reset_mock()
+        encode_audio(self.video.pk, self.video.video_file.path, 95.0)
+        mock_run_ffmpeg.assert_not_called()
+        mock_subprocess_run.assert_not_called()
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_transcode_video_copies_shared_audio(self, mock_run_ffmpeg, mock_subprocess_run):
         """
-        Tests if the function calls os.makedirs to create the necessary directories.
+        Tests that the renditions stream copy the shared AAC track instead of encoding audio each.
         """
-        target_resolution = 480
-        convert_video_and_update_model(self.video.pk, target_resolution)
-        
-        expected_output_dir = os.path.join(settings.MEDIA_ROOT, 'videos', '480p')
-        mock_makedirs.assert_called_once_with(expected_output_dir, exist_ok=True)
+        audio_path = os.path.join(settings.MEDIA_ROOT, 'videos', 'test_video_audio.m4a')
+        with open(audio_path, 'wb') as f:
+            f.write(b'aac')
+        write_marker(self.video.pk, 'audio', [audio_path])
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+
+        transcode_video(self.video.pk, self.video.video_file.path, [480, 720], 95.0, None, audio_path)
+
+        ffmpeg_cmd = mock_run_ffmpeg.call_args.args[0]
+        self.assertEqual(ffmpeg_cmd.count('-i'), 2)
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index(audio_path) - 1], '-i')
+        self.assertEqual(ffmpeg_cmd.count('1:a'), 2)
+        self.assertNotIn('aac', ffmpeg_cmd)
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_transcode_video_skips_completed_renditions(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that a retried transcode only encodes the renditions that are not complete.
+        """
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+        transcode_video(self.video.pk, self.video.video_file.path, [480], 95.0)
+        mock_run_ffmpeg.reset_mock()
+
+        transcode_video(self.video.pk, self.video.video_file.path, [480, 720], 95.0)
+
+        ffmpeg_cmd = mock_run_ffmpeg.call_args.args[0]
+        self.assertEqual(ffmpeg_cmd.count('libx264'), 1)
+        self.assertIn(os.path.join(settings.MEDIA_ROOT, 'videos', '720p', 'test_video_720p.mp4'), ffmpeg_cmd)
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_transcode_video_fails_for_retry(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that FFmpeg errors fail the job so RQ can retry it, without leaving a marker.
+        """
+        mock_run_ffmpeg.side_effect = subprocess.CalledProcessError(1, 'ffmpeg')
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            transcode_video(self.video.pk, self.video.video_file.path, [480], 95.0)
+
+        self.assertFalse(is_complete(self.video.pk, 'rendition_480p'))
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_transcode_chunk_skips_missing_chunk(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that a chunk job whose chunk was not produced by the split does nothing.
+        """
+        transcode_chunk(self.video.pk, 7, [480])
+        mock_run_ffmpeg.assert_not_called()
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_chunks_are_published_while_transcoding(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that encoded chunks are published in order as a growing playlist that packaging ends.
+        """
+        chunk_dir = os.path.join(settings.MEDIA_ROOT, 'chunks', str(self.video.pk))
+        source_dir = os.path.join(chunk_dir, 'source')
+        os.makedirs(source_dir)
+        self.addCleanup(shutil.rmtree, os.path.join(settings.MEDIA_ROOT, 'chunks'), ignore_errors=True)
+        for chunk_base in ['chunk_0000', 'chunk_0001']:
+            with open(os.path.join(source_dir, f'{chunk_base}.mkv'), 'wb') as f:
+                f.write(b'source chunk')
+        with open(os.path.join(chunk_dir, 'chunks.csv'), 'w') as f:
+            f.write('chunk_0000.mkv,0.000000,60.000000\nchunk_0001.mkv,60.000000,95.000000\n')
+        write_marker(self.video.pk, 'split', [os.path.join(chunk_dir, 'chunks.csv')])
+
+        def run(cmd, **kwargs):
+            if cmd[0] == 'ffprobe':
+                return MagicMock(stdout=json.dumps({'streams': [
+                    {'codec_type': 'video', 'codec_name': 'h264', 'profile': 'High', 'level': 30,
+                     'width': 854, 'height': 480, 'avg_frame_rate': '25/1'},
+                ]}))
+            return self.create_ffmpeg_outputs(cmd)
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+        mock_subprocess_run.side_effect = run
+        hls_dir = os.path.join(self.temp_media_root, 'hls', str(self.video.pk))
+        playlist_path = os.path.join(hls_dir, '480p', 'index.m3u8')
+
+        transcode_chunk(self.video.pk, 1, [480])
+
+        packaging_cmd = mock_subprocess_run.call_args.args[0]
+        self.assertEqual(packaging_cmd[packaging_cmd.index('-output_ts_offset') + 1], '60.000000')
+        self.assertEqual(read_playlist_segments(playlist_path), [])
+        self.assertFalse(os.path.exists(os.path.join(hls_dir, 'master.m3u8')))
+
+        transcode_chunk(self.video.pk, 0, [480])
+
+        segments = [(10.0, 'chunk_0000_480p_000.ts'), (10.0, 'chunk_0001_480p_000.ts')]
+        self.assertEqual(read_playlist_segments(playlist_path), segments)
+        self.assertFalse(is_playlist_ended(playlist_path))
+        self.assertTrue(os.path.exists(os.path.join(hls_dir, 'master.m3u8')))
+
+        mock_run_ffmpeg.reset_mock()
+        generate_hls_playlist(self.video.pk, 480, self.video.video_file.path, '/missing/rendition.mp4')
+
+        mock_run_ffmpeg.assert_not_called()
+        self.assertEqual(read_playlist_segments(playlist_path), segments)
+        self.assertTrue(is_playlist_ended(playlist_path))
+        self.assertTrue(is_complete(self.video.pk, 'hls_480p'))
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_repackaging_appends_to_the_published_playlist(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that a stream missing a chunk is packaged behind the published segments instead of replacing them.
+        """
+        chunk_dir = os.path.join(settings.MEDIA_ROOT, 'chunks', str(self.video.pk))
+        source_dir = os.path.join(chunk_dir, 'source')
+        os.makedirs(source_dir)
+        self.addCleanup(shutil.rmtree, os.path.join(settings.MEDIA_ROOT, 'chunks'), ignore_errors=True)
+        for chunk_base in ['chunk_0000', 'chunk_0001']:
+            with open(os.path.join(source_dir, f'{chunk_base}.mkv'), 'wb') as f:
+                f.write(b'source chunk')
+        with open(os.path.join(chunk_dir, 'chunks.csv'), 'w') as f:
+            f.write('chunk_0000.mkv,0.000000,10.000000\nchunk_0001.mkv,10.000000,20.000000\n')
+        write_marker(self.video.pk, 'split', [os.path.join(chunk_dir, 'chunks.csv')])
+        rendition_dir = os.path.join(settings.MEDIA_ROOT, 'videos', '480p')
+        os.makedirs(rendition_dir, exist_ok=True)
+        rendition_path = os.path.join(rendition_dir, 'test_video_480p.mp4')
+        with open(rendition_path, 'wb') as f:
+            f.write(b'dummy rendition content')
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+        mock_subprocess_run.side_effect = self.create_ffmpeg_outputs
+        playlist_path = os.path.join(self.temp_media_root, 'hls', str(self.video.pk), '480p', 'index.m3u8')
+
+        transcode_chunk(self.video.pk, 0, [480], has_audio=True)
+        generate_hls_playlist(self.video.pk, 480, self.video.video_file.path, rendition_path, duration=20,
+                              has_audio=True)
+
+        ffmpeg_cmd = mock_run_ffmpeg.call_args.args[0]
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-ss') + 1], '10.000000')
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-output_ts_offset') + 1], '10.000000')
+        self.assertEqual(read_playlist_segments(playlist_path),
+                         [(10.0, 'chunk_0000_480p_000.ts'), (10.0, 'test_video_480p_000.ts')])
+        with open(playlist_path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[lines.index('#EXT-X-DISCONTINUITY') + 2], 'test_video_480p_000.ts')
+        self.assertIn(f'#EXT-X-TARGETDURATION:{get_live_target_duration()}', lines)
+        self.assertTrue(is_playlist_ended(playlist_path))
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_concat_video_chunks_assembles_renditions(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that the encoded chunks are joined with stream copy and the model is updated.
+        """
+        resolution_dir = os.path.join(settings.MEDIA_ROOT, 'chunks', str(self.video.pk), '480p')
+        os.makedirs(resolution_dir, exist_ok=True)
+        self.addCleanup(shutil.rmtree, os.path.join(settings.MEDIA_ROOT, 'chunks'), ignore_errors=True)
+        source_dir = os.path.join(settings.MEDIA_ROOT, 'chunks', str(self.video.pk), 'source')
+        os.makedirs(source_dir, exist_ok=True)
+        for chunk_base in ['chunk_0001', 'chunk_0000']:
+            with open(os.path.join(source_dir, f'{chunk_base}.mkv'), 'wb') as f:
+                f.write(b'source chunk')
+            with open(os.path.join(resolution_dir, f'{chunk_base}.mp4'), 'wb') as f:
+                f.write(b'chunk')
+            write_marker(self.video.pk, f'{chunk_base}_480p', [os.path.join(resolution_dir, f'{chunk_base}.mp4')])
+        write_marker(self.video.pk, 'split', [os.path.join(source_dir, name) for name in os.listdir(source_dir)])
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+
+        concat_video_chunks(self.video.pk, self.video.video_file.path, [480])
+
+        ffmpeg_cmd = mock_run_ffmpeg.call_args.args[0]
+        self.assertEqual(ffmpeg_cmd[:6], ['ffmpeg', '-f', 'concat', '-safe', '0', '-i'])
+        self.assertIn('copy', ffmpeg_cmd)
+        with open(os.path.join(resolution_dir, 'concat.txt')) as concat_list:
+            self.assertEqual(concat_list.read().splitlines(), [
+                f"file '{os.path.join(resolution_dir, 'chunk_0000.mp4')}'",
+                f"file '{os.path.join(resolution_dir, 'chunk_0001.mp4')}'",
+            ])
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.video_480p.name, os.path.join('videos', '480p', 'test_video_480p.mp4'))
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_concat_video_chunks_requires_all_chunks(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that the renditions are not assembled while a chunk is missing.
+        """
+        with self.assertRaises(RuntimeError):
+            concat_video_chunks(self.video.pk, self.video.video_file.path, [480])
+
+        mock_run_ffmpeg.assert_not_called()
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_hls_playlist_remuxes_existing_rendition(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that HLS packaging segments the existing MP4 with stream copy instead of re-encoding.
+        """
+        rendition_dir = os.path.join(settings.MEDIA_ROOT, 'videos', '480p')
+        os.makedirs(rendition_dir, exist_ok=True)
+        rendition_path = os.path.join(rendition_dir, 'test_video_480p.mp4')
+        with open(rendition_path, 'wb') as f:
+            f.write(b'dummy rendition content')
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+
+        generate_hls_playlist(self.video.pk, 480, self.video.video_file.path, rendition_path)
+
+        ffmpeg_cmd, _, stage, _ = mock_run_ffmpeg.call_args.args
+        self.assertEqual(stage, 'hls_480p')
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-i') + 1], rendition_path)
+        self.assertIn('copy', ffmpeg_cmd)
+        self.assertNotIn('libx264', ffmpeg_cmd)
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_hls_playlist_with_fmp4_segments(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that CMAF packaging writes .m4s segments and references the init segment.
+        """
+        rendition_dir = os.path.join(settings.MEDIA_ROOT, 'videos', '480p')
+        os.makedirs(rendition_dir, exist_ok=True)
+        rendition_path = os.path.join(rendition_dir, 'test_video_480p.mp4')
+        with open(rendition_path, 'wb') as f:
+            f.write(b'dummy rendition content')
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+
+        with self.settings(VIDEO_SEGMENT_TYPE='fmp4'):
+            generate_hls_playlist(self.video.pk, 480, self.video.video_file.path, rendition_path)
+
+        ffmpeg_cmd = mock_run_ffmpeg.call_args.args[0]
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-hls_segment_type') + 1], 'fmp4')
+        self.assertTrue(ffmpeg_cmd[ffmpeg_cmd.index('-hls_segment_filename') + 1].endswith('test_video_480p_part_%03d.m4s'))
+        with open(os.path.join(self.temp_media_root, 'hls', str(self.video.pk), '480p', 'index.m3u8')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[1], '#EXT-X-VERSION:7')
+        self.assertIn('#EXT-X-MAP:URI="init.mp4"', lines)
+        self.assertIn('test_video_480p_000.m4s', lines)
+
+        os.remove(os.path.join(self.temp_media_root, 'hls', str(self.video.pk), '480p', 'init.mp4'))
+        self.assertFalse(is_complete(self.video.pk, 'hls_480p'))
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_hls_playlist_is_video_only_with_audio_group(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that the video streams leave the audio to the shared audio rendition.
+        """
+        rendition_dir = os.path.join(settings.MEDIA_ROOT, 'videos', '480p')
+        os.makedirs(rendition_dir, exist_ok=True)
+        rendition_path = os.path.join(rendition_dir, 'test_video_480p.mp4')
+        with open(rendition_path, 'wb') as f:
+            f.write(b'dummy rendition content')
+        write_marker(self.video.pk, 'hls_audio', [rendition_path])
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+
+        generate_hls_playlist(self.video.pk, 480, self.video.video_file.path, rendition_path)
+
+        ffmpeg_cmd = mock_run_ffmpeg.call_args.args[0]
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-map') + 1], '0:v:0')
+
+    @patch('content_app.tasks.run_ffmpeg')
+    def test_hls_playlist_falls_back_to_encode_without_rendition(self, mock_run_ffmpeg, mock_subprocess_run):
+        """
+        Tests that HLS packaging encodes from the source when the MP4 rendition is missing.
+        """
+        rendition_path = os.path.join(settings.MEDIA_ROOT, 'videos', '720p', 'test_video_720p.mp4')
+        mock_run_ffmpeg.side_effect = self.create_ffmpeg_outputs
+
+        generate_hls_playlist(self.video.pk, 720, self.video.video_file.path, rendition_path)
 
+        ffmpeg_cmd = mock_run_ffmpeg.call_args.args[0]
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-i') + 1], self.video.video_file.path)
+        self.assertIn('libx264', ffmpeg_cmd)
+        self.assertIn('scale=-2:720', ffmpeg_cmd)
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-maxrate') + 1], '2800k')
+        self.assertIn('-force_key_frames', ffmpeg_cmd)
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-hls_time') + 1], str(settings.VIDEO_KEYFRAME_INTERVAL))
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import shutil
+from unittest.mock import patch, MagicMock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from content_app.completion import is_complete, write_marker
+from content_app.models import Video
+from content_app.tasks import generate_preview
+
+CONTENT = b'the same video content'
+CONTENT_HASH = hashlib.sha256(CONTENT).hexdigest()
+
+
+@patch('content_app.signals.django_rq.get_queue')
+class ContentDeduplicationTest(APITestCase):
+    """
+    Tests that uploads are addressed by content and duplicates share their outputs.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary media root.
+        """
+        self.temp_media_root = os.path.join(settings.BASE_DIR, 'test_media')
+        settings.MEDIA_ROOT = self.temp_media_root
+        os.makedirs(self.temp_media_root, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.temp_media_root, ignore_errors=True)
+
+    def upload(self, filename, content=CONTENT):
+        """
+        Creates a video from an uploaded file and runs the on-commit callbacks.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            return Video.objects.create(
+                title=filename, video_file=SimpleUploadedFile(filename, content, content_type='video/mp4')
+            )
+
+    def test_source_is_stored_under_its_content_hash(self, mock_get_queue):
+        """
+        Tests that two different files with the same name do not collide.
+        """
+        mock_get_queue.return_value = MagicMock()
+
+        first = self.upload('Clip.MP4')
+        second = self.upload('Clip.MP4', content=b'other content')
+
+        self.assertEqual(first.content_hash, CONTENT_HASH)
+        self.assertEqual(first.video_file.name, os.path.join('videos', f'{CONTENT_HASH}.mp4'))
+        self.assertNotEqual(first.video_file.name, second.video_file.name)
+
+    def test_duplicate_upload_shares_outputs_without_processing(self, mock_get_queue):
+        """
+        Tests that a re-upload links to the existing outputs and enqueues nothing.
+        """
+        mock_get_queue.return_value = MagicMock()
+        original = self.upload('original.mp4')
+        Video.objects.filter(pk=original.pk).update(
+            video_480p=os.path.join('videos', '480p', f'{CONTENT_HASH}_480p.mp4'),
+            thumbnail_url=os.path.join('thumbnails', f'{CONTENT_HASH}_thumbnail.jpg'),
+            duration=12.5,
+        )
+        mock_get_queue.reset_mock()
+
+        duplicate = self.upload('copy of original.mp4')
+
+        mock_get_queue.return_value.enqueue_many.assert_not_called()
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.video_file.name, original.video_file.name)
+        self.assertEqual(duplicate.video_480p.name, os.path.join('videos', '480p', f'{CONTENT_HASH}_480p.mp4'))
+        self.assertEqual(duplicate.thumbnail_url, os.path.join('thumbnails', f'{CONTENT_HASH}_thumbnail.jpg'))
+        self.assertEqual(duplicate.duration, 12.5)
+        stored_sources = [name for name in os.listdir(os.path.join(self.temp_media_root, 'videos'))
+                          if name.startswith(CONTENT_HASH)]
+        self.assertEqual(stored_sources, [f'{CONTENT_HASH}.mp4'])
+
+    def test_pipeline_results_reach_duplicates(self, mock_get_queue):
+        """
+        Tests that a duplicate linked while the original is processed receives its results.
+        """
+        mock_get_queue.return_value = MagicMock()
+        original = self.upload('original.mp4')
+        duplicate = self.upload('duplicate.mp4')
+
+        Video.objects.sharing_content_with(original.pk).update(
+            video_720p=os.path.join('videos', '720p', f'{CONTENT_HASH}_720p.mp4')
+        )
+
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.video_720p.name, os.path.join('videos', '720p', f'{CONTENT_HASH}_720p.mp4'))
+
+    @patch('content_app.signals.delete_file')
+    def test_shared_files_are_deleted_with_the_last_reference(self, mock_delete_file, mock_get_queue):
+        """
+        Tests that deleting one of two duplicates keeps the shared files.
+        """
+        mock_get_queue.return_value = MagicMock()
+        original = self.upload('original.mp4')
+        duplicate = self.upload('duplicate.mp4')
+        hls_dir = os.path.join(self.temp_media_root, 'hls', CONTENT_HASH)
+        os.makedirs(hls_dir)
+
+        original.delete()
+        mock_delete_file.assert_not_called()
+        self.assertTrue(os.path.exists(hls_dir))
+
+        duplicate.delete()
+        mock_delete_file.assert_called_once_with(duplicate.video_file.path)
+        self.assertFalse(os.path.exists(hls_dir))
+
+    def test_pipeline_finishes_for_duplicates_of_a_deleted_original(self, mock_get_queue):
+        """
+        Tests that deleting the original mid-pipeline keeps its progress and results reach the duplicate.
+        """
+        mock_get_queue.return_value = MagicMock()
+        original = self.upload('original.mp4')
+        duplicate = self.upload('duplicate.mp4')
+        preview_path = os.path.join(self.temp_media_root, 'videos', 'previews', f'{CONTENT_HASH}_preview.mp4')
+        os.makedirs(os.path.dirname(preview_path))
+        with open(preview_path, 'wb') as f:
+            f.write(b'preview')
+        write_marker(CONTENT_HASH, 'preview', [preview_path])
+        chunk_dir = os.path.join(self.temp_media_root, 'chunks', CONTENT_HASH)
+        os.makedirs(chunk_dir)
+
+        original.delete()
+        self.assertTrue(is_complete(CONTENT_HASH, 'preview'))
+        self.assertTrue(os.path.exists(chunk_dir))
+
+        with patch('content_app.tasks.subprocess.run') as mock_run:
+            generate_preview(original.pk, original.video_file.path, '/missing_480p.mp4', 12.5, CONTENT_HASH)
+        mock_run.assert_not_called()
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.preview_clip.name, os.path.join('videos', 'previews', f'{CONTENT_HASH}_preview.mp4'))
+
+        duplicate.delete()
+        self.assertFalse(is_complete(CONTENT_HASH, 'preview'))
+        self.assertFalse(os.path.exists(chunk_dir))
+
+    def test_hls_is_served_from_the_content_addressed_tree(self, mock_get_queue):
+        """
+        Tests that the playlist of a duplicate is read from the shared HLS directory.
+        """
+        mock_get_queue.return_value = MagicMock()
+        self.upload('original.mp4')
+        duplicate = self.upload('duplicate.mp4')
+        playlist_dir = os.path.join(self.temp_media_root, 'hls', CONTENT_HASH, '480p')
+        os.makedirs(playlist_dir)
+        with open(os.path.join(playlist_dir, 'index.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n')
+        self.client.force_authenticate(User.objects.create_user(username='viewer', password='password'))
+
+        response = self.client.get(reverse('hls_playlist', args=[duplicate.pk, '480p']))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'#EXTM3U\n')
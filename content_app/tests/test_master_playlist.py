@@ -0,0 +1,214 @@
+import json
+import os
+import shutil
+from unittest.mock import patch, MagicMock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from content_app.completion import write_marker
+from content_app.hls import get_codecs, get_stream_bandwidth, write_master_playlist, write_media_playlist
+from content_app.models import Video
+from content_app.tasks import generate_master_playlist
+
+SEGMENT_STREAMS = {
+    'streams': [
+        {'codec_type': 'video', 'codec_name': 'h264', 'profile': 'High', 'level': 31,
+         'width': 1280, 'height': 720, 'avg_frame_rate': '25/1'},
+        {'codec_type': 'audio', 'codec_name': 'aac', 'profile': 'LC'},
+    ]
+}
+
+
+class MasterPlaylistTest(APITestCase):
+    """
+    Tests for the master playlist that enables adaptive bitrate streaming.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary media root and a video.
+        """
+        self.temp_media_root = os.path.join(settings.BASE_DIR, 'test_media')
+        settings.MEDIA_ROOT = self.temp_media_root
+        os.makedirs(self.temp_media_root, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.temp_media_root, ignore_errors=True)
+        with patch('content_app.signals.django_rq.get_queue', return_value=MagicMock()):
+            self.video = Video.objects.create(title='Test Video', description='Test Description')
+
+    def package_stream(self, resolution, segment_sizes):
+        """
+        Writes a complete HLS stream with segments of the given sizes.
+        """
+        stream_dir = os.path.join(self.temp_media_root, 'hls', str(self.video.pk), f'{resolution}p')
+        os.makedirs(stream_dir, exist_ok=True)
+        segments = []
+        for index, size in enumerate(segment_sizes):
+            filename = f'{resolution}p_{index:03d}.ts'
+            with open(os.path.join(stream_dir, filename), 'wb') as f:
+                f.write(b'\0' * size)
+            segments.append((2.0, filename))
+        playlist_path = os.path.join(stream_dir, 'index.m3u8')
+        write_media_playlist(playlist_path, segments)
+        write_marker(self.video.pk, f'hls_{resolution}p', [playlist_path])
+        return stream_dir, segments
+
+    def test_codecs(self):
+        """
+        Tests that ffprobe streams are mapped to RFC 6381 codec identifiers.
+        """
+        self.assertEqual(get_codecs(SEGMENT_STREAMS['streams']), 'avc1.64001f,mp4a.40.2')
+
+    def test_stream_bandwidth(self):
+        """
+        Tests that the peak and average bitrate are measured from the segments.
+        """
+        stream_dir, segments = self.package_stream(480, [1000, 3000])
+
+        self.assertEqual(get_stream_bandwidth(stream_dir, segments),
+                         {'bandwidth': 12000, 'average_bandwidth': 8000})
+
+    def test_variants_are_sorted_by_bandwidth(self):
+        """
+        Tests that the lowest bandwidth variant is listed first.
+        """
+        master_path = os.path.join(self.temp_media_root, 'master.m3u8')
+        write_master_playlist(master_path, [
+            {'uri': '720p/index.m3u8', 'bandwidth': 3000000, 'average_bandwidth': 2500000,
+             'resolution': '1280x720', 'codecs': 'avc1.64001f,mp4a.40.2', 'frame_rate': 25},
+            {'uri': '480p/index.m3u8', 'bandwidth': 1200000, 'average_bandwidth': 1000000,
+             'resolution': '854x480', 'codecs': 'avc1.64001e,mp4a.40.2'},
+        ])
+
+        with open(master_path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[:3], ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-INDEPENDENT-SEGMENTS'])
+        self.assertEqual(lines[3], '#EXT-X-STREAM-INF:BANDWIDTH=1200000,AVERAGE-BANDWIDTH=1000000,'
+                                   'RESOLUTION=854x480,CODECS="avc1.64001e,mp4a.40.2"')
+        self.assertEqual(lines[4], '480p/index.m3u8')
+        self.assertIn('FRAME-RATE=25.000', lines[5])
+        self.assertEqual(lines[6], '720p/index.m3u8')
+
+    @patch('content_app.tasks.subprocess.run')
+    def test_generate_master_playlist_skips_incomplete_streams(self, mock_run):
+        """
+        Tests that only completely packaged streams become variants.
+        """
+        mock_run.return_value = MagicMock(stdout=json.dumps(SEGMENT_STREAMS))
+        self.package_stream(720, [4000, 5000])
+
+        generate_master_playlist(self.video.pk, [480, 720])
+
+        with open(os.path.join(self.temp_media_root, 'hls', str(self.video.pk), 'master.m3u8')) as f:
+            content = f.read()
+        self.assertIn('BANDWIDTH=20000,AVERAGE-BANDWIDTH=18000,RESOLUTION=1280x720', content)
+        self.assertIn('720p/index.m3u8', content)
+        self.assertNotIn('480p/index.m3u8', content)
+        self.assertTrue(mock_run.call_args[0][0][-1].endswith('720p_000.ts'))
+
+    @patch('content_app.tasks.subprocess.run')
+    def test_variants_reference_the_audio_group(self, mock_run):
+        """
+        Tests that video-only variants reference the shared audio rendition.
+        """
+        def ffprobe(ffprobe_cmd, **kwargs):
+            streams = SEGMENT_STREAMS['streams']
+            if ffprobe_cmd[-1].endswith('audio_000.ts'):
+                return MagicMock(stdout=json.dumps({'streams': streams[1:]}))
+            return MagicMock(stdout=json.dumps({'streams': streams[:1]}))
+        mock_run.side_effect = ffprobe
+        self.package_stream(720, [4000, 5000])
+        audio_dir = os.path.join(self.temp_media_root, 'hls', str(self.video.pk), 'audio')
+        os.makedirs(audio_dir)
+        with open(os.path.join(audio_dir, 'audio_000.ts'), 'wb') as f:
+            f.write(b'\0' * 500)
+        write_media_playlist(os.path.join(audio_dir, 'index.m3u8'), [(2.0, 'audio_000.ts')])
+        write_marker(self.video.pk, 'hls_audio', [os.path.join(audio_dir, 'index.m3u8')])
+
+        generate_master_playlist(self.video.pk, [720])
+
+        with open(os.path.join(self.temp_media_root, 'hls', str(self.video.pk), 'master.m3u8')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[3], '#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio",NAME="Default",'
+                                   'DEFAULT=YES,AUTOSELECT=YES,URI="audio/index.m3u8"')
+        self.assertEqual(lines[4], '#EXT-X-STREAM-INF:BANDWIDTH=22000,AVERAGE-BANDWIDTH=20000,RESOLUTION=1280x720,'
+                                   'CODECS="avc1.64001f,mp4a.40.2",FRAME-RATE=25.000,AUDIO="audio"')
+
+    @patch('content_app.tasks.subprocess.run')
+    def test_fmp4_streams_are_probed_from_the_init_segment(self, mock_run):
+        """
+        Tests that the codecs of fMP4 streams are read from their init segment.
+        """
+        mock_run.return_value = MagicMock(stdout=json.dumps(SEGMENT_STREAMS))
+        stream_dir, segments = self.package_stream(720, [4000, 5000])
+        with open(os.path.join(stream_dir, 'init.mp4'), 'wb') as f:
+            f.write(b'\0' * 800)
+        write_media_playlist(os.path.join(stream_dir, 'index.m3u8'), segments, init_segment='init.mp4')
+        write_marker(self.video.pk, 'hls_720p', [os.path.join(stream_dir, 'index.m3u8')])
+
+        generate_master_playlist(self.video.pk, [720])
+
+        self.assertEqual(mock_run.call_args[0][0][-1], os.path.join(stream_dir, 'init.mp4'))
+
+    @patch('content_app.tasks.subprocess.run')
+    def test_generate_master_playlist_without_streams_fails(self, mock_run):
+        """
+        Tests that the stage fails (and is retried) if no stream is complete.
+        """
+        with self.assertRaises(RuntimeError):
+            generate_master_playlist(self.video.pk, [480, 720])
+        mock_run.assert_not_called()
+
+    def test_master_playlist_view(self):
+        """
+        Tests that the master playlist is served once it exists.
+        """
+        self.client.force_authenticate(User.objects.create_user(username='viewer', password='password'))
+        url = reverse('hls_master_playlist', args=[self.video.pk])
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        hls_dir = os.path.join(self.temp_media_root, 'hls', str(self.video.pk))
+        os.makedirs(hls_dir)
+        with open(os.path.join(hls_dir, 'master.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n')
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        self.assertEqual(b''.join(response.streaming_content), b'#EXTM3U\n')
+
+    def test_segment_content_types(self):
+        """
+        Tests that MPEG-TS, fMP4 media and init segments are served with their content types.
+        """
+        self.client.force_authenticate(User.objects.create_user(username='viewer', password='password'))
+        stream_dir = os.path.join(self.temp_media_root, 'hls', str(self.video.pk), '480p')
+        os.makedirs(stream_dir)
+        for filename in ('480p_000.ts', '480p_000.m4s', 'init.mp4'):
+            with open(os.path.join(stream_dir, filename), 'wb') as f:
+                f.write(b'segment')
+
+        for url, content_type in (
+            (reverse('hls_segment', args=[self.video.pk, '480p', '480p_000.ts']), 'video/MP2T'),
+            (reverse('hls_segment', args=[self.video.pk, '480p', '480p_000.m4s']), 'video/iso.segment'),
+            (reverse('hls_init_segment', args=[self.video.pk, '480p']), 'video/mp4'),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], content_type)
+
+    def test_growing_playlist_is_not_cached(self):
+        """
+        Tests that an EVENT playlist is served with no-cache until it is ended.
+        """
+        self.client.force_authenticate(User.objects.create_user(username='viewer', password='password'))
+        stream_dir, segments = self.package_stream(480, [1000])
+        url = reverse('hls_playlist', args=[self.video.pk, '480p'])
+
+        self.assertFalse(self.client.get(url).has_header('Cache-Control'))
+
+        write_media_playlist(os.path.join(stream_dir, 'index.m3u8'), segments, ended=False)
+        response = self.client.get(url)
+
+        self.assertEqual(response['Cache-Control'], 'no-cache')
@@ -0,0 +1,73 @@
+import os
+from unittest.mock import patch
+from django.test import TestCase
+from content_app.models import Video
+
+
+@patch('content_app.signals.django_rq.get_queue')
+class VideoSaveTest(TestCase):
+    """
+    Tests that saving a Video never overwrites results of the processing pipeline.
+    """
+
+    def test_stale_save_keeps_pipeline_results(self, mock_get_queue):
+        """
+        Tests that a full save of a stale instance does not clobber renditions written by a worker.
+        """
+        video = Video.objects.create(title="Original", video_file=os.path.join('videos', 'movie.mp4'))
+        stale_video = Video.objects.get(pk=video.pk)
+
+        Video.objects.filter(pk=video.pk).update(
+            video_480p=os.path.join('videos', '480p', 'movie_480p.mp4'),
+            thumbnail_url=os.path.join('thumbnails', 'movie_thumbnail.jpg'),
+        )
+
+        stale_video.title = "Edited"
+        stale_video.save()
+
+        video.refresh_from_db()
+        self.assertEqual(video.title, "Edited")
+        self.assertEqual(video.video_480p.name, os.path.join('videos', '480p', 'movie_480p.mp4'))
+        self.assertEqual(video.thumbnail_url, os.path.join('thumbnails', 'movie_thumbnail.jpg'))
+
+    def test_explicit_update_fields_save_pipeline_results(self, mock_get_queue):
+        """
+        Tests that pipeline fields are still saved when listed in update_fields.
+        """
+        video = Video.objects.create(title="Original", video_file=os.path.join('videos', 'movie.mp4'))
+
+        video.video_720p.name = os.path.join('videos', '720p', 'movie_720p.mp4')
+        video.save(update_fields=['video_720p'])
+
+        video.refresh_from_db()
+        self.assertEqual(video.video_720p.name, os.path.join('videos', '720p', 'movie_720p.mp4'))
+
+    def test_changed_pipeline_field_is_not_dropped_silently(self, mock_get_queue):
+        """
+        Tests that a plain save refuses to drop a pipeline field assigned on the instance.
+        """
+        video = Video.objects.create(title="Original", video_file=os.path.join('videos', 'movie.mp4'))
+        video = Video.objects.get(pk=video.pk)
+
+        video.duration = 95.0
+        with self.assertRaisesMessage(ValueError, 'duration of video'):
+            video.save()
+
+        video.save(update_fields=['duration'])
+        video.title = "Edited"
+        video.save()
+        video.refresh_from_db()
+        self.assertEqual((video.title, video.duration), ("Edited", 95.0))
+
+    def test_refreshed_video_can_be_saved(self, mock_get_queue):
+        """
+        Tests that pipeline results loaded by refresh_from_db do not count as changes.
+        """
+        video = Video.objects.create(title="Original", video_file=os.path.join('videos', 'movie.mp4'))
+        Video.objects.filter(pk=video.pk).update(video_480p=os.path.join('videos', '480p', 'movie_480p.mp4'))
+
+        video.refresh_from_db()
+        video.title = "Edited"
+        video.save()
+
+        self.assertEqual(Video.objects.get(pk=video.pk).title, "Edited")
@@ -0,0 +1,270 @@
+import os
+from unittest.mock import patch, Mock, MagicMock
+from django.test import TestCase
+from django.conf import settings
+from rq.job import Job, JobStatus
+from content_app.pipeline import delete_dependent_jobs, get_pipeline_key, get_pipeline_status
+from content_app.scheduling import TRANSCODE_BACKLOG_KEY
+from content_app.tasks import (
+    build_pipeline,
+    generate_thumbnail,
+    generate_trickplay,
+    generate_preview,
+    transcode_video,
+    split_video_into_chunks,
+    transcode_chunk,
+    concat_video_chunks,
+    encode_audio,
+    generate_hls_playlist,
+    generate_master_playlist,
+    finalize_video
+)
+
+
+def make_metadata(duration, height=720):
+    """
+    Returns probed metadata for a source of the given duration and height.
+    """
+    return {
+        'duration': duration, 'width': height * 16 // 9, 'height': height, 'frame_rate': 25.0,
+        'bitrate': 2500000, 'video_codec': 'h264', 'audio_codec': 'aac',
+        'audio_channels': 2, 'audio_channel_layout': 'stereo',
+    }
+
+
+@patch('content_app.tasks.django_rq.get_queue')
+class BuildPipelineTest(TestCase):
+    """
+    Tests for the dependency graph enqueued after the probe stage.
+    """
+
+    source_path = '/media/videos/movie.mp4'
+
+    def setUp(self):
+        """
+        Make every enqueue return a distinct job. No encode speed is measured yet.
+        """
+        self.enqueued = []
+        speed_patcher = patch('content_app.tasks.get_encode_speed', return_value=None)
+        self.mock_get_encode_speed = speed_patcher.start()
+        self.addCleanup(speed_patcher.stop)
+
+        def enqueue(func, *args, **kwargs):
+            job = Mock(spec=Job, id=f'job-{len(self.enqueued)}')
+            self.enqueued.append((func, args, kwargs, job))
+            return job
+
+        self.enqueue = enqueue
+
+    def get_jobs(self, func):
+        """
+        Returns the (args, kwargs, job) tuples enqueued for a function.
+        """
+        return [(args, kwargs, job) for f, args, kwargs, job in self.enqueued if f is func]
+
+    def test_single_pass_graph(self, mock_get_queue):
+        """
+        Tests probe -> thumbnail -> transcode -> packaging -> finalize for short videos.
+        """
+        mock_get_queue.return_value.enqueue.side_effect = self.enqueue
+
+        jobs = build_pipeline(1, self.source_path, make_metadata(60), depends_on=None, media_key='hash')
+
+        [(thumb_args, thumb_kwargs, thumbnail_job)] = self.get_jobs(generate_thumbnail)
+        self.assertEqual(thumb_args, (1, self.source_path, 1280, 'hash'))
+
+        [(audio_args, audio_kwargs, audio_job)] = self.get_jobs(encode_audio)
+        self.assertEqual(audio_args, (1, self.source_path, 60, 'hash'))
+        self.assertEqual(audio_kwargs['depends_on'].dependencies, [thumbnail_job])
+
+        [(transcode_args, transcode_kwargs, transcode_job)] = self.get_jobs(transcode_video)
+        static_ladder = {resolution: {**settings.VIDEO_ENCODING_LADDER[resolution], 'preset': 'medium'}
+                         for resolution in (480, 720)}
+        audio_path = os.path.join(settings.MEDIA_ROOT, 'videos', 'audio', 'movie_audio.m4a')
+        self.assertEqual(transcode_args, (1, self.source_path, [480, 720], 60, static_ladder, audio_path, 'hash'))
+        self.assertEqual(transcode_kwargs['depends_on'].dependencies, [audio_job])
+        self.assertTrue(transcode_kwargs['depends_on'].allow_failure)
+
+        packaging = self.get_jobs(generate_hls_playlist)
+        self.assertEqual([args[1] for args, _, _ in packaging], [480, 720])
+        self.assertEqual(packaging[0][0][3], os.path.join(settings.MEDIA_ROOT, 'videos', '480p', 'movie_480p.mp4'))
+        self.assertTrue(all(kwargs['depends_on'].dependencies == [transcode_job] for _, kwargs, _ in packaging))
+        self.assertTrue(all(kwargs['depends_on'].allow_failure for _, kwargs, _ in packaging))
+        self.assertEqual(transcode_kwargs['retry'].intervals, [settings.VIDEO_RETRY_DELAY * 2 ** attempt
+                                                               for attempt in range(settings.VIDEO_JOB_RETRIES)])
+
+        [(master_args, master_kwargs, master_job)] = self.get_jobs(generate_master_playlist)
+        self.assertEqual(master_args, (1, [480, 720], 'hash'))
+        self.assertEqual(master_kwargs['depends_on'].dependencies, [job for _, _, job in packaging])
+
+        [(finalize_args, finalize_kwargs, _)] = self.get_jobs(finalize_video)
+        self.assertEqual(finalize_args, (1, None, 'hash'))
+        self.assertEqual(finalize_kwargs['depends_on'].dependencies, [master_job])
+
+        [(trickplay_args, trickplay_kwargs, _)] = self.get_jobs(generate_trickplay)
+        self.assertEqual(trickplay_args, (1, self.source_path, make_metadata(60), 'hash'))
+        self.assertEqual(trickplay_kwargs['depends_on'].dependencies, [thumbnail_job])
+
+        [(preview_args, preview_kwargs, _)] = self.get_jobs(generate_preview)
+        self.assertEqual(preview_args, (1, self.source_path, packaging[0][0][3], 60, 'hash'))
+        self.assertEqual(preview_kwargs['depends_on'].dependencies, [transcode_job])
+
+        self.assertEqual(set(jobs), {'thumbnail', 'trickplay', 'audio', 'transcode', 'hls_480p', 'hls_720p',
+                                     'preview', 'master', 'finalize'})
+        mock_get_queue.return_value.connection.hset.assert_any_call(
+            get_pipeline_key(1), mapping={stage: job.id for stage, job in jobs.items()})
+
+    @patch('content_app.tasks.delete_dependent_jobs')
+    def test_retried_probe_replaces_the_graph_of_the_earlier_attempt(self, mock_delete_dependent_jobs,
+                                                                     mock_get_queue):
+        """
+        Tests that the jobs an earlier attempt of the probe job enqueued are deleted before the graph is built.
+        """
+        mock_get_queue.return_value.enqueue.side_effect = self.enqueue
+        probe_job = Mock(spec=Job, id='probe')
+        mock_delete_dependent_jobs.side_effect = lambda job: self.assertEqual(self.enqueued, [])
+
+        build_pipeline(1, self.source_path, make_metadata(60), depends_on=probe_job)
+
+        mock_delete_dependent_jobs.assert_called_once_with(probe_job)
+        [(_, thumb_kwargs, _)] = self.get_jobs(generate_thumbnail)
+        self.assertIs(thumb_kwargs['depends_on'], probe_job)
+
+    def test_chunked_graph_for_long_videos(self, mock_get_queue):
+        """
+        Tests that long videos fan out into one job per chunk joined by a concat job.
+        """
+        mock_get_queue.return_value.enqueue.side_effect = self.enqueue
+        duration = settings.VIDEO_CHUNK_DURATION * 5.5
+
+        with self.settings(VIDEO_CHUNKED_MIN_DURATION=settings.VIDEO_CHUNK_DURATION):
+            build_pipeline(1, self.source_path, make_metadata(duration, 1080), depends_on=None)
+
+        self.assertEqual(self.get_jobs(transcode_video), [])
+        [(_, _, split_job)] = self.get_jobs(split_video_into_chunks)
+
+        chunks = self.get_jobs(transcode_chunk)
+        self.assertEqual([args[1] for args, _, _ in chunks], [0, 1, 2, 3, 4, 5])
+        self.assertTrue(all(kwargs['depends_on'].dependencies == [split_job] for _, kwargs, _ in chunks))
+        self.assertTrue(all(args[4:] == (1, True) for args, _, _ in chunks))
+
+        [(_, _, audio_job)] = self.get_jobs(encode_audio)
+        [(concat_args, concat_kwargs, concat_job)] = self.get_jobs(concat_video_chunks)
+        audio_path = os.path.join(settings.MEDIA_ROOT, 'videos', 'audio', 'movie_audio.m4a')
+        self.assertEqual(concat_args, (1, self.source_path, [480, 720, 1080], duration, audio_path, 1))
+        self.assertEqual(concat_kwargs['depends_on'].dependencies, [*(job for _, _, job in chunks), audio_job])
+        self.assertTrue(all(kwargs['depends_on'].dependencies == [concat_job]
+                            for _, kwargs, _ in self.get_jobs(generate_hls_playlist)))
+        self.assertTrue(all(args[7] for args, _, _ in self.get_jobs(generate_hls_playlist)))
+
+    def test_per_title_ladder_is_passed_to_every_encode(self, mock_get_queue):
+        """
+        Tests that the rungs derived from the complexity replace the static ladder.
+        """
+        mock_get_queue.return_value.enqueue.side_effect = self.enqueue
+        metadata = {**make_metadata(60, 1080), 'complexity': 0.05}
+
+        build_pipeline(1, self.source_path, metadata, depends_on=None)
+
+        [(transcode_args, _, _)] = self.get_jobs(transcode_video)
+        ladder = transcode_args[4]
+        self.assertEqual(transcode_args[2], [480, 720, 1080])
+        self.assertLess(int(ladder[1080]['maxrate'][:-1]), 5000)
+        self.assertEqual([args[6] for args, _, _ in self.get_jobs(generate_hls_playlist)],
+                         [ladder[480], ladder[720], ladder[1080]])
+
+    def test_source_without_audio_has_no_audio_stage(self, mock_get_queue):
+        """
+        Tests that silent sources are transcoded without waiting for an audio job.
+        """
+        mock_get_queue.return_value.enqueue.side_effect = self.enqueue
+
+        build_pipeline(1, self.source_path, {**make_metadata(60), 'audio_codec': ''}, depends_on=None)
+
+        self.assertEqual(self.get_jobs(encode_audio), [])
+        [(transcode_args, transcode_kwargs, _)] = self.get_jobs(transcode_video)
+        [(_, _, thumbnail_job)] = self.get_jobs(generate_thumbnail)
+        self.assertIsNone(transcode_args[5])
+        self.assertEqual(transcode_kwargs['depends_on'].dependencies, [thumbnail_job])
+
+    @patch('content_app.tasks.select_encoder_preset', return_value='veryfast')
+    def test_selected_preset_is_used_by_every_encode(self, mock_select_preset, mock_get_queue):
+        """
+        Tests that the preset chosen for the backlog ends up in the ladder and the backlog.
+        """
+        mock_get_queue.return_value.enqueue.side_effect = self.enqueue
+
+        build_pipeline(1, self.source_path, make_metadata(60), depends_on=None)
+
+        estimates = mock_select_preset.call_args.args[0]
+        self.assertEqual(list(estimates), [preset for preset, _ in settings.VIDEO_ENCODE_PRESETS])
+        self.assertLess(estimates['veryfast'], estimates['medium'])
+        [(transcode_args, _, _)] = self.get_jobs(transcode_video)
+        self.assertEqual({rung['preset'] for rung in transcode_args[4].values()}, {'veryfast'})
+        self.assertEqual(mock_select_preset.call_args.kwargs['video_pk'], 1)
+        mock_get_queue.return_value.connection.hset.assert_any_call(TRANSCODE_BACKLOG_KEY, 1, estimates['veryfast'])
+
+    def test_heavy_jobs_are_routed_to_a_transcode_queue(self, mock_get_queue):
+        """
+        Tests that only the encodes leave the fast queue.
+        """
+        queues = {}
+
+        def get_queue(name):
+            if name not in queues:
+                queues[name] = MagicMock()
+                queues[name].enqueue.side_effect = lambda func, *args, **kwargs: self.enqueue(
+                    func, *args, queue_name=name, **kwargs)
+            return queues[name]
+
+        mock_get_queue.side_effect = get_queue
+
+        build_pipeline(1, self.source_path, make_metadata(60), depends_on=None)
+
+        routed = {func: kwargs['queue_name'] for func, _, kwargs, _ in self.enqueued}
+        self.assertEqual(routed[transcode_video], 'transcode_short')
+        self.assertEqual({routed[func] for func in (generate_thumbnail, generate_hls_playlist, finalize_video)},
+                         {'fast'})
+
+
+class PipelineStatusTest(TestCase):
+    """
+    Tests for querying the state of a video's pipeline.
+    """
+
+    @patch('content_app.pipeline.Job.fetch_many')
+    def test_get_pipeline_status(self, mock_fetch_many):
+        """
+        Tests that every recorded stage is reported with the status of its job.
+        """
+        connection = Mock()
+        connection.hgetall.return_value = {b'probe': b'job-1', b'transcode': b'job-2'}
+        finished_job = Mock(spec=Job)
+        finished_job.get_status.return_value = JobStatus.FINISHED
+        mock_fetch_many.return_value = [finished_job, None]
+
+        status = get_pipeline_status(5, connection=connection)
+
+        connection.hgetall.assert_called_once_with(get_pipeline_key(5))
+        mock_fetch_many.assert_called_once_with(['job-1', 'job-2'], connection=connection)
+        self.assertEqual(status, {'probe': 'finished', 'transcode': 'expired'})
+
+    @patch('content_app.pipeline.Job.fetch_many')
+    def test_delete_dependent_jobs(self, mock_fetch_many):
+        """
+        Tests that every job waiting for a job is deleted once, also through other jobs, and the job is kept.
+        """
+        connection = Mock()
+        dependent_ids = {'probe': ['thumbnail'], 'thumbnail': ['audio', 'trickplay'],
+                         'audio': ['finalize'], 'trickplay': ['finalize'], 'finalize': []}
+        jobs = {job_id: Mock(spec=Job, id=job_id, dependent_ids=ids, connection=connection,
+                             dependents_key=f'dependents:{job_id}')
+                for job_id, ids in dependent_ids.items()}
+        mock_fetch_many.side_effect = lambda job_ids, connection: [jobs.get(job_id) for job_id in job_ids]
+
+        delete_dependent_jobs(jobs['probe'])
+
+        for job_id in ('thumbnail', 'audio', 'trickplay', 'finalize'):
+            jobs[job_id].delete.assert_called_once_with()
+        jobs['probe'].delete.assert_not_called()
+        connection.delete.assert_called_once_with('dependents:probe')
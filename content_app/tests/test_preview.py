@@ -0,0 +1,112 @@
+import os
+import shutil
+from unittest.mock import patch, MagicMock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from content_app.completion import is_complete
+from content_app.models import Video
+from content_app.preview import build_preview_command, get_preview_window
+from content_app.tasks import generate_preview
+
+PREVIEW_SETTINGS = {
+    'VIDEO_PREVIEW_DURATION': 4,
+    'VIDEO_PREVIEW_START': 0.25,
+    'VIDEO_PREVIEW_HEIGHT': 240,
+    'VIDEO_PREVIEW_FRAME_RATE': 15,
+    'VIDEO_PREVIEW_MAXRATE': '300k',
+}
+
+
+class PreviewClipTest(APITestCase):
+    """
+    Tests for the hover-preview clip cut from the lowest rendition.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary media root, a video and its 480p rendition.
+        """
+        self.temp_media_root = os.path.join(settings.BASE_DIR, 'test_media')
+        settings.MEDIA_ROOT = self.temp_media_root
+        os.makedirs(os.path.join(self.temp_media_root, 'videos', '480p'), exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.temp_media_root, ignore_errors=True)
+        with patch('content_app.signals.django_rq.get_queue', return_value=MagicMock()):
+            self.video = Video.objects.create(title='Test Video', description='Test Description')
+        self.rendition_path = os.path.join(self.temp_media_root, 'videos', '480p', 'movie_480p.mp4')
+        with open(self.rendition_path, 'wb') as f:
+            f.write(b'rendition')
+
+    def test_preview_window(self):
+        """
+        Tests that the clip starts past the intro and short videos are previewed from their start.
+        """
+        with self.settings(**PREVIEW_SETTINGS):
+            self.assertEqual(get_preview_window(100), (25, 4))
+            self.assertEqual(get_preview_window(5), (1, 4))
+            self.assertEqual(get_preview_window(3), (0, 3))
+            self.assertEqual(get_preview_window(None), (0, 4))
+
+    def test_command_is_silent_and_small(self):
+        """
+        Tests that the clip is seeked, silent, scaled down and capped.
+        """
+        with self.settings(**PREVIEW_SETTINGS, FFMPEG_THREADS=2):
+            ffmpeg_cmd = build_preview_command(self.rendition_path, 25, 4, '/out.mp4')
+
+        self.assertLess(ffmpeg_cmd.index('-ss'), ffmpeg_cmd.index('-i'))
+        self.assertLess(ffmpeg_cmd.index('-threads'), ffmpeg_cmd.index('-i'))
+        self.assertEqual(ffmpeg_cmd.count('-threads'), 2)
+        self.assertIn('-an', ffmpeg_cmd)
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-vf') + 1], "fps=15,scale=-2:'min(240,ih)'")
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-maxrate') + 1], '300k')
+        self.assertEqual(ffmpeg_cmd[-1], '/out.mp4')
+
+    @patch('content_app.tasks.subprocess.run')
+    def test_preview_is_cut_once(self, mock_run):
+        """
+        Tests that the clip is stored on the video and not cut again once complete.
+        """
+        def encode(ffmpeg_cmd, **kwargs):
+            with open(ffmpeg_cmd[-1], 'wb') as f:
+                f.write(b'preview')
+        mock_run.side_effect = encode
+
+        with self.settings(**PREVIEW_SETTINGS):
+            generate_preview(self.video.pk, '/uploads/movie.mp4', self.rendition_path, 100)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.preview_clip.name, os.path.join('videos', 'previews', 'movie_preview.mp4'))
+        self.assertEqual(mock_run.call_args[0][0][mock_run.call_args[0][0].index('-i') + 1], self.rendition_path)
+        self.assertTrue(is_complete(self.video.pk, 'preview'))
+
+        mock_run.reset_mock()
+        generate_preview(self.video.pk, '/uploads/movie.mp4', self.rendition_path, 100)
+        mock_run.assert_not_called()
+
+    @patch('content_app.tasks.subprocess.run')
+    def test_missing_rendition_fails(self, mock_run):
+        """
+        Tests that the stage fails (and is retried) without falling back to the source.
+        """
+        os.remove(self.rendition_path)
+
+        with self.assertRaises(FileNotFoundError):
+            generate_preview(self.video.pk, '/uploads/movie.mp4', self.rendition_path, 100)
+        mock_run.assert_not_called()
+
+    def test_serializer_exposes_the_preview_url(self):
+        """
+        Tests that the API lists the absolute URL of the preview clip.
+        """
+        self.client.force_authenticate(User.objects.create_user(username='viewer', password='password'))
+        url = reverse('video-detail', args=[self.video.pk])
+
+        self.assertIsNone(self.client.get(url).data['preview_url'])
+
+        Video.objects.filter(pk=self.video.pk).update(
+            preview_clip=os.path.join('videos', 'previews', 'movie_preview.mp4'))
+        response = self.client.get(url)
+
+        self.assertEqual(response.data['preview_url'], 'http://testserver/media/videos/previews/movie_preview.mp4')
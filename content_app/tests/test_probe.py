@@ -0,0 +1,171 @@
+import json
+import os
+import shutil
+import subprocess
+from unittest.mock import patch, Mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.conf import settings
+from content_app.models import Video
+from content_app.tasks import (
+    probe_video,
+    parse_probe_output,
+    select_resolutions,
+    get_transcode_timeout
+)
+
+PROBE_OUTPUT = {
+    'streams': [
+        {
+            'codec_type': 'video', 'codec_name': 'h264',
+            'width': 1280, 'height': 720,
+            'avg_frame_rate': '30000/1001', 'r_frame_rate': '30000/1001',
+        },
+        {
+            'codec_type': 'audio', 'codec_name': 'aac',
+            'channels': 2, 'channel_layout': 'stereo',
+        },
+    ],
+    'format': {'duration': '95.480000', 'bit_rate': '2500000'},
+}
+
+
+class ProbeOutputTest(TestCase):
+    """
+    Tests for parsing ffprobe output and deriving the work of later stages.
+    """
+
+    def test_parse_probe_output(self):
+        """
+        Tests that all metadata fields are extracted from the ffprobe JSON.
+        """
+        metadata = parse_probe_output(PROBE_OUTPUT)
+
+        self.assertEqual(metadata['duration'], 95.48)
+        self.assertEqual((metadata['width'], metadata['height']), (1280, 720))
+        self.assertAlmostEqual(metadata['frame_rate'], 29.97, places=2)
+        self.assertEqual(metadata['bitrate'], 2500000)
+        self.assertEqual((metadata['video_codec'], metadata['audio_codec']), ('h264', 'aac'))
+        self.assertEqual((metadata['audio_channels'], metadata['audio_channel_layout']), (2, 'stereo'))
+
+    def test_parse_probe_output_without_audio(self):
+        """
+        Tests that a source without an audio stream leaves the audio fields empty.
+        """
+        metadata = parse_probe_output({'streams': PROBE_OUTPUT['streams'][:1], 'format': {}})
+
+        self.assertEqual(metadata['audio_codec'], '')
+        self.assertIsNone(metadata['audio_channels'])
+        self.assertIsNone(metadata['duration'])
+
+    def test_select_resolutions_skips_upscaling(self):
+        """
+        Tests that renditions above the source height are skipped, keeping at least one.
+        """
+        self.assertEqual(select_resolutions(720), [480, 720])
+        self.assertEqual(select_resolutions(2160), [480, 720, 1080])
+        self.assertEqual(select_resolutions(360), [480])
+        self.assertEqual(select_resolutions(None), [480, 720, 1080])
+
+    def test_transcode_timeout_grows_with_duration(self):
+        """
+        Tests that short videos keep the default timeout and long ones get more time.
+        """
+        default_timeout = settings.RQ_QUEUES['default']['DEFAULT_TIMEOUT']
+        self.assertEqual(get_transcode_timeout(10, 25, [480]), default_timeout)
+        self.assertGreater(get_transcode_timeout(7200, 25, [480, 720, 1080]), default_timeout)
+
+
+@patch('content_app.tasks.build_pipeline')
+@patch('content_app.tasks.subprocess.run')
+class ProbeVideoTaskTest(TestCase):
+    """
+    Tests for the probe stage that starts the processing pipeline.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary media root and a video object.
+        """
+        self.temp_media_root = os.path.join(settings.BASE_DIR, 'test_media')
+        settings.MEDIA_ROOT = self.temp_media_root
+        os.makedirs(os.path.join(self.temp_media_root, 'videos'), exist_ok=True)
+
+        with patch('content_app.signals.django_rq.get_queue'):
+            self.video = Video.objects.create(
+                title="Probe Video",
+                video_file=os.path.join('videos', 'probe_video.mp4')
+            )
+
+    def tearDown(self):
+        """
+        Clean up the temporary media root after each test.
+        """
+        if os.path.exists(self.temp_media_root):
+            shutil.rmtree(self.temp_media_root)
+
+    @patch('content_app.tasks.measure_complexity', return_value=0.07)
+    def test_probe_stores_metadata_and_builds_pipeline(self, mock_measure, mock_subprocess_run, mock_build_pipeline):
+        """
+        Tests that the metadata and complexity are saved and handed to the pipeline builder.
+        """
+        mock_subprocess_run.return_value = Mock(stdout=json.dumps(PROBE_OUTPUT))
+
+        probe_video(self.video.pk, self.video.video_file.path)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.height, 720)
+        self.assertEqual(self.video.video_codec, 'h264')
+        self.assertEqual(self.video.duration, 95.48)
+        self.assertEqual(self.video.complexity, 0.07)
+
+        mock_build_pipeline.assert_called_once_with(
+            self.video.pk, self.video.video_file.path, {**parse_probe_output(PROBE_OUTPUT), 'complexity': 0.07},
+            depends_on=None, uploader_id=None, media_key=None
+        )
+
+    @patch('content_app.tasks.measure_complexity', side_effect=subprocess.CalledProcessError(1, 'ffmpeg'))
+    def test_failed_analysis_falls_back_to_static_ladder(self, mock_measure, mock_subprocess_run,
+                                                         mock_build_pipeline):
+        """
+        Tests that a failed trial encode does not stop the pipeline.
+        """
+        mock_subprocess_run.return_value = Mock(stdout=json.dumps(PROBE_OUTPUT))
+
+        probe_video(self.video.pk, self.video.video_file.path)
+
+        metadata = mock_build_pipeline.call_args.args[2]
+        self.assertIsNone(metadata['complexity'])
+
+    def test_probe_failure_does_not_build_pipeline(self, mock_subprocess_run, mock_build_pipeline):
+        """
+        Tests that no further stages are enqueued and the job fails (to be retried) when ffprobe fails.
+        """
+        mock_subprocess_run.side_effect = FileNotFoundError()
+
+        with self.assertRaises(FileNotFoundError):
+            probe_video(self.video.pk, self.video.video_file.path)
+
+        mock_build_pipeline.assert_not_called()
+
+
+@patch('content_app.signals.django_rq.get_queue')
+class VideoAdminMetadataTest(TestCase):
+    """
+    Tests for showing the probed metadata in the admin.
+    """
+
+    def test_change_page_shows_the_probed_metadata(self, mock_get_queue):
+        """
+        Tests that the metadata fields are rendered read-only on the change page.
+        """
+        self.client.force_login(User.objects.create_superuser(username='admin', password='password'))
+        video = Video.objects.create(title='Movie', duration=12.5, video_codec='h264', audio_codec='aac')
+
+        response = self.client.get(reverse('admin:content_app_video_change', args=[video.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Duration (s)')
+        self.assertContains(response, 'h264')
+        self.assertNotContains(response, 'name="video_codec"')
@@ -0,0 +1,123 @@
+import subprocess
+from unittest.mock import patch, MagicMock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+from content_app.progress import get_progress_key, parse_progress_block, run_ffmpeg
+from content_app.pipeline import get_video_status
+
+User = get_user_model()
+
+PROGRESS_OUTPUT = [
+    'frame=250\n', 'fps=50.0\n', 'out_time_us=10000000\n', 'speed=2.00x\n', 'progress=continue\n',
+    'frame=500\n', 'fps=49.5\n', 'out_time_us=20000000\n', 'speed=1.98x\n', 'progress=end\n',
+]
+
+
+def mock_popen(lines, returncode=0):
+    """
+    Returns a Popen mock whose process writes the given lines to stdout.
+    """
+    process = MagicMock()
+    process.stdout = iter(lines)
+    process.returncode = returncode
+    process.__enter__.return_value = process
+    return MagicMock(return_value=process)
+
+
+@patch('content_app.progress.cache')
+class RunFFmpegTest(TestCase):
+    """
+    Tests for running FFmpeg with live progress reporting.
+    """
+
+    def test_parse_progress_block(self, mock_cache):
+        """
+        Tests that percent, fps and speed are derived from a progress block.
+        """
+        block = {'out_time_us': '30000000', 'fps': '24.5', 'speed': '1.5x'}
+        self.assertEqual(parse_progress_block(block, 120), {'percent': 25.0, 'fps': 24.5, 'speed': 1.5})
+        self.assertEqual(parse_progress_block({'out_time_us': 'N/A', 'speed': 'N/A'}, 120),
+                         {'percent': None, 'fps': None, 'speed': None})
+
+    def test_run_ffmpeg_publishes_progress(self, mock_cache):
+        """
+        Tests that every progress block is published and the run ends at 100 percent.
+        """
+        with patch('content_app.progress.subprocess.Popen', mock_popen(PROGRESS_OUTPUT)) as popen:
+            run_ffmpeg(['ffmpeg', '-i', 'in.mp4', 'out.mp4'], 3, 'transcode', 40)
+
+        popen.assert_called_once_with(
+            ['ffmpeg', '-progress', 'pipe:1', '-nostats', '-i', 'in.mp4', 'out.mp4'], stdout=subprocess.PIPE, text=True
+        )
+        published = [c.args[1] for c in mock_cache.set.call_args_list]
+        self.assertTrue(all(c.args[0] == get_progress_key(3, 'transcode') for c in mock_cache.set.call_args_list))
+        self.assertEqual([p['percent'] for p in published], [0.0, 25.0, 50.0, 100.0])
+        self.assertEqual(published[-1]['fps'], 49.5)
+        self.assertFalse(published[-1]['failed'])
+
+    def test_run_ffmpeg_raises_on_error(self, mock_cache):
+        """
+        Tests that a failing FFmpeg run is published as failed and raises like subprocess.run.
+        """
+        with patch('content_app.progress.subprocess.Popen', mock_popen(PROGRESS_OUTPUT[:5], returncode=1)):
+            with self.assertRaises(subprocess.CalledProcessError):
+                run_ffmpeg(['ffmpeg', '-i', 'in.mp4', 'out.mp4'], 3, 'hls_480p', 40)
+
+        self.assertTrue(mock_cache.set.call_args_list[-1].args[1]['failed'])
+
+
+class VideoStatusTest(APITestCase):
+    """
+    Tests for the status of a video's processing pipeline.
+    """
+
+    @patch('content_app.pipeline.get_progress')
+    @patch('content_app.pipeline.get_pipeline_status')
+    def test_get_video_status_combines_jobs_and_progress(self, mock_pipeline_status, mock_get_progress):
+        """
+        Tests that chunk progress is summarized per rendition and packaged renditions are ready.
+        """
+        mock_pipeline_status.return_value = {
+            'chunk_0000': 'finished', 'chunk_0001': 'started', 'concat': 'deferred',
+            'hls_480p': 'finished', 'hls_720p': 'deferred',
+        }
+        mock_get_progress.return_value = {
+            'chunk_0000': {'percent': 100.0, 'fps': 40.0, 'speed': 1.6},
+            'chunk_0001': {'percent': 50.0, 'fps': 30.0, 'speed': 1.2},
+        }
+
+        video_status = get_video_status(1)
+
+        self.assertEqual(video_status['stages']['chunk_0001'], {'status': 'started', 'percent': 50.0, 'fps': 30.0, 'speed': 1.2})
+        self.assertEqual(video_status['renditions'], {
+            '480p': {'percent': 75.0, 'fps': 30.0, 'speed': 1.2, 'ready': True},
+            '720p': {'percent': 75.0, 'fps': 30.0, 'speed': 1.2, 'ready': False},
+        })
+
+    @patch('content_app.api.views.get_video_status')
+    def test_status_view(self, mock_get_video_status):
+        """
+        Tests that the status endpoint returns the pipeline state to authenticated users.
+        """
+        mock_get_video_status.return_value = {'stages': {'probe': {'status': 'finished'}}, 'renditions': {}}
+        self.client.force_authenticate(User.objects.create_user(username='viewer', password='secret'))
+
+        response = self.client.get('/api/video/1/status/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stages'], {'probe': {'status': 'finished'}})
+        mock_get_video_status.assert_called_once_with(1)
+
+    @patch('content_app.api.views.get_video_status')
+    def test_status_view_unknown_video(self, mock_get_video_status):
+        """
+        Tests that the status endpoint returns 404 for videos that do not exist.
+        """
+        mock_get_video_status.return_value = {'stages': {}, 'renditions': {}}
+        self.client.force_authenticate(User.objects.create_user(username='viewer', password='secret'))
+
+        response = self.client.get('/api/video/999/status/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
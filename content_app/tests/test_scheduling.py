@@ -0,0 +1,192 @@
+from unittest.mock import Mock, patch
+from django.test import TestCase
+from content_app.scheduling import (
+    ENCODE_SPEED_KEY,
+    PENDING_COST_MAX_AGE,
+    TRANSCODE_BACKLOG_KEY,
+    add_transcode_backlog,
+    get_encode_speed,
+    get_pending_cost,
+    get_uploader_cost_key,
+    get_worker_queues,
+    record_encode_speed,
+    release_transcode_cost,
+    select_encoder_preset,
+    select_transcode_queue
+)
+
+TRANSCODE_QUEUES = [('transcode_short', 600), ('transcode_medium', 3600), ('transcode_long', None)]
+
+
+class SelectTranscodeQueueTest(TestCase):
+    """
+    Tests for the shortest-job-first queue selection.
+    """
+
+    def test_queue_is_selected_by_estimated_cost(self):
+        """
+        Tests that short encodes get a higher-priority queue than long ones.
+        """
+        with self.settings(VIDEO_TRANSCODE_QUEUES=TRANSCODE_QUEUES):
+            self.assertEqual(select_transcode_queue(1, 60), 'transcode_short')
+            self.assertEqual(select_transcode_queue(1, 1200), 'transcode_medium')
+            self.assertEqual(select_transcode_queue(1, 50000), 'transcode_long')
+
+    def test_pending_work_of_the_uploader_is_added(self):
+        """
+        Tests that an uploader with a backlog is scheduled behind other users.
+        """
+        connection = Mock()
+        connection.zrangebyscore.return_value = []
+        connection.hgetall.return_value = {b'3': b'3000', b'4': b'600'}
+
+        with self.settings(VIDEO_TRANSCODE_QUEUES=TRANSCODE_QUEUES):
+            queue_name = select_transcode_queue(5, 60, uploader_id=7, connection=connection)
+
+        self.assertEqual(queue_name, 'transcode_long')
+        connection.hset.assert_called_once_with(get_uploader_cost_key(7), 5, 60)
+
+    def test_retried_video_replaces_its_own_cost(self):
+        """
+        Tests that the earlier estimate of the same video is neither counted nor added to.
+        """
+        connection = Mock()
+        connection.zrangebyscore.return_value = []
+        connection.hgetall.return_value = {b'5': b'3600'}
+
+        with self.settings(VIDEO_TRANSCODE_QUEUES=TRANSCODE_QUEUES):
+            queue_name = select_transcode_queue(5, 60, uploader_id=7, connection=connection)
+
+        self.assertEqual(queue_name, 'transcode_short')
+        connection.hset.assert_called_once_with(get_uploader_cost_key(7), 5, 60)
+
+    def test_release_removes_the_cost(self):
+        """
+        Tests that finished videos are removed from the uploader's pending cost.
+        """
+        connection = Mock()
+
+        release_transcode_cost(5, uploader_id=7, connection=connection)
+
+        connection.hdel.assert_called_once_with(get_uploader_cost_key(7), 5)
+        connection.zrem.assert_called_once_with(get_uploader_cost_key(7) + ':since', 5)
+
+    @patch('content_app.scheduling.time.time', return_value=100000.0)
+    def test_stale_costs_are_trimmed(self, mock_time):
+        """
+        Tests that estimates older than PENDING_COST_MAX_AGE are removed instead of counted.
+        """
+        connection = Mock()
+        connection.zrangebyscore.return_value = [b'3']
+        connection.hgetall.return_value = {b'4': b'600'}
+
+        self.assertEqual(get_pending_cost(TRANSCODE_BACKLOG_KEY, connection), 600)
+
+        connection.zrangebyscore.assert_called_once_with(TRANSCODE_BACKLOG_KEY + ':since', '-inf',
+                                                         100000.0 - PENDING_COST_MAX_AGE)
+        connection.hdel.assert_called_once_with(TRANSCODE_BACKLOG_KEY, b'3')
+        connection.zrem.assert_called_once_with(TRANSCODE_BACKLOG_KEY + ':since', b'3')
+
+    @patch('content_app.scheduling.time.time', return_value=100000.0)
+    def test_backlog_is_stored_per_video(self, mock_time):
+        """
+        Tests that adding a video to the backlog records its estimate and when it was added.
+        """
+        connection = Mock()
+
+        add_transcode_backlog(5, 600, connection=connection)
+
+        connection.hset.assert_called_once_with(TRANSCODE_BACKLOG_KEY, 5, 600)
+        connection.zadd.assert_called_once_with(TRANSCODE_BACKLOG_KEY + ':since', {5: 100000.0})
+
+    def test_worker_queues_start_with_fast_jobs(self):
+        """
+        Tests the priority order workers listen to.
+        """
+        with self.settings(VIDEO_TRANSCODE_QUEUES=TRANSCODE_QUEUES):
+            self.assertEqual(get_worker_queues(),
+                             ['fast', 'transcode_short', 'transcode_medium', 'transcode_long', 'default'])
+
+
+PRESETS = [('medium', 1.0), ('fast', 1.4), ('veryfast', 2.5)]
+ESTIMATES = {'medium': 600, 'fast': 430, 'veryfast': 240}
+
+
+@patch('content_app.scheduling.Worker.count', return_value=2)
+class SelectEncoderPresetTest(TestCase):
+    """
+    Tests for trading encode efficiency for latency under load.
+    """
+
+    def select(self, backlog, parallelism=1):
+        """
+        Selects a preset for a backlog of the given encode seconds.
+        """
+        connection = Mock()
+        connection.zrangebyscore.return_value = []
+        connection.hgetall.return_value = {b'1': str(backlog).encode()} if backlog else {}
+        with self.settings(VIDEO_ENCODE_PRESETS=PRESETS, VIDEO_TIME_TO_PLAYABLE=900):
+            return select_encoder_preset(ESTIMATES, parallelism, connection=connection)
+
+    def test_idle_queue_uses_the_efficient_preset(self, mock_count):
+        """
+        Tests that the slowest, most efficient preset is used when nothing is queued.
+        """
+        self.assertEqual(self.select(0), 'medium')
+
+    def test_backlog_selects_faster_presets(self, mock_count):
+        """
+        Tests that a growing backlog switches to faster presets.
+        """
+        self.assertEqual(self.select(800), 'fast')
+        self.assertEqual(self.select(1200), 'veryfast')
+
+    def test_fastest_preset_when_the_target_cannot_be_met(self, mock_count):
+        """
+        Tests that the fastest preset is used when no preset meets the target.
+        """
+        self.assertEqual(self.select(100000), 'veryfast')
+
+    def test_chunked_encodes_are_shared_by_the_workers(self, mock_count):
+        """
+        Tests that chunked encodes are expected to finish sooner on several workers.
+        """
+        self.assertEqual(self.select(1000, parallelism=1), 'veryfast')
+        self.assertEqual(self.select(1000, parallelism=4), 'medium')
+
+
+class EncodeSpeedTest(TestCase):
+    """
+    Tests for recording the measured encode speed.
+    """
+
+    def test_first_measurement_is_stored(self):
+        """
+        Tests that the first speed of a preset and resolutions is stored as is.
+        """
+        connection = Mock()
+        connection.hget.return_value = None
+
+        record_encode_speed('fast', [720, 480], 120.0, connection=connection)
+
+        connection.hset.assert_called_once_with(ENCODE_SPEED_KEY, 'fast:480,720', 120.0)
+
+    def test_measurements_are_smoothed(self):
+        """
+        Tests that further speeds update a moving average.
+        """
+        connection = Mock()
+        connection.hget.return_value = b'100'
+
+        record_encode_speed('fast', [480], 200.0, connection=connection)
+
+        self.assertAlmostEqual(connection.hset.call_args.args[2], 130.0)
+
+    def test_unmeasured_speed(self):
+        """
+        Tests that unmeasured combinations have no speed.
+        """
+        connection = Mock()
+        connection.hget.return_value = None
+
+        self.assertIsNone(get_encode_speed('medium', [480], connection=connection))
@@ -1,15 +1,14 @@
 import os
 import shutil
-from unittest.mock import patch, Mock, call
+from unittest.mock import patch, Mock, MagicMock, call
+from django.db import transaction
 from django.test import TestCase
+from rq import Queue
 from django.conf import settings
+from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from content_app.models import Video
-from content_app.tasks import (
-    generate_thumbnail,
-    generate_hls_playlist,
-    convert_video_and_update_model
-)
+from content_app.tasks import probe_video
 
 
 @patch('content_app.signals.delete_file')
@@ -90,27 +89,105 @@ class TestVideoPostSaveSignal(TestCase):
         if os.path.exists(self.temp_media_root):
             shutil.rmtree(self.temp_media_root)
 
-    def test_video_post_save_new_video(self, mock_get_queue):
+    def get_mock_queue(self, mock_get_queue):
         """
-        Tests that the conversion tasks are enqueued when a new video with a file is created.
+        Returns a queue mock that prepares real job data and records the batches it enqueues.
         """
-        mock_queue = Mock()
+        mock_queue = MagicMock()
+        mock_queue.prepare_data = Queue.prepare_data
+        mock_queue.enqueue_many.side_effect = lambda job_datas, pipeline: [Mock(id=f'job-{i}') for i, _ in enumerate(job_datas)]
         mock_get_queue.return_value = mock_queue
+        return mock_queue
 
+    def get_enqueued_batches(self, mock_queue):
+        """
+        Returns the (func, args) pairs of every batch sent to enqueue_many.
+        """
+        return [
+            [(job_data.func, job_data.args) for job_data in batch_call.args[0]]
+            for batch_call in mock_queue.enqueue_many.call_args_list
+        ]
+
+    def test_video_post_save_new_video(self, mock_get_queue):
+        """
+        Tests that the processing pipeline is started when a new video with a file is created.
+        """
+        mock_queue = self.get_mock_queue(mock_get_queue)
+
+        uploader = User.objects.create_user(username='uploader', password='password')
         dummy_file = SimpleUploadedFile("dummy.mp4", b"dummy content", content_type="video/mp4")
-        video = Video.objects.create(title="Test Video", description="A Test", video_file=dummy_file)
+        with self.captureOnCommitCallbacks(execute=True):
+            video = Video.objects.create(title="Test Video", description="A Test", video_file=dummy_file,
+                                         uploaded_by=uploader)
 
-        expected_calls = [
-            call.enqueue(generate_thumbnail, video.pk),
-            call.enqueue(convert_video_and_update_model, video.pk, 480),
-            call.enqueue(convert_video_and_update_model, video.pk, 720),
-            call.enqueue(convert_video_and_update_model, video.pk, 1080),
-            call.enqueue(generate_hls_playlist, video.pk, 480),
-            call.enqueue(generate_hls_playlist, video.pk, 720),
-            call.enqueue(generate_hls_playlist, video.pk, 1080),
-        ]
-        
-        mock_queue.assert_has_calls(expected_calls, any_order=True)
+        mock_get_queue.assert_called_with('fast')
+        self.assertEqual(self.get_enqueued_batches(mock_queue),
+                         [[(probe_video, (video.pk, video.video_file.path, uploader.pk, video.content_hash))]])
+        mock_queue.connection.pipeline.return_value.__enter__.return_value.execute.assert_called_once()
+
+    def test_video_post_save_waits_for_commit(self, mock_get_queue):
+        """
+        Tests that nothing is sent to Redis before the transaction commits.
+        """
+        mock_queue = self.get_mock_queue(mock_get_queue)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Video.objects.create(title="Test Video", video_file=os.path.join('videos', 'movie.mp4'))
+
+        mock_queue.enqueue_many.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+
+    def test_videos_created_in_one_transaction_are_enqueued_as_one_batch(self, mock_get_queue):
+        """
+        Tests that several videos created in one transaction share a single batch.
+        """
+        mock_queue = self.get_mock_queue(mock_get_queue)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                videos = [
+                    Video.objects.create(title=f"Video {i}", video_file=os.path.join('videos', f'movie_{i}.mp4'))
+                    for i in range(3)
+                ]
+
+        self.assertEqual(self.get_enqueued_batches(mock_queue), [
+            [(probe_video, (video.pk, video.video_file.path, None, str(video.pk))) for video in videos]
+        ])
+
+    def test_videos_of_nested_savepoints_share_the_batch(self, mock_get_queue):
+        """
+        Tests that videos created in savepoints are sent with the rest of their transaction.
+        """
+        mock_queue = self.get_mock_queue(mock_get_queue)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first_video = Video.objects.create(title="First", video_file=os.path.join('videos', 'first.mp4'))
+            with transaction.atomic():
+                second_video = Video.objects.create(title="Second", video_file=os.path.join('videos', 'second.mp4'))
+
+        self.assertEqual(self.get_enqueued_batches(mock_queue), [[
+            (probe_video, (first_video.pk, first_video.video_file.path, None, str(first_video.pk))),
+            (probe_video, (second_video.pk, second_video.video_file.path, None, str(second_video.pk))),
+        ]])
+
+    def test_rolled_back_videos_are_not_enqueued(self, mock_get_queue):
+        """
+        Tests that videos created in a rolled back savepoint never reach the queue.
+        """
+        mock_queue = self.get_mock_queue(mock_get_queue)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            kept_video = Video.objects.create(title="Kept", video_file=os.path.join('videos', 'kept.mp4'))
+            try:
+                with transaction.atomic():
+                    Video.objects.create(title="Dropped", video_file=os.path.join('videos', 'dropped.mp4'))
+                    raise RuntimeError()
+            except RuntimeError:
+                pass
+
+        self.assertEqual(self.get_enqueued_batches(mock_queue), [
+            [(probe_video, (kept_video.pk, kept_video.video_file.path, None, str(kept_video.pk)))]
+        ])
 
     def test_video_post_save_no_file(self, mock_get_queue):
         """
@@ -119,6 +196,8 @@ class TestVideoPostSaveSignal(TestCase):
         mock_queue = Mock()
         mock_get_queue.return_value = mock_queue
 
-        Video.objects.create(title="Video without filefield")
+        with self.captureOnCommitCallbacks(execute=True):
+            Video.objects.create(title="Video without filefield")
 
         mock_queue.enqueue.assert_not_called()
+        mock_queue.enqueue_many.assert_not_called()
@@ -0,0 +1,143 @@
+import os
+import shutil
+import subprocess
+from unittest.mock import patch, MagicMock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from content_app.completion import is_complete
+from content_app.models import Video
+from content_app.tasks import build_thumbnail_command, build_webp_command, generate_thumbnail, get_thumbnail_sizes
+
+THUMBNAIL_SETTINGS = {
+    'VIDEO_THUMBNAIL_WIDTHS': [320, 640, 1280],
+    'VIDEO_THUMBNAIL_CANDIDATES': 50,
+}
+
+
+class ThumbnailTest(APITestCase):
+    """
+    Tests for the representative thumbnail and its responsive sizes.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary media root and a video.
+        """
+        self.temp_media_root = os.path.join(settings.BASE_DIR, 'test_media')
+        settings.MEDIA_ROOT = self.temp_media_root
+        os.makedirs(self.temp_media_root, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.temp_media_root, ignore_errors=True)
+        with patch('content_app.signals.django_rq.get_queue', return_value=MagicMock()):
+            self.video = Video.objects.create(title='Test Video', description='Test Description')
+
+    def test_sizes_are_never_wider_than_the_source(self):
+        """
+        Tests that widths above the source collapse into one size of the source width.
+        """
+        with self.settings(**THUMBNAIL_SETTINGS):
+            sizes = get_thumbnail_sizes('movie', 854)
+
+        self.assertEqual([size['width'] for size in sizes], [320, 640, 854])
+        self.assertEqual(sizes[0], {
+            'width': 320,
+            'jpeg': os.path.join('thumbnails', 'movie_thumbnail_320.jpg'),
+            'webp': os.path.join('thumbnails', 'movie_thumbnail_320.webp'),
+        })
+
+    def test_command_selects_one_frame_for_all_sizes(self):
+        """
+        Tests that one representative keyframe is chosen and encoded in every size and format.
+        """
+        with self.settings(**THUMBNAIL_SETTINGS, FFMPEG_THREADS=2):
+            ffmpeg_cmd = build_thumbnail_command('/in.mp4', get_thumbnail_sizes('movie'))
+
+        self.assertEqual(ffmpeg_cmd.count('-i'), 1)
+        self.assertLess(ffmpeg_cmd.index('-threads'), ffmpeg_cmd.index('-i'))
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-filter_complex_threads') + 1], '2')
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-skip_frame') + 1], 'nokey')
+        filter_graph = ffmpeg_cmd[ffmpeg_cmd.index('-filter_complex') + 1]
+        self.assertIn("scale='min(1280,iw)':-2,thumbnail=50,split=3[t0][t1][t2]", filter_graph)
+        self.assertIn('[t2]scale=1280:-2[j2]', filter_graph)
+        self.assertEqual(ffmpeg_cmd.count('-frames:v'), 3)
+        self.assertNotIn('libwebp', ffmpeg_cmd)
+        self.assertEqual(ffmpeg_cmd[-1], os.path.join(self.temp_media_root, 'thumbnails', 'movie_thumbnail_1280.jpg'))
+
+    def test_webp_is_converted_from_the_jpegs(self):
+        """
+        Tests that the WebP images are encoded from the JPEGs by a command of their own.
+        """
+        with self.settings(**THUMBNAIL_SETTINGS):
+            ffmpeg_cmd = build_webp_command(get_thumbnail_sizes('movie', 640))
+
+        thumbnails_dir = os.path.join(self.temp_media_root, 'thumbnails')
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-i') + 1], os.path.join(thumbnails_dir, 'movie_thumbnail_320.jpg'))
+        self.assertEqual(ffmpeg_cmd.count('libwebp'), 2)
+        self.assertEqual(ffmpeg_cmd[-1], os.path.join(thumbnails_dir, 'movie_thumbnail_640.webp'))
+
+    @patch('content_app.tasks.subprocess.run')
+    def test_sizes_are_stored_on_the_video(self, mock_run):
+        """
+        Tests that the largest JPEG becomes the thumbnail URL and all sizes are stored.
+        """
+        def render(ffmpeg_cmd, **kwargs):
+            for argument in ffmpeg_cmd:
+                if argument.endswith(('.jpg', '.webp')):
+                    with open(argument, 'wb') as f:
+                        f.write(b'image')
+        mock_run.side_effect = render
+
+        with self.settings(**THUMBNAIL_SETTINGS):
+            generate_thumbnail(self.video.pk, '/videos/movie.mp4', 640)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.thumbnail_url, os.path.join('thumbnails', 'movie_thumbnail_640.jpg'))
+        self.assertEqual([size['width'] for size in self.video.thumbnail_sizes], [320, 640])
+        self.assertTrue(is_complete(self.video.pk, 'thumbnail'))
+
+        mock_run.reset_mock()
+        with self.settings(**THUMBNAIL_SETTINGS):
+            generate_thumbnail(self.video.pk, '/videos/movie.mp4', 640)
+        mock_run.assert_not_called()
+
+    @patch('content_app.tasks.subprocess.run')
+    def test_missing_webp_encoder_keeps_the_jpegs(self, mock_run):
+        """
+        Tests that a failed WebP conversion still stores the JPEG sizes without WebP images.
+        """
+        def render(ffmpeg_cmd, **kwargs):
+            if 'libwebp' in ffmpeg_cmd:
+                raise subprocess.CalledProcessError(1, ffmpeg_cmd, stderr=b"Unknown encoder 'libwebp'")
+            for argument in ffmpeg_cmd:
+                if argument.endswith('.jpg'):
+                    with open(argument, 'wb') as f:
+                        f.write(b'image')
+        mock_run.side_effect = render
+
+        with self.settings(**THUMBNAIL_SETTINGS):
+            generate_thumbnail(self.video.pk, '/videos/movie.mp4', 640)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.thumbnail_url, os.path.join('thumbnails', 'movie_thumbnail_640.jpg'))
+        self.assertEqual([size['webp'] for size in self.video.thumbnail_sizes], [None, None])
+        self.assertTrue(is_complete(self.video.pk, 'thumbnail'))
+
+        self.client.force_authenticate(User.objects.create_user(username='viewer', password='password'))
+        thumbnails = self.client.get(reverse('video-detail', args=[self.video.pk])).data['thumbnails']
+        self.assertIsNone(thumbnails['webp'])
+        self.assertIn('movie_thumbnail_640.jpg 640w', thumbnails['jpeg'])
+
+    def test_serializer_lists_the_srcsets(self):
+        """
+        Tests that the API lists the JPEG and WebP srcset of the thumbnail.
+        """
+        self.client.force_authenticate(User.objects.create_user(username='viewer', password='password'))
+        Video.objects.filter(pk=self.video.pk).update(thumbnail_sizes=get_thumbnail_sizes('movie', 640))
+
+        response = self.client.get(reverse('video-detail', args=[self.video.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['thumbnails']['webp'],
+                         'http://testserver/media/thumbnails/movie_thumbnail_320.webp 320w, '
+                         'http://testserver/media/thumbnails/movie_thumbnail_640.webp 640w')
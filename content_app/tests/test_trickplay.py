@@ -0,0 +1,112 @@
+import os
+import shutil
+from unittest.mock import patch, MagicMock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from content_app.completion import is_complete
+from content_app.models import Video
+from content_app.tasks import generate_trickplay
+from content_app.trickplay import build_trickplay_command, format_timestamp, get_thumbnail_size
+
+TRICKPLAY_SETTINGS = {
+    'VIDEO_TRICKPLAY_INTERVAL': 10,
+    'VIDEO_TRICKPLAY_WIDTH': 160,
+    'VIDEO_TRICKPLAY_COLUMNS': 2,
+    'VIDEO_TRICKPLAY_ROWS': 2,
+}
+
+
+class TrickplayTest(APITestCase):
+    """
+    Tests for the sprite sheets and WebVTT index of the scrub bar previews.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary media root and a video.
+        """
+        self.temp_media_root = os.path.join(settings.BASE_DIR, 'test_media')
+        settings.MEDIA_ROOT = self.temp_media_root
+        os.makedirs(self.temp_media_root, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.temp_media_root, ignore_errors=True)
+        with patch('content_app.signals.django_rq.get_queue', return_value=MagicMock()):
+            self.video = Video.objects.create(title='Test Video', description='Test Description')
+        self.trickplay_dir = os.path.join(self.temp_media_root, 'hls', str(self.video.pk), 'trickplay')
+
+    def test_thumbnail_keeps_the_aspect_ratio(self):
+        """
+        Tests that thumbnails have the configured width and an even height.
+        """
+        with self.settings(**TRICKPLAY_SETTINGS):
+            self.assertEqual(get_thumbnail_size(1920, 1080), (160, 90))
+            self.assertEqual(get_thumbnail_size(1080, 1920), (160, 284))
+            self.assertEqual(get_thumbnail_size(None, None), (160, 90))
+
+    def test_command_decodes_keyframes_only(self):
+        """
+        Tests that all sheets are rendered in one pass over the keyframes.
+        """
+        with self.settings(**TRICKPLAY_SETTINGS, FFMPEG_THREADS=2):
+            ffmpeg_cmd = build_trickplay_command('/in.mp4', '/out', (160, 90))
+
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-skip_frame') + 1], 'nokey')
+        self.assertLess(ffmpeg_cmd.index('-threads'), ffmpeg_cmd.index('-i'))
+        self.assertEqual(ffmpeg_cmd.count('-threads'), 2)
+        self.assertEqual(ffmpeg_cmd[ffmpeg_cmd.index('-vf') + 1], 'fps=1/10,scale=160:90,tile=2x2')
+        self.assertEqual(ffmpeg_cmd[-1], '/out/sprite_%03d.jpg')
+
+    def test_timestamps(self):
+        """
+        Tests the WebVTT timestamp format.
+        """
+        self.assertEqual(format_timestamp(3723.5), '01:02:03.500')
+        self.assertEqual(format_timestamp(0), '00:00:00.000')
+
+    @patch('content_app.tasks.subprocess.run')
+    def test_sprites_and_index_are_generated(self, mock_run):
+        """
+        Tests that every interval of the video is mapped to its tile in the sprite sheets.
+        """
+        def render(ffmpeg_cmd, **kwargs):
+            for index in range(2):
+                with open(ffmpeg_cmd[-1] % index, 'wb') as f:
+                    f.write(b'jpeg')
+        mock_run.side_effect = render
+        metadata = {'duration': 45.0, 'width': 1920, 'height': 1080}
+
+        with self.settings(**TRICKPLAY_SETTINGS):
+            generate_trickplay(self.video.pk, '/in.mp4', metadata)
+
+        with open(os.path.join(self.trickplay_dir, 'index.vtt')) as f:
+            cues = f.read().rstrip('\n').split('\n\n')
+        self.assertEqual(cues[0], 'WEBVTT')
+        self.assertEqual(cues[1], '00:00:00.000 --> 00:00:10.000\nsprite_000.jpg#xywh=0,0,160,90')
+        self.assertEqual(cues[4], '00:00:30.000 --> 00:00:40.000\nsprite_000.jpg#xywh=160,90,160,90')
+        self.assertEqual(cues[5], '00:00:40.000 --> 00:00:45.000\nsprite_001.jpg#xywh=0,0,160,90')
+        self.assertTrue(is_complete(self.video.pk, 'trickplay'))
+
+        mock_run.reset_mock()
+        generate_trickplay(self.video.pk, '/in.mp4', metadata)
+        mock_run.assert_not_called()
+
+    def test_trickplay_view(self):
+        """
+        Tests that the index and the sprite sheets are served with their content types.
+        """
+        self.client.force_authenticate(User.objects.create_user(username='viewer', password='password'))
+        os.makedirs(self.trickplay_dir)
+        for filename in ('index.vtt', 'sprite_000.jpg'):
+            with open(os.path.join(self.trickplay_dir, filename), 'w') as f:
+                f.write('WEBVTT\n')
+
+        for filename, content_type in (('index.vtt', 'text/vtt'), ('sprite_000.jpg', 'image/jpeg')):
+            response = self.client.get(reverse('trickplay', args=[self.video.pk, filename]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], content_type)
+
+        self.assertEqual(self.client.get(reverse('trickplay', args=[self.video.pk, 'sprite_001.jpg'])).status_code,
+                         404)
+        self.assertEqual(self.client.get(reverse('trickplay', args=[self.video.pk, 'index.m3u8'])).status_code,
+                         404)
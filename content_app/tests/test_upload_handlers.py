@@ -0,0 +1,176 @@
+import hashlib
+import os
+import shutil
+from unittest.mock import patch, MagicMock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+from content_app.api.views import FileUploadView
+from content_app.models import FileUpload, Video
+from content_app.upload_handlers import REJECTED_UPLOAD_MESSAGE, install_upload_handler, sniff_container
+
+MP4_CONTENT = b'\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom' + b'\x00' * 1000
+MKV_CONTENT = b'\x1a\x45\xdf\xa3' + b'\x00' * 1000
+TS_CONTENT = (b'\x47' + b'\xff' * 187) * 4
+
+
+class ContainerSniffingTest(TestCase):
+    """
+    Tests for recognising the container of an upload from its first bytes.
+    """
+
+    def test_supported_containers(self):
+        """
+        Tests that common video containers are recognised.
+        """
+        self.assertEqual(sniff_container(MP4_CONTENT[:512]), 'mp4')
+        self.assertEqual(sniff_container(MKV_CONTENT[:512]), 'matroska')
+        self.assertEqual(sniff_container(TS_CONTENT[:512]), 'mpegts')
+        self.assertEqual(sniff_container(b'RIFF\x00\x00\x00\x00AVI LIST'), 'avi')
+
+    def test_unsupported_or_corrupt_headers(self):
+        """
+        Tests that other files and broken MP4 boxes are rejected.
+        """
+        self.assertIsNone(sniff_container(b'%PDF-1.7' + b'\x00' * 504))
+        self.assertIsNone(sniff_container(b'\x00\x00\x00\x04ftypmp42' + b'\x00' * 500))
+        self.assertIsNone(sniff_container(b''))
+
+
+@patch('content_app.signals.django_rq.get_queue')
+class ContentHashUploadHandlerTest(TestCase):
+    """
+    Tests for hashing and checking uploads while they are received.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary media root and an admin user.
+        """
+        self.temp_media_root = os.path.join(settings.BASE_DIR, 'test_media')
+        settings.MEDIA_ROOT = self.temp_media_root
+        os.makedirs(self.temp_media_root, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.temp_media_root, ignore_errors=True)
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+
+    def post(self, field_name, content, filename='movie.mp4', install=True):
+        """
+        Builds a multipart request with one file and parses it, with the
+        handler installed for the video_file field unless `install` is False.
+        """
+        request = RequestFactory().post('/upload/', {field_name: SimpleUploadedFile(filename, content)})
+        if install:
+            install_upload_handler(request, ['video_file'])
+        request.FILES
+        self.addCleanup(request.close)
+        return request
+
+    def test_upload_is_hashed_while_received(self, mock_get_queue):
+        """
+        Tests that the checksum and container are attached to the uploaded file.
+        """
+        request = self.post('video_file', MP4_CONTENT)
+
+        uploaded_file = request.FILES['video_file']
+        self.assertEqual(uploaded_file.content_hash, hashlib.sha256(MP4_CONTENT).hexdigest())
+        self.assertEqual(uploaded_file.container, 'mp4')
+        self.assertFalse(hasattr(request, 'rejected_uploads'))
+
+    def test_video_is_stored_without_reading_the_source_again(self, mock_get_queue):
+        """
+        Tests that the checksum of the handler is used as the content hash.
+        """
+        mock_get_queue.return_value = MagicMock()
+        request = self.post('video_file', MP4_CONTENT)
+
+        with patch('content_app.models.get_content_hash') as mock_get_content_hash:
+            video = Video.objects.create(title='Movie', video_file=request.FILES['video_file'])
+
+        mock_get_content_hash.assert_not_called()
+        self.assertEqual(video.content_hash, hashlib.sha256(MP4_CONTENT).hexdigest())
+
+    def test_unsupported_file_is_dropped(self, mock_get_queue):
+        """
+        Tests that a file without a video container is dropped with the reason.
+        """
+        request = self.post('video_file', b'%PDF-1.7' + b'\x00' * 2000)
+
+        self.assertNotIn('video_file', request.FILES)
+        self.assertEqual(request.rejected_uploads, {'video_file': REJECTED_UPLOAD_MESSAGE})
+
+    def test_oversized_file_is_dropped_while_received(self, mock_get_queue):
+        """
+        Tests that a file is dropped as soon as it exceeds VIDEO_UPLOAD_MAX_SIZE.
+        """
+        with self.settings(VIDEO_UPLOAD_MAX_SIZE=512):
+            request = self.post('video_file', MP4_CONTENT)
+
+        self.assertNotIn('video_file', request.FILES)
+        self.assertIn('512 bytes', request.rejected_uploads['video_file'])
+
+    def test_other_fields_are_not_checked(self, mock_get_queue):
+        """
+        Tests that uploads of other fields are only hashed.
+        """
+        request = self.post('attachment', b'plain text', filename='notes.txt')
+
+        self.assertIsNone(request.FILES['attachment'].container)
+
+    def test_other_requests_keep_the_default_handlers(self, mock_get_queue):
+        """
+        Tests that uploads outside the video views are neither hashed nor checked.
+        """
+        request = self.post('video_file', b'%PDF-1.7' + b'\x00' * 2000, install=False)
+
+        self.assertFalse(hasattr(request.FILES['video_file'], 'content_hash'))
+        self.assertFalse(hasattr(request, 'rejected_uploads'))
+
+    def test_file_upload_view_reports_the_rejection(self, mock_get_queue):
+        """
+        Tests that the upload API answers with the reason and stores nothing.
+        """
+        request = RequestFactory().post('/upload/', {'file': SimpleUploadedFile('notes.txt', b'not a video')})
+
+        response = FileUploadView.as_view()(request)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'file': [REJECTED_UPLOAD_MESSAGE]})
+        self.assertEqual(FileUpload.objects.count(), 0)
+
+    def test_admin_reports_the_rejection(self, mock_get_queue):
+        """
+        Tests that the admin form shows the reason and creates no video.
+        """
+        self.client.force_login(self.admin)
+
+        response = self.client.post(reverse('admin:content_app_video_add'), {
+            'title': 'Movie', 'description': 'A movie', 'category': 'drama',
+            'video_file': SimpleUploadedFile('movie.mp4', b'not a video'),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['adminform'].form.errors['video_file'], [REJECTED_UPLOAD_MESSAGE])
+        self.assertEqual(Video.objects.count(), 0)
+        mock_get_queue.assert_not_called()
+
+    def test_admin_checks_csrf_after_installing_the_handler(self, mock_get_queue):
+        """
+        Tests that the admin still rejects a POST without CSRF token and checks the file of one with a token.
+        """
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.admin)
+        url = reverse('admin:content_app_video_add')
+        data = {'title': 'Movie', 'description': 'A movie', 'category': 'drama'}
+
+        response = client.post(url, {**data, 'video_file': SimpleUploadedFile('movie.mp4', b'not a video')})
+        self.assertEqual(response.status_code, 403)
+
+        client.get(url)
+        response = client.post(url, {**data, 'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+                                     'video_file': SimpleUploadedFile('movie.mp4', b'not a video')})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['adminform'].form.errors['video_file'], [REJECTED_UPLOAD_MESSAGE])
+        self.assertEqual(Video.objects.count(), 0)
@@ -0,0 +1,204 @@
+import hashlib
+import io
+import os
+import shutil
+from unittest.mock import patch, MagicMock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from content_app.models import UploadSession, Video
+from content_app.tasks import complete_upload
+from content_app.uploads import UploadOffsetConflict, append_chunk
+
+CONTENT = b'\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom' + bytes(range(256)) * 3
+CONTENT_HASH = hashlib.sha256(CONTENT).hexdigest()
+
+
+@patch('content_app.signals.django_rq.get_queue')
+class ResumableUploadTest(APITestCase):
+    """
+    Tests for the chunked, resumable upload of source videos.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary media root and an authenticated user.
+        """
+        self.temp_media_root = os.path.join(settings.BASE_DIR, 'test_media')
+        settings.MEDIA_ROOT = self.temp_media_root
+        os.makedirs(self.temp_media_root, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.temp_media_root, ignore_errors=True)
+        self.user = User.objects.create_user(username='uploader', password='password')
+        self.client.force_authenticate(self.user)
+
+    def create_session(self, size=len(CONTENT)):
+        """
+        Creates an upload session for a video of the given size.
+        """
+        response = self.client.post(reverse('upload_sessions'), {
+            'filename': '../Movie.MP4', 'size': size,
+            'title': 'Movie', 'description': 'A movie', 'category': 'drama',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response
+
+    def send_chunk(self, session_id, offset, chunk):
+        """
+        Sends a chunk of the upload at the given offset.
+        """
+        return self.client.patch(reverse('upload_session', args=[session_id]), data=chunk,
+                                 content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_session_is_created(self, mock_get_queue):
+        """
+        Tests that a session starts at offset 0 and the filename loses its directories.
+        """
+        response = self.create_session()
+
+        session = UploadSession.objects.get(pk=response.data['id'])
+        self.assertEqual(session.filename, 'Movie.MP4')
+        self.assertEqual(session.user, self.user)
+        self.assertEqual(response['Location'], reverse('upload_session', args=[session.pk]))
+        self.assertEqual(response['Upload-Offset'], '0')
+
+    def test_oversized_upload_is_rejected(self, mock_get_queue):
+        """
+        Tests that a file larger than VIDEO_UPLOAD_MAX_SIZE cannot be announced.
+        """
+        response = self.client.post(reverse('upload_sessions'), {
+            'filename': 'movie.mp4', 'size': settings.VIDEO_UPLOAD_MAX_SIZE + 1,
+            'title': 'Movie', 'description': 'A movie', 'category': 'drama',
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('size', response.data)
+
+    def test_chunks_are_appended_and_resumed(self, mock_get_queue):
+        """
+        Tests that chunks are appended at their offset and a wrong offset reports where to resume.
+        """
+        session_id = self.create_session().data['id']
+
+        response = self.send_chunk(session_id, 0, CONTENT[:40])
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response['Upload-Offset'], '40')
+
+        response = self.send_chunk(session_id, 0, CONTENT[:40])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Upload-Offset'], '40')
+
+        response = self.client.head(reverse('upload_session', args=[session_id]))
+        self.assertEqual(response['Upload-Offset'], '40')
+
+        self.send_chunk(session_id, 40, CONTENT[40:])
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual(session.offset, len(CONTENT))
+        with open(session.partial_path, 'rb') as f:
+            self.assertEqual(f.read(), CONTENT)
+
+    def test_chunk_beyond_the_size_is_truncated(self, mock_get_queue):
+        """
+        Tests that bytes beyond the announced size are discarded.
+        """
+        session_id = self.create_session(size=30).data['id']
+
+        response = self.send_chunk(session_id, 0, CONTENT[:40])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response['Upload-Offset'], '30')
+        self.assertEqual(os.path.getsize(UploadSession.objects.get(pk=session_id).partial_path), 30)
+
+    def test_interrupted_chunk_keeps_the_received_blocks(self, mock_get_queue):
+        """
+        Tests that the blocks read before a connection drop are kept for the resume.
+        """
+        session = UploadSession.objects.create(user=self.user, filename='movie.mp4', size=len(CONTENT),
+                                               title='Movie', description='A movie', category='drama')
+        stream = MagicMock()
+        stream.read.side_effect = [CONTENT[:25], OSError('connection reset')]
+
+        with self.assertRaises(OSError):
+            append_chunk(session, 0, stream)
+
+        session.refresh_from_db()
+        self.assertEqual(session.offset, 25)
+        with self.assertRaises(UploadOffsetConflict) as context:
+            append_chunk(session, 0, io.BytesIO(CONTENT))
+        self.assertEqual(context.exception.offset, 25)
+
+    def test_complete_creates_the_video_and_starts_the_pipeline(self, mock_get_queue):
+        """
+        Tests that the received file is moved to its content-addressed path and processed.
+        """
+        mock_get_queue.return_value = MagicMock()
+        session_id = self.create_session().data['id']
+        complete_url = reverse('upload_session_complete', args=[session_id])
+
+        self.send_chunk(session_id, 0, CONTENT[:40])
+        response = self.client.post(complete_url)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 40)
+
+        self.send_chunk(session_id, 40, CONTENT[40:])
+        response = self.client.post(complete_url)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Video.objects.count(), 0)
+        enqueue_args = mock_get_queue.return_value.enqueue.call_args[0]
+        self.assertEqual(enqueue_args, (complete_upload, UploadSession.objects.get(pk=session_id).pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            complete_upload(*enqueue_args[1:])
+
+        video = UploadSession.objects.get(pk=session_id).video
+        self.assertEqual(video.content_hash, CONTENT_HASH)
+        self.assertEqual(video.uploaded_by, self.user)
+        self.assertEqual(video.video_file.name, os.path.join('videos', f'{CONTENT_HASH}.mp4'))
+        with open(video.video_file.path, 'rb') as f:
+            self.assertEqual(f.read(), CONTENT)
+        self.assertFalse(os.path.exists(UploadSession.objects.get(pk=session_id).partial_path))
+        mock_get_queue.return_value.enqueue_many.assert_called_once()
+
+        response = self.client.post(complete_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], video.pk)
+        complete_upload(session_id)
+        self.assertEqual(Video.objects.count(), 1)
+
+    def test_unsupported_file_is_rejected_with_its_header(self, mock_get_queue):
+        """
+        Tests that a file without a video container is rejected once its header arrived.
+        """
+        session_id = self.create_session(size=2000).data['id']
+        partial_path = UploadSession.objects.get(pk=session_id).partial_path
+
+        self.assertEqual(self.send_chunk(session_id, 0, b'%PDF-1.7\n').status_code, status.HTTP_204_NO_CONTENT)
+        response = self.send_chunk(session_id, 9, b'\x00' * 600)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(UploadSession.objects.filter(pk=session_id).exists())
+        self.assertFalse(os.path.exists(partial_path))
+
+    def test_sessions_of_other_users_are_hidden(self, mock_get_queue):
+        """
+        Tests that a session can only be used by the user who created it.
+        """
+        session_id = self.create_session().data['id']
+        self.client.force_authenticate(User.objects.create_user(username='other', password='password'))
+
+        self.assertEqual(self.send_chunk(session_id, 0, CONTENT).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cancelled_upload_removes_the_partial_file(self, mock_get_queue):
+        """
+        Tests that deleting a session removes the received content.
+        """
+        session_id = self.create_session().data['id']
+        self.send_chunk(session_id, 0, CONTENT[:40])
+        partial_path = UploadSession.objects.get(pk=session_id).partial_path
+
+        response = self.client.delete(reverse('upload_session', args=[session_id]))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(partial_path))
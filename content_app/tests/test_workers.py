@@ -0,0 +1,124 @@
+from unittest.mock import patch, Mock
+from django.test import TestCase
+from content_app.management.commands.transcode_workers import Command, get_cpu_sets, get_pool_size
+from content_app.tasks import build_transcode_command
+
+
+class WorkerPoolSizeTest(TestCase):
+    """
+    Tests for sizing the transcode worker pool.
+    """
+
+    def test_pool_is_limited_by_cores(self):
+        """
+        Tests that every worker gets its full thread budget.
+        """
+        self.assertEqual(get_pool_size(16, 64 * 1024, 4, 1536), 4)
+
+    def test_pool_is_limited_by_memory(self):
+        """
+        Tests that the pool does not start more encodes than fit into memory.
+        """
+        self.assertEqual(get_pool_size(32, 4096, 2, 1536), 2)
+
+    def test_pool_has_at_least_one_worker(self):
+        """
+        Tests that small machines still get a worker.
+        """
+        self.assertEqual(get_pool_size(2, None, 4, 1536), 1)
+
+    def test_cpu_sets_do_not_overlap(self):
+        """
+        Tests that pinned workers get disjoint blocks of CPUs.
+        """
+        self.assertEqual(get_cpu_sets(list(range(8)), 2, 4), [{0, 1, 2, 3}, {4, 5, 6, 7}])
+
+
+class WorkerSupervisionTest(TestCase):
+    """
+    Tests for restarting dead workers.
+    """
+
+    @patch('content_app.management.commands.transcode_workers.time.sleep')
+    @patch('content_app.management.commands.transcode_workers.subprocess.Popen')
+    def test_dead_worker_is_restarted_with_thread_budget(self, mock_popen, mock_sleep):
+        """
+        Tests that an exited worker is replaced and gets FFMPEG_THREADS.
+        """
+        command = Command()
+        command.queues = ['fast', 'default']
+        command.threads = 3
+        command.cpu_sets = [None, None]
+        command.stopping = False
+        command.restart_delays = [0, 0]
+        command.restart_at = [None, None]
+        alive = Mock(pid=1, **{'poll.return_value': None})
+        dead = Mock(pid=2, returncode=1, **{'poll.return_value': 1})
+        command.processes = [(alive, 0), (dead, 0)]
+
+        command.check_workers()
+
+        mock_sleep.assert_not_called()
+        mock_popen.assert_called_once()
+        args, kwargs = mock_popen.call_args
+        self.assertEqual(args[0][-4:], ['rqworker', '--with-scheduler', 'fast', 'default'])
+        self.assertEqual(kwargs['env']['FFMPEG_THREADS'], '3')
+        self.assertIs(command.processes[0][0], alive)
+        self.assertIs(command.processes[1][0], mock_popen.return_value)
+
+    @patch('content_app.management.commands.transcode_workers.time.monotonic')
+    @patch('content_app.management.commands.transcode_workers.time.sleep')
+    @patch('content_app.management.commands.transcode_workers.subprocess.Popen')
+    def test_crashing_worker_is_restarted_after_its_delay(self, mock_popen, mock_sleep, mock_monotonic):
+        """
+        Tests that the restart delay is kept per worker instead of blocking the supervision loop.
+        """
+        command = Command()
+        command.queues = ['fast']
+        command.threads = 1
+        command.cpu_sets = [None]
+        command.stopping = False
+        command.restart_delays = [2]
+        command.restart_at = [None]
+        command.processes = [(Mock(pid=1, returncode=1, **{'poll.return_value': 1}), 100)]
+
+        mock_monotonic.return_value = 101
+        command.check_workers()
+        self.assertEqual(command.restart_at, [105])
+        mock_monotonic.return_value = 104
+        command.check_workers()
+        mock_popen.assert_not_called()
+
+        mock_monotonic.return_value = 105
+        command.check_workers()
+
+        mock_sleep.assert_not_called()
+        mock_popen.assert_called_once()
+        self.assertEqual(command.restart_at, [None])
+
+
+class ThreadBudgetTest(TestCase):
+    """
+    Tests for passing the worker's thread budget to FFmpeg.
+    """
+
+    def test_transcode_command_uses_thread_budget(self):
+        """
+        Tests that the decoder, the filter graph and every encoder are limited.
+        """
+        outputs = [{'resolution': 480, 'mp4_path': '/out/480.mp4'}, {'resolution': 720, 'mp4_path': '/out/720.mp4'}]
+        with self.settings(FFMPEG_THREADS=4):
+            ffmpeg_cmd = build_transcode_command('/in.mp4', outputs)
+
+        self.assertEqual(ffmpeg_cmd[:5], ['ffmpeg', '-threads', '4', '-i', '/in.mp4'])
+        self.assertIn('-filter_complex_threads', ffmpeg_cmd)
+        self.assertEqual(ffmpeg_cmd.count('-threads'), 3)
+
+    def test_transcode_command_without_budget(self):
+        """
+        Tests that FFmpeg chooses its own thread count outside of the pool.
+        """
+        with self.settings(FFMPEG_THREADS=0):
+            ffmpeg_cmd = build_transcode_command('/in.mp4', [{'resolution': 480, 'mp4_path': '/out/480.mp4'}])
+
+        self.assertNotIn('-threads', ffmpeg_cmd)
@@ -0,0 +1,135 @@
+import math
+import os
+from django.conf import settings
+from .scheduling import get_thread_args
+
+# The WebVTT index of the sprite sheets, next to them.
+TRICKPLAY_INDEX_NAME = 'index.vtt'
+
+
+def get_thumbnail_size(width, height):
+    """
+    Returns the size of a scrub bar thumbnail for a source.
+
+    Args:
+        width (int or None): The width of the source video.
+        height (int or None): The height of the source video.
+
+    Returns:
+        tuple: (width, height) in pixels; the width is
+               VIDEO_TRICKPLAY_WIDTH and the height keeps the aspect ratio
+               (16:9 if the source size is unknown), rounded to an even
+               number.
+    """
+    thumbnail_width = settings.VIDEO_TRICKPLAY_WIDTH
+    if not width or not height:
+        width, height = 16, 9
+    return thumbnail_width, max(2, round(thumbnail_width * height / width / 2) * 2)
+
+
+def get_sprite_name(index):
+    """
+    Returns the filename of a sprite sheet.
+
+    Args:
+        index (int): The index of the sheet.
+
+    Returns:
+        str: The filename, e.g. 'sprite_000.jpg'.
+    """
+    return f'sprite_{index:03d}.jpg'
+
+
+def build_trickplay_command(source_path, output_dir, thumbnail_size):
+    """
+    Builds the FFmpeg command that renders all sprite sheets in one pass.
+
+    Only keyframes are decoded, which is much faster than decoding every
+    frame; the fps filter picks one of them every VIDEO_TRICKPLAY_INTERVAL
+    seconds. The thumbnails are scaled and tiled into sheets of
+    VIDEO_TRICKPLAY_COLUMNS x VIDEO_TRICKPLAY_ROWS. The decoder and encoder
+    are limited to the worker's thread budget.
+
+    Args:
+        source_path (str): The full path to the source video.
+        output_dir (str): The directory of the sprite sheets.
+        thumbnail_size (tuple): (width, height) of a thumbnail.
+
+    Returns:
+        list: The FFmpeg command as a list of arguments.
+    """
+    width, height = thumbnail_size
+    filters = [
+        f'fps=1/{settings.VIDEO_TRICKPLAY_INTERVAL}',
+        f'scale={width}:{height}',
+        f'tile={settings.VIDEO_TRICKPLAY_COLUMNS}x{settings.VIDEO_TRICKPLAY_ROWS}',
+    ]
+    return [
+        'ffmpeg', '-y',
+        '-skip_frame', 'nokey',
+        *get_thread_args(),
+        '-i', source_path,
+        '-map', '0:v:0',
+        '-vf', ','.join(filters),
+        '-fps_mode', 'passthrough',
+        '-q:v', '4', *get_thread_args(),
+        '-start_number', '0',
+        os.path.join(output_dir, 'sprite_%03d.jpg')
+    ]
+
+
+def format_timestamp(seconds):
+    """
+    Formats a time as a WebVTT timestamp.
+
+    Args:
+        seconds (float): The time in seconds.
+
+    Returns:
+        str: The timestamp, e.g. '01:02:03.500'.
+    """
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    return f'{hours:02d}:{minutes:02d}:{milliseconds / 1000:06.3f}'
+
+
+def write_trickplay_index(index_path, duration, thumbnail_size, sheet_count):
+    """
+    Writes the WebVTT index that maps every interval of the video to its
+    thumbnail in the sprite sheets.
+
+    Every cue covers VIDEO_TRICKPLAY_INTERVAL seconds and references its
+    thumbnail with a media fragment, e.g. 'sprite_000.jpg#xywh=160,0,160,90'.
+    Thumbnails beyond the rendered sheets are left out.
+
+    Args:
+        index_path (str): The full path to the index.
+        duration (float): The duration of the video in seconds.
+        thumbnail_size (tuple): (width, height) of a thumbnail.
+        sheet_count (int): The number of rendered sprite sheets.
+
+    Returns:
+        int: The number of cues.
+    """
+    width, height = thumbnail_size
+    interval = settings.VIDEO_TRICKPLAY_INTERVAL
+    columns = settings.VIDEO_TRICKPLAY_COLUMNS
+    per_sheet = columns * settings.VIDEO_TRICKPLAY_ROWS
+    count = min(math.ceil(duration / interval), sheet_count * per_sheet)
+
+    lines = ['WEBVTT', '']
+    for index in range(count):
+        sheet, position = divmod(index, per_sheet)
+        row, column = divmod(position, columns)
+        lines += [
+            f'{format_timestamp(index * interval)} --> {format_timestamp(min((index + 1) * interval, duration))}',
+            f'{get_sprite_name(sheet)}#xywh={column * width},{row * height},{width},{height}',
+            '',
+        ]
+
+    temp_path = f'{index_path}.tmp'
+    with open(temp_path, 'w') as index_file:
+        index_file.write('\n'.join(lines))
+    os.replace(temp_path, index_path)
+    return count
@@ -0,0 +1,149 @@
+import hashlib
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+
+# The container is recognised from the first bytes of the file; MPEG-TS
+# needs two packets of 188 bytes (M2TS: 192) to be told apart from noise.
+HEADER_SIZE = 512
+# Box types an ISO BMFF (MP4, MOV, 3GP) file may start with.
+ISO_BMFF_BOXES = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot'}
+REJECTED_UPLOAD_MESSAGE = "Unsupported or corrupt video file: the container could not be recognised."
+
+
+def sniff_container(header):
+    """
+    Recognises the container of a video file from its first bytes.
+
+    Args:
+        header (bytes): The first HEADER_SIZE bytes of the file (fewer if
+                        the file is shorter).
+
+    Returns:
+        str or None: The container ('mp4', 'matroska', 'avi', 'mpegts',
+                     'mpegps', 'flv', 'asf' or 'ogg'), or None if it is not
+                     a supported container or its header is corrupt.
+    """
+    if header[4:8] in ISO_BMFF_BOXES:
+        box_size = int.from_bytes(header[:4], 'big')
+        return 'mp4' if box_size in (0, 1) or box_size >= 8 else None
+    if header.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'matroska'
+    if header.startswith(b'RIFF') and header[8:12] == b'AVI ':
+        return 'avi'
+    if len(header) > 188 and header[0] == header[188] == 0x47:
+        return 'mpegts'
+    if len(header) > 196 and header[4] == header[196] == 0x47:
+        return 'mpegts'
+    if header.startswith(b'\x00\x00\x01\xba'):
+        return 'mpegps'
+    if header.startswith(b'FLV\x01'):
+        return 'flv'
+    if header.startswith(b'\x30\x26\xb2\x75\x8e\x66\xcf\x11'):
+        return 'asf'
+    if header.startswith(b'OggS'):
+        return 'ogg'
+    return None
+
+
+class ContentHashUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams uploads to a temporary file and inspects them on the way.
+
+    The SHA-256 checksum of every file is computed while it is written and
+    stored as `content_hash` on the uploaded file, so the source does not
+    have to be read again to be stored under its hash (see `models.Video.save`).
+
+    Uploads of the `video_fields` are also checked while they arrive:
+    the container is recognised from the first bytes (see
+    `sniff_container`) and stored as `container`, and the received size is
+    compared with VIDEO_UPLOAD_MAX_SIZE. A file that fails either check is
+    dropped as soon as that is known, so no video and no pipeline is
+    created for it; the reason is recorded in `request.rejected_uploads`
+    for the form or view to report.
+
+    The handler is not installed globally; views that receive videos put it
+    in front of the default handlers with `install_upload_handler`.
+    """
+
+    def __init__(self, request=None, video_fields=()):
+        super().__init__(request)
+        self.video_fields = tuple(video_fields)
+
+    def new_file(self, field_name, *args, **kwargs):
+        """
+        Starts the checksum, byte count and header of a new file.
+        """
+        super().new_file(field_name, *args, **kwargs)
+        self.checksum = hashlib.sha256()
+        self.received = 0
+        self.header = b''
+        self.container = None
+        self.inspected = field_name not in self.video_fields
+
+    def receive_data_chunk(self, raw_data, start):
+        """
+        Writes a chunk and updates the checksum and byte count.
+
+        Raises:
+            SkipFile: If the file is rejected; the rest of it is discarded.
+        """
+        self.checksum.update(raw_data)
+        self.received += len(raw_data)
+        if self.field_name in self.video_fields:
+            if self.received > settings.VIDEO_UPLOAD_MAX_SIZE:
+                self.reject(f"The file must not be larger than {settings.VIDEO_UPLOAD_MAX_SIZE} bytes.")
+                raise SkipFile()
+            if not self.inspected:
+                self.header += raw_data[:HEADER_SIZE - len(self.header)]
+                if len(self.header) >= HEADER_SIZE and not self.inspect():
+                    raise SkipFile()
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        """
+        Returns the uploaded file with its `content_hash` and `container`,
+        or None if a file shorter than the header is rejected.
+        """
+        if not self.inspected and not self.inspect():
+            self.file.close()
+            return None
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.content_hash = self.checksum.hexdigest()
+        uploaded_file.container = self.container
+        return uploaded_file
+
+    def inspect(self):
+        """
+        Recognises the container of the current file from its header.
+
+        Returns:
+            bool: Whether the container is supported.
+        """
+        self.inspected = True
+        self.container = sniff_container(self.header)
+        if self.container is None:
+            self.reject(REJECTED_UPLOAD_MESSAGE)
+        return self.container is not None
+
+    def reject(self, message):
+        """
+        Records why the current file was dropped.
+        """
+        if not hasattr(self.request, 'rejected_uploads'):
+            self.request.rejected_uploads = {}
+        self.request.rejected_uploads[self.field_name] = message
+
+
+def install_upload_handler(request, video_fields):
+    """
+    Puts a ContentHashUploadHandler in front of the upload handlers of a request.
+
+    Must be called before `request.POST` or `request.FILES` is read; the
+    files are parsed by the handlers installed at that moment.
+
+    Args:
+        request (HttpRequest): The request that carries the upload.
+        video_fields (iterable of str): The form fields whose uploads must
+                                        be video files.
+    """
+    request.upload_handlers.insert(0, ContentHashUploadHandler(request, video_fields))
@@ -0,0 +1,166 @@
+import fcntl
+import os
+from django.core.files import File
+from django.db import transaction
+from .models import UploadSession, Video, get_content_hash, video_upload_to
+from .upload_handlers import HEADER_SIZE, REJECTED_UPLOAD_MESSAGE, sniff_container
+
+# Chunks are copied from the request to the partial file in blocks of this
+# size, so memory use does not grow with the chunk size.
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadOffsetConflict(Exception):
+    """
+    Raised when a chunk does not start where the received content ends.
+
+    Attributes:
+        offset (int): The number of bytes received so far, where the next
+                      chunk has to start.
+    """
+
+    def __init__(self, offset):
+        super().__init__(f"the upload continues at offset {offset}")
+        self.offset = offset
+
+
+class UploadRejected(ValueError):
+    """
+    Raised when the received content is not a supported video container.
+    """
+
+
+def get_received_size(session):
+    """
+    Returns how many bytes of an upload have been stored.
+
+    The partial file is authoritative: it only ever grows by the blocks
+    that were written, also if a request was interrupted.
+
+    Args:
+        session (UploadSession): The upload session.
+
+    Returns:
+        int: The size of the partial file in bytes.
+    """
+    try:
+        return os.path.getsize(session.partial_path)
+    except FileNotFoundError:
+        return 0
+
+
+def append_chunk(session, offset, stream):
+    """
+    Appends a chunk read from a stream to the partial file of an upload.
+
+    The partial file is locked while the chunk is written, so concurrent
+    requests for the same session cannot interleave. Every block is written
+    as soon as it is read; if the connection drops, the blocks received so
+    far are kept and the client resumes after them. The received size is
+    stored in `offset` of the session.
+
+    As soon as the first HEADER_SIZE bytes (or the whole, shorter file)
+    have arrived, the container is checked like that of a form upload (see
+    `upload_handlers.sniff_container`), so an unsupported file is rejected
+    before the rest of it is sent.
+
+    Args:
+        session (UploadSession): The upload session.
+        offset (int): The offset the client sends the chunk for.
+        stream (file-like): The request body.
+
+    Returns:
+        int: The number of bytes received after the chunk.
+
+    Raises:
+        UploadOffsetConflict: If `offset` is not the received size.
+        UploadRejected: If the file is not a supported video container.
+        ValueError: If the chunk goes beyond the announced size; the excess
+                    is discarded.
+    """
+    os.makedirs(os.path.dirname(session.partial_path), exist_ok=True)
+    with open(session.partial_path, 'ab') as partial_file:
+        fcntl.flock(partial_file, fcntl.LOCK_EX)
+        received = partial_file.seek(0, os.SEEK_END)
+        if offset != received:
+            raise UploadOffsetConflict(received)
+
+        try:
+            while stream is not None:
+                block = stream.read(UPLOAD_BLOCK_SIZE)
+                if not block:
+                    break
+                if received + len(block) > session.size:
+                    partial_file.write(block[:session.size - received])
+                    received = session.size
+                    raise ValueError(f"the chunk exceeds the announced size of {session.size} bytes")
+                partial_file.write(block)
+                received += len(block)
+        finally:
+            partial_file.flush()
+            os.fsync(partial_file.fileno())
+            UploadSession.objects.filter(pk=session.pk).update(offset=received)
+            session.offset = received
+
+    if offset < HEADER_SIZE <= received or offset < received == session.size:
+        with open(session.partial_path, 'rb') as partial_file:
+            if sniff_container(partial_file.read(HEADER_SIZE)) is None:
+                raise UploadRejected(REJECTED_UPLOAD_MESSAGE)
+    return received
+
+
+def complete_upload_session(session_pk):
+    """
+    Creates the video of a fully received upload.
+
+    Runs as an RQ job (see `tasks.complete_upload`), because hashing a
+    multi-gigabyte file takes too long for a web request. The partial file
+    is hashed without holding a lock and then moved (not copied) to the
+    content-addressed location of the source (see `models.video_upload_to`).
+    If the same content was uploaded before, the stored source is reused
+    and the partial file is removed. Creating the video starts its
+    processing pipeline, or links it to the outputs of the earlier upload
+    (see `signals.video_post_save`). Completing a session twice returns the
+    video created the first time.
+
+    Args:
+        session_pk (UUID): The id of the upload session.
+
+    Returns:
+        Video: The created video.
+
+    Raises:
+        UploadOffsetConflict: If the upload has not been fully received.
+    """
+    session = UploadSession.objects.get(pk=session_pk)
+    if session.video_id:
+        return session.video
+
+    received = get_received_size(session)
+    if received != session.size:
+        raise UploadOffsetConflict(received)
+    with open(session.partial_path, 'rb') as partial_file:
+        content_hash = get_content_hash(File(partial_file))
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session_pk)
+        if session.video_id:
+            return session.video
+
+        video = Video(title=session.title, description=session.description, category=session.category,
+                      content_hash=content_hash, uploaded_by=session.user)
+        duplicate = video.find_duplicate()
+        if duplicate:
+            video.video_file = duplicate.video_file.name
+        else:
+            video.video_file = video_upload_to(video, session.filename)
+        video.save()
+        session.video = video
+        session.save(update_fields=['video', 'updated_at'])
+
+        if duplicate:
+            os.remove(session.partial_path)
+        else:
+            os.makedirs(os.path.dirname(video.video_file.path), exist_ok=True)
+            os.replace(session.partial_path, video.video_file.path)
+    return video
@@ -123,15 +123,139 @@ CACHES = {
     }
 }
 
+RQ_CONNECTION = {
+    'HOST': os.environ.get("REDIS_HOST", default="redis"),
+    'PORT': os.environ.get("REDIS_PORT", default=6379),
+    'DB': os.environ.get("REDIS_DB", default=0),
+    'REDIS_CLIENT_KWARGS': {},
+}
+
+# Workers listen to the queues in this order, so fast jobs (probe, thumbnail,
+# packaging) always run first, followed by transcodes from short to long.
 RQ_QUEUES = {
-    'default': {
-        'HOST': os.environ.get("REDIS_HOST", default="redis"),
-        'PORT': os.environ.get("REDIS_PORT", default=6379),
-        'DB': os.environ.get("REDIS_DB", default=0),
-        'DEFAULT_TIMEOUT': 900,
-        'REDIS_CLIENT_KWARGS': {},
-    },
+    'default': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 900},
+    'fast': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 300},
+    'transcode_short': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 900},
+    'transcode_medium': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 900},
+    'transcode_long': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 900},
+}
+
+# Transcode queues with the highest effective cost (estimated encode seconds
+# plus the uploader's pending work) they accept; None accepts everything.
+VIDEO_TRANSCODE_QUEUES = [
+    ('transcode_short', 600),
+    ('transcode_medium', 3600),
+    ('transcode_long', None),
+]
+
+# Videos at least this long (in seconds) are split into chunks of
+# VIDEO_CHUNK_DURATION seconds that are transcoded in parallel by all workers.
+VIDEO_CHUNKED_MIN_DURATION = int(os.environ.get("VIDEO_CHUNKED_MIN_DURATION", default=600))
+VIDEO_CHUNK_DURATION = int(os.environ.get("VIDEO_CHUNK_DURATION", default=120))
+
+# Encoding ladder: x264 quality (CRF) and the VBV cap (maxrate/bufsize) of
+# every rendition. The CRF keeps simple scenes small, the cap bounds the
+# bitrate peaks of complex ones. Every resolution needs a `video_<res>p`
+# field on the Video model.
+VIDEO_ENCODING_LADDER = {
+    480: {'crf': 23, 'maxrate': '1400k', 'bufsize': '2800k'},
+    720: {'crf': 23, 'maxrate': '2800k', 'bufsize': '5600k'},
+    1080: {'crf': 23, 'maxrate': '5000k', 'bufsize': '10000k'},
 }
+VIDEO_ENCODE_PRESET = os.environ.get("VIDEO_ENCODE_PRESET", default="medium")
+
+# Presets the scheduler may choose from, most efficient first, with their
+# speed relative to VIDEO_ENCODE_PIXELS_PER_SECOND until it is measured. The
+# slowest preset that makes a new video playable within
+# VIDEO_TIME_TO_PLAYABLE seconds, given the transcode backlog, is used.
+VIDEO_ENCODE_PRESETS = [
+    ('medium', 1.0),
+    ('fast', 1.4),
+    ('veryfast', 2.5),
+    ('superfast', 4.0),
+]
+VIDEO_TIME_TO_PLAYABLE = int(os.environ.get("VIDEO_TIME_TO_PLAYABLE", default=1800))
+
+# Per-title encoding: before the pipeline is built, VIDEO_ANALYSIS_SAMPLES
+# samples of VIDEO_ANALYSIS_SAMPLE_DURATION seconds are trial-encoded at
+# VIDEO_ANALYSIS_HEIGHT. The bits per pixel of that encode (the complexity)
+# raise the CRF of complex videos (VIDEO_COMPLEXITY_CRF_OFFSETS: highest
+# complexity, offset), cap every rung at VIDEO_MAXRATE_HEADROOM times its
+# estimated bitrate and drop rungs that need less than VIDEO_MIN_RUNG_STEP
+# more than the rung below (flat content gains no visible detail from them).
+VIDEO_ANALYSIS_SAMPLES = int(os.environ.get("VIDEO_ANALYSIS_SAMPLES", default=3))
+VIDEO_ANALYSIS_SAMPLE_DURATION = int(os.environ.get("VIDEO_ANALYSIS_SAMPLE_DURATION", default=4))
+VIDEO_ANALYSIS_HEIGHT = 360
+VIDEO_COMPLEXITY_CRF_OFFSETS = [
+    (0.05, 0),
+    (0.1, 1),
+    (None, 2),
+]
+VIDEO_MAXRATE_HEADROOM = 1.5
+VIDEO_MIN_RUNG_STEP = '250k'
+
+# Every rendition gets a keyframe each VIDEO_KEYFRAME_INTERVAL seconds, at the
+# same timestamps, and HLS segments are cut every VIDEO_SEGMENT_DURATION
+# seconds, which must be a multiple of the keyframe interval. Segment
+# boundaries are thus aligned across renditions and players can switch at
+# every segment.
+VIDEO_KEYFRAME_INTERVAL = int(os.environ.get("VIDEO_KEYFRAME_INTERVAL", default=2))
+VIDEO_SEGMENT_DURATION = int(os.environ.get("VIDEO_SEGMENT_DURATION", default=10))
+
+# Durations of the first HLS segments. Players start after the first
+# segment, so short segments at the start lower the time to first frame;
+# after them, segments are VIDEO_SEGMENT_DURATION long. Every value must be a
+# multiple of VIDEO_KEYFRAME_INTERVAL.
+VIDEO_STARTUP_SEGMENTS = [2, 2, 4]
+
+# Container of the HLS segments: 'mpegts' (.ts) or 'fmp4' (CMAF, .m4s
+# segments with a shared init.mp4). fMP4 has less container overhead per
+# segment and the same files can later be listed in a DASH manifest.
+VIDEO_SEGMENT_TYPE = os.environ.get("VIDEO_SEGMENT_TYPE", default="mpegts")
+
+# The thumbnail is the most representative of the first
+# VIDEO_THUMBNAIL_CANDIDATES keyframes and is stored as JPEG and WebP in
+# every width of VIDEO_THUMBNAIL_WIDTHS, for responsive images (srcset).
+VIDEO_THUMBNAIL_WIDTHS = [320, 640, 1280]
+VIDEO_THUMBNAIL_CANDIDATES = int(os.environ.get("VIDEO_THUMBNAIL_CANDIDATES", default=50))
+
+# Hover previews: a silent loop of VIDEO_PREVIEW_DURATION seconds, starting
+# at VIDEO_PREVIEW_START of the duration, cut from the lowest rendition and
+# re-encoded at VIDEO_PREVIEW_HEIGHT and VIDEO_PREVIEW_FRAME_RATE, capped at
+# VIDEO_PREVIEW_MAXRATE.
+VIDEO_PREVIEW_DURATION = int(os.environ.get("VIDEO_PREVIEW_DURATION", default=4))
+VIDEO_PREVIEW_START = 0.25
+VIDEO_PREVIEW_HEIGHT = 240
+VIDEO_PREVIEW_FRAME_RATE = 15
+VIDEO_PREVIEW_MAXRATE = '300k'
+
+# Scrub bar previews (trickplay): a thumbnail of VIDEO_TRICKPLAY_WIDTH pixels
+# every VIDEO_TRICKPLAY_INTERVAL seconds, tiled into JPEG sprite sheets of
+# VIDEO_TRICKPLAY_COLUMNS x VIDEO_TRICKPLAY_ROWS thumbnails.
+VIDEO_TRICKPLAY_INTERVAL = int(os.environ.get("VIDEO_TRICKPLAY_INTERVAL", default=10))
+VIDEO_TRICKPLAY_WIDTH = 160
+VIDEO_TRICKPLAY_COLUMNS = 10
+VIDEO_TRICKPLAY_ROWS = 10
+
+# Encoded output pixels per second a single worker achieves with the 'medium'
+# preset. Used together with the probed source metadata to estimate encode
+# time and job timeouts until the speed of an encode has been measured.
+VIDEO_ENCODE_PIXELS_PER_SECOND = int(os.environ.get("VIDEO_ENCODE_PIXELS_PER_SECOND", default=30_000_000))
+
+# Failed pipeline jobs are retried VIDEO_JOB_RETRIES times; the first retry
+# waits VIDEO_RETRY_DELAY seconds, every further one twice as long.
+VIDEO_JOB_RETRIES = int(os.environ.get("VIDEO_JOB_RETRIES", default=3))
+VIDEO_RETRY_DELAY = int(os.environ.get("VIDEO_RETRY_DELAY", default=30))
+
+# Sizing of the worker pool started by `manage.py transcode_workers`: every
+# worker gets VIDEO_WORKER_THREADS cores for FFmpeg and needs about
+# VIDEO_WORKER_MEMORY_MB of RAM for a 1080p encode.
+VIDEO_WORKER_THREADS = int(os.environ.get("VIDEO_WORKER_THREADS", default=4))
+VIDEO_WORKER_MEMORY_MB = int(os.environ.get("VIDEO_WORKER_MEMORY_MB", default=1536))
+
+# FFmpeg thread budget of the current worker process, set for each worker by
+# `manage.py transcode_workers`. 0 lets FFmpeg use all cores.
+FFMPEG_THREADS = int(os.environ.get("FFMPEG_THREADS", default=0))
 
 
 # Password validation
@@ -174,6 +298,11 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Largest source video (in bytes) accepted by a resumable upload session or
+# a form upload. The content is streamed to disk, so this is not limited by
+# memory.
+VIDEO_UPLOAD_MAX_SIZE = int(os.environ.get("VIDEO_UPLOAD_MAX_SIZE", default=20 * 1024 ** 3))
+
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Default primary key field type